@@ -35,8 +35,12 @@ function! s:nayvy_single_import_to_item(single_import) abort
         \ }
 endfunction
 
-function! s:get_items() abort
-  let l:single_imports = py3eval('nayvy_list_imports(' . s:coc_menu_max_width . ')')
+function! s:get_items(input) abort
+  let l:single_imports = py3eval(printf(
+        \ 'nayvy_list_imports(%d, %s)',
+        \ s:coc_menu_max_width,
+        \ string(a:input),
+        \ ))
   let l:items = map(
         \ l:single_imports,
         \ {_, single_import -> s:nayvy_single_import_to_item(single_import)},
@@ -47,7 +51,7 @@ endfunction
 " Main source candidate functions
 " which provide NON-imported statements.
 function! coc#source#nayvy#complete(opt, cb) abort
-  call a:cb(s:get_items())
+  call a:cb(s:get_items(get(a:opt, 'input', '')))
 endfunction
 
 " When completed, import statement should be appended.
@@ -51,6 +51,16 @@ function! nayvy#import_fzf() abort
         \ }, get(g:, 'fzf_layout', {})))
 endfunction
 
+" Keep cached import maps up to date with the written buffer
+function! nayvy#on_buf_write_post(filepath) abort
+  call py3eval(printf('nayvy_on_buf_write_post(%s)', string(a:filepath)))
+endfunction
+
+" Start building the project index in background (g:nayvy_index_warmup)
+function! nayvy#warm_up(filepath) abort
+  call py3eval(printf('nayvy_warm_up(%s)', string(a:filepath)))
+endfunction
+
 " Get single import statement lists for deoplete
 function! nayvy#nayvy_list_imports() abort
   return py3eval('nayvy_list_imports()')
@@ -84,3 +94,34 @@ function! nayvy#test_generate_fzf() abort
         \ 'options': printf('-m --header-lines=%d', len(l:tested_functions)),
         \ }, get(g:, 'fzf_layout', {})))
 endfunction
+
+"---------------------------------------
+" Profiling and stats
+"---------------------------------------
+" Run the next nayvy operation under cProfile
+function! nayvy#profile(...) abort
+  let l:top_n = a:0 > 0 ? str2nr(a:1) : 0
+  call py3eval(printf('nayvy_profile_next(%d)', l:top_n))
+endfunction
+
+" Show the summary of the last profile in a scratch buffer
+function! nayvy#show_profile() abort
+  let l:lines = py3eval('nayvy_profile_lines()')
+  if empty(l:lines)
+    return
+  endif
+  call s:open_scratch('[nayvy profile]', l:lines)
+endfunction
+
+" Show index sizes, cache hit rates and latency in a scratch buffer
+function! nayvy#stats() abort
+  call s:open_scratch('[nayvy stats]', py3eval('nayvy_stats()'))
+endfunction
+
+function! s:open_scratch(name, lines) abort
+  botright new
+  setlocal buftype=nofile bufhidden=wipe noswapfile nobuflisted nowrap
+  call setline(1, a:lines)
+  setlocal nomodifiable
+  execute 'file ' . fnameescape(a:name)
+endfunction
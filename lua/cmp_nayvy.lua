@@ -34,6 +34,7 @@ end
 --
 local nayvy_single_import_to_item = function(single_import)
 	return {
+		name = single_import.name,
 		insertText = single_import.name,
 		filterText = single_import.name,
 		label = single_import.name .. string.format("  (%s)", single_import.trimmed_statement),
@@ -41,6 +42,7 @@ local nayvy_single_import_to_item = function(single_import)
 		level = single_import.level,
 		kind = 14,
 		documentation = single_import.info,
+		lazy = single_import.lazy,
 	}
 end
 
@@ -80,18 +82,31 @@ function source:complete(params, callback)
 		return
 	end
 
-	local single_imports = vim.fn.py3eval("nayvy_list_imports(80)")
+	-- Only names starting with the word before the cursor are transferred.
+	local prefix = string.match(params.context.cursor_before_line, "[%w_]*$")
+	local limit = vim.fn.py3eval("nayvy_completion_limit()")
+	local single_imports = vim.fn.py3eval(string.format("nayvy_list_imports(80, '%s', %d)", prefix, limit))
 	local res = {}
 	for key, single_import in pairs(single_imports) do
 		table.insert(res, nayvy_single_import_to_item(single_import))
 	end
-	callback(res)
+	-- Ask for the narrower list as the prefix grows if truncated,
+	-- or again once the project index warms up.
+	local truncated = limit > 0 and #res >= limit
+	local warming_up = vim.fn.py3eval("int(nayvy_is_warming_up())") == 1
+	callback({ items = res, isIncomplete = truncated or warming_up })
 end
 
 ---Resolve completion item. (Optional)
 ---@param completion_item lsp.CompletionItem
 ---@param callback fun(completion_item: lsp.CompletionItem|nil)
 function source:resolve(completion_item, callback)
+	if completion_item.lazy then
+		-- Signature is loaded only for the selected item.
+		completion_item.documentation =
+			vim.fn.py3eval(string.format("nayvy_resolve_import('%s')", completion_item.name))
+		completion_item.lazy = false
+	end
 	completion_item.documentation = {
 		kind = cmp.lsp.MarkupKind.Markdown,
 		value = completion_item.documentation,
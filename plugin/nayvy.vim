@@ -30,8 +30,25 @@ let loaded_plugin_vim_nayvy=1
 command! NayvyImports call nayvy#imports()
 command! NayvyImportFZF call nayvy#import_fzf()
 
+augroup nayvy
+  autocmd!
+  autocmd BufWritePost *.py,*.nayvy call nayvy#on_buf_write_post(expand('<afile>:p'))
+  " Registered only when enabled not to load Python on every buffer
+  let s:warmup = exists('$NAYVY_INDEX_WARMUP')
+        \ ? $NAYVY_INDEX_WARMUP : get(g:, 'nayvy_index_warmup', 0)
+  if str2nr(s:warmup)
+    autocmd BufEnter *.py call nayvy#warm_up(expand('<afile>:p'))
+  endif
+augroup END
+
 "---------------------------------------
 " Testing
 "---------------------------------------
 command! NayvyTestGenerate call nayvy#test_generate()
 command! NayvyTestGenerateFZF call nayvy#test_generate_fzf()
+
+"---------------------------------------
+" Profiling and stats
+"---------------------------------------
+command! -nargs=? NayvyProfile call nayvy#profile(<f-args>)
+command! NayvyStats call nayvy#stats()
@@ -0,0 +1,208 @@
+"""
+Benchmarks of project indexing and import fixing
+
+Usage:
+    python -m benchmarks.run --sizes 1000,10000,50000 --output result.json
+
+Each phase is run once for timing, and once more under tracemalloc
+for its peak memory (unless `--no-memory` is given).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from nayvy.importing.fixer import Fixer
+from nayvy.importing.import_statement import ImportStatement
+from nayvy.importing.pyflakes import PyflakesEngine
+from nayvy.importing.utils import get_import_block_indices
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.path import (
+    ImportPathFormat,
+    ProjectImportHelper,
+    ProjectImportHelperBuilder,
+)
+from nayvy.projects.registry import ProjectImportHelperRegistry
+
+from .synthetic import generate_project
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+# Number of modules whose imports are fixed in `fixer_fix_lines`
+FIX_SAMPLE_NUM = 100
+
+# Number of files visited in `switch_files`
+SWITCH_SAMPLE_NUM = 100
+
+
+def measure(f: Callable[[], Any], memory: bool) -> Dict[str, Any]:
+    """ Measure elapsed seconds (and peak memory) of `f`.
+    """
+    start = time.perf_counter()
+    f()
+    res: Dict[str, Any] = {'seconds': time.perf_counter() - start}
+    if memory:
+        tracemalloc.start()
+        try:
+            f()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        res['peak_memory_bytes'] = peak
+    return res
+
+
+def _builder(current_filepath: str, **kwargs: Any) -> ProjectImportHelperBuilder:
+    return ProjectImportHelperBuilder(
+        current_filepath,
+        SyntacticModuleLoader(),
+        ImportPathFormat.ALL_RELATIVE,
+        ['setup.py'],
+        False,
+        **kwargs,
+    )
+
+
+def _build(current_filepath: str, **kwargs: Any) -> ProjectImportHelper:
+    helper = _builder(current_filepath, **kwargs).build()
+    if helper is None:
+        raise RuntimeError('Failed to build the synthetic project')
+    return helper
+
+
+def run_size(module_num: int, work_dir: str, memory: bool) -> List[Dict[str, Any]]:
+    """ Run all phases against a synthetic project of `module_num` modules.
+    """
+    project_dir = f'{work_dir}/project_{module_num}'
+    cache_dir = f'{work_dir}/cache_{module_num}'
+    paths = generate_project(project_dir, module_num)
+    current_filepath = paths[0]
+
+    all_lines: List[List[str]] = []
+    for path in paths:
+        with open(path) as f:
+            all_lines.append(f.readlines())
+    import_blocks = [
+        lines[begin:end]
+        for lines in all_lines
+        for begin, end in get_import_block_indices(lines)
+    ]
+    loader = SyntacticModuleLoader()
+
+    helper = _build(current_filepath)
+    fixer = Fixer(helper, PyflakesEngine())
+    fix_cases = []
+    for i, lines in enumerate(all_lines[:FIX_SAMPLE_NUM]):
+        other = (i + 1) % len(all_lines)
+        fix_cases.append((
+            [line.rstrip('\n') for line in lines],
+            ['os', 'sys', 'json'],
+            [f'function_{other}_0', f'Class{other}x0'],
+        ))
+
+    def load_all() -> None:
+        for lines in all_lines:
+            loader.load_module_from_lines(lines)
+
+    def parse_imports() -> None:
+        for block in import_blocks:
+            ImportStatement.of_lines(block)
+
+    def fix_all() -> None:
+        for lines, unused, undefined in fix_cases:
+            fixer._fix_lines(lines, unused, undefined)
+
+    def build_warm_cache() -> None:
+        _build(current_filepath, use_cache=True, cache_root=cache_dir)
+
+    registry = ProjectImportHelperRegistry()
+    registry.get(_builder(current_filepath))
+
+    def switch_files() -> None:
+        # Files of the project share the index already built.
+        for i, path in enumerate(paths[:SWITCH_SAMPLE_NUM]):
+            other = (i + 1) % len(paths)
+            switched = registry.get(_builder(path))
+            assert switched is not None
+            switched[f'function_{other}_0']
+
+    # Fill the persistent cache before measuring warm builds.
+    _build(current_filepath, use_cache=True, cache_root=cache_dir)
+
+    phases: List[Any] = [
+        ('build', lambda: _build(current_filepath)),
+        ('build_warm_cache', build_warm_cache),
+        ('switch_files', switch_files),
+        ('load_module_from_lines', load_all),
+        ('import_statement_of_lines', parse_imports),
+        ('fixer_fix_lines', fix_all),
+    ]
+    results = []
+    for phase, f in phases:
+        result = {
+            'modules': module_num,
+            'symbols': sum(1 for _ in helper.items()),
+            'phase': phase,
+        }
+        result.update(measure(f, memory))
+        results.append(result)
+        print(
+            f'[{module_num} modules] {phase}: {result["seconds"]:.3f}s',
+            file=sys.stderr,
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--sizes',
+        default=','.join(str(size) for size in DEFAULT_SIZES),
+        help='comma-separated numbers of modules in synthetic projects',
+    )
+    parser.add_argument(
+        '--output',
+        default='',
+        help='path of the JSON result (stdout if empty)',
+    )
+    parser.add_argument(
+        '--no-memory',
+        action='store_true',
+        help='skip measuring peak memory with tracemalloc',
+    )
+    args = parser.parse_args(argv)
+
+    # Scripts in PYTHONPATH would be indexed as well.
+    os.environ.pop('PYTHONPATH', None)
+
+    work_dir = tempfile.mkdtemp(prefix='nayvy_bench_')
+    try:
+        results: List[Dict[str, Any]] = []
+        for size in args.sizes.split(','):
+            results += run_size(int(size), work_dir, not args.no_memory)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return
+
+
+if __name__ == '__main__':
+    main()
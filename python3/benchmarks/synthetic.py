@@ -0,0 +1,107 @@
+"""
+Generator of synthetic python projects for benchmarks
+"""
+import random
+from pathlib import Path
+from typing import List
+
+# Rough density of definitions in a real-world module
+FUNCTIONS_PER_MODULE = 5
+CLASSES_PER_MODULE = 2
+METHODS_PER_CLASS = 4
+MODULES_PER_PACKAGE = 20
+PACKAGES_PER_PACKAGE = 5
+
+STDLIB_IMPORT_LINES = [
+    'import os',
+    'import sys',
+    'import json',
+    'from typing import Any, Dict, List, Optional',
+    'from dataclasses import dataclass',
+    'from pathlib import Path',
+]
+
+
+def _signature(name: str, rnd: random.Random, indent: str, method: bool) -> List[str]:
+    args = [f'arg{i}: int' for i in range(rnd.randint(0, 4))]
+    if method:
+        args.insert(0, 'self')
+    if len(args) <= 2:
+        return [f'{indent}def {name}({", ".join(args)}) -> None:']
+    # multi-line signature
+    return (
+        [f'{indent}def {name}(']
+        + [f'{indent}    {arg},' for arg in args]
+        + [f'{indent}) -> None:']
+    )
+
+
+def _body(indent: str, rnd: random.Random, name: str) -> List[str]:
+    lines = [
+        f'{indent}    """ Docstring of {name}.',
+        '',
+        f'{indent}    It does something useful.',
+        f'{indent}    """',
+    ]
+    for i in range(rnd.randint(1, 6)):
+        lines.append(f'{indent}    value{i} = {i} * 2')
+    lines.append(f'{indent}    return')
+    return lines
+
+
+def module_lines(module_index: int, rnd: random.Random) -> List[str]:
+    """ Generate lines of one module with realistic definition density.
+    """
+    lines: List[str] = []
+    lines += rnd.sample(STDLIB_IMPORT_LINES, 3)
+    lines += ['', '']
+    for i in range(FUNCTIONS_PER_MODULE):
+        name = f'function_{module_index}_{i}'
+        lines += _signature(name, rnd, '', False)
+        lines += _body('', rnd, name)
+        lines += ['', '']
+    for i in range(CLASSES_PER_MODULE):
+        class_name = f'Class{module_index}x{i}'
+        lines += [
+            f'class {class_name}:',
+            f'    """ Docstring of {class_name}.',
+            '    """',
+            '',
+        ]
+        for j in range(METHODS_PER_CLASS):
+            name = f'method_{j}'
+            lines += _signature(name, rnd, '    ', True)
+            lines += _body('    ', rnd, name)
+            lines += ['']
+        lines += ['']
+    return lines
+
+
+def generate_project(root: str, module_num: int, seed: int = 0) -> List[str]:
+    """ Generate a project of `module_num` modules under `root`.
+
+    Modules are spread over nested packages. It returns the paths of
+    the generated modules.
+    """
+    rnd = random.Random(seed)
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    (root_path / 'setup.py').touch()
+
+    paths: List[str] = []
+    package_dirs = [root_path / 'package']
+    package_i = 0
+    while len(paths) < module_num:
+        package_dir = package_dirs[package_i]
+        package_i += 1
+        package_dir.mkdir(parents=True, exist_ok=True)
+        (package_dir / '__init__.py').touch()
+        for sub_i in range(PACKAGES_PER_PACKAGE):
+            package_dirs.append(package_dir / f'sub{sub_i}')
+        for _ in range(MODULES_PER_PACKAGE):
+            if len(paths) >= module_num:
+                break
+            path = package_dir / f'mod{len(paths)}.py'
+            path.write_text('\n'.join(module_lines(len(paths), rnd)) + '\n')
+            paths.append(str(path))
+    return paths
@@ -0,0 +1,83 @@
+"""
+Latency of recent nayvy operations
+"""
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Sequence, TypeVar, cast
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Number of recent calls kept for each operation
+DEFAULT_WINDOW = 256
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """ Get the `q`-th percentile (0 < q <= 100) by the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    sorted_values = sorted(values)
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+@dataclass(frozen=True)
+class LatencySummary:
+
+    count: int
+    p50: float
+    p95: float
+
+    @classmethod
+    def of(cls, seconds: Sequence[float]) -> 'LatencySummary':
+        return LatencySummary(
+            len(seconds),
+            percentile(seconds, 50),
+            percentile(seconds, 95),
+        )
+
+
+class LatencyRecorder:
+    """
+    Sliding window of elapsed seconds of recent calls, by operation.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW) -> None:
+        self._window = window
+        self._seconds: Dict[str, Deque[float]] = {}
+        return
+
+    def record(self, name: str, seconds: float) -> None:
+        self._seconds.setdefault(
+            name,
+            deque(maxlen=self._window),
+        ).append(seconds)
+        return
+
+    def summary(self) -> Dict[str, LatencySummary]:
+        return {
+            name: LatencySummary.of(list(seconds))
+            for name, seconds in sorted(self._seconds.items())
+        }
+
+    def clear(self) -> None:
+        self._seconds.clear()
+        return
+
+
+def recorded(recorder: LatencyRecorder) -> Callable[[F], F]:
+    """ Decorator recording elapsed seconds of each call into `recorder`.
+    """
+    def decorator(f: F) -> F:
+        @wraps(f)
+        def wrapper(*args: Any, **kw: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return f(*args, **kw)
+            finally:
+                recorder.record(f.__name__, time.perf_counter() - start)
+        return cast(F, wrapper)
+    return decorator
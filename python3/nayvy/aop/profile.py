@@ -0,0 +1,96 @@
+"""
+Profiling of the next nayvy operation with cProfile
+
+`request_profile` arms the profiler, and the next call of
+a function wrapped with `profiled` runs under cProfile.
+Its stats are dumped as a `.pstats` file (readable by `pstats` or snakeviz)
+and summarized into the top-N functions by cumulative time.
+"""
+import io
+import os
+import pstats
+import cProfile
+from os.path import dirname
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Optional, TypeVar, cast
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+DEFAULT_TOP_N = 30
+
+
+@dataclass(frozen=True)
+class ProfileRequest:
+
+    pstats_path: str
+    top_n: int = DEFAULT_TOP_N
+
+
+@dataclass(frozen=True)
+class ProfileResult:
+
+    entry: str
+    pstats_path: str
+    summary: str
+
+
+_request: Optional[ProfileRequest] = None
+
+
+def request_profile(pstats_path: str, top_n: int = DEFAULT_TOP_N) -> None:
+    """ Profile the next call of a `profiled` function.
+    """
+    global _request
+    _request = ProfileRequest(pstats_path, top_n)
+    return
+
+
+def pending_profile() -> Optional[ProfileRequest]:
+    return _request
+
+
+def cancel_profile() -> None:
+    global _request
+    _request = None
+    return
+
+
+def summarize(profile: cProfile.Profile, top_n: int) -> str:
+    """ Render the `top_n` functions by cumulative time
+    (and by internal time, where hot loops show up).
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream).strip_dirs()
+    stats.sort_stats('cumulative').print_stats(top_n)
+    stats.sort_stats('tottime').print_stats(top_n)
+    return stream.getvalue()
+
+
+def profiled(on_profiled: Callable[[ProfileResult], None]) -> Callable[[F], F]:
+    """ Decorator of entry points running under cProfile
+    if a profile is requested, and passing the result to `on_profiled`.
+    """
+    def decorator(f: F) -> F:
+        @wraps(f)
+        def wrapper(*args: Any, **kw: Any) -> Any:
+            global _request
+            request = _request
+            if request is None:
+                return f(*args, **kw)
+            # Entry points called inside are profiled as a part of this call.
+            _request = None
+
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(f, *args, **kw)
+            finally:
+                os.makedirs(dirname(request.pstats_path) or '.', exist_ok=True)
+                profile.dump_stats(request.pstats_path)
+                on_profiled(ProfileResult(
+                    f.__name__,
+                    request.pstats_path,
+                    summarize(profile, request.top_n),
+                ))
+        return cast(F, wrapper)
+    return decorator
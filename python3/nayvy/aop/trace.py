@@ -0,0 +1,158 @@
+"""
+Opt-in per-phase timing of nayvy operations
+
+Library code marks its phases with `phase` and reports sizes with `count`.
+They are no-ops unless the call is wrapped with `traced`,
+which appends one JSON line per call to the trace file.
+"""
+import json
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    cast,
+)
+
+T = TypeVar('T')
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+class Trace:
+    """ Timings of one traced call.
+
+    Phases can be nested, and the time spent in an inner phase
+    is excluded from the outer one.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # [started at, time spent in inner phases]
+        self._stack: List[List[float]] = []
+        return
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._stack.append([time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            start, inner = self._stack.pop()
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - inner
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def count(self, key: str, value: int = 1) -> None:
+        self.counts[key] = self.counts.get(key, 0) + value
+        return
+
+    def to_dict(self, total_seconds: float) -> Dict[str, Any]:
+        return {
+            'timestamp': time.time(),
+            'entry': self.name,
+            'total_seconds': total_seconds,
+            'phases': self.phases,
+            'counts': self.counts,
+        }
+
+
+# Traces are per thread, so that background work (i.g. index warm-up)
+# is not attributed to the command traced in the foreground.
+_local = threading.local()
+
+
+def current_trace() -> Optional[Trace]:
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """ Attribute the time spent in the block to the phase `name`.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    with trace.phase(name):
+        yield
+
+
+def count(key: str, value: int = 1) -> None:
+    """ Add `value` to the counter `key` of the current trace.
+    """
+    trace = current_trace()
+    if trace is not None:
+        trace.count(key, value)
+    return
+
+
+def timed_iter(iterable: Iterable[T], name: str) -> Iterator[T]:
+    """ Attribute the time spent producing each item to the phase `name`.
+    """
+    if current_trace() is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def payload_size(result: Any) -> int:
+    """ Approximate size of the value handed to the editor.
+    """
+    try:
+        return len(json.dumps(result, default=str))
+    except Exception:
+        return 0
+
+
+def traced(get_trace_file: Callable[[], str]) -> Callable[[F], F]:
+    """ Decorator of entry points appending their trace
+    to the file given by `get_trace_file` (disabled if it is empty).
+
+    Entry points called inside another traced call are
+    recorded as a phase of the outer call.
+    """
+    def decorator(f: F) -> F:
+        @wraps(f)
+        def wrapper(*args: Any, **kw: Any) -> Any:
+            if current_trace() is not None:
+                with phase(f.__name__):
+                    return f(*args, **kw)
+            trace_file = get_trace_file()
+            if not trace_file:
+                return f(*args, **kw)
+
+            trace = Trace(f.__name__)
+            _local.trace = trace
+            start = time.perf_counter()
+            try:
+                result = f(*args, **kw)
+            finally:
+                _local.trace = None
+            total_seconds = time.perf_counter() - start
+            trace.count('payload_bytes', payload_size(result))
+            try:
+                with open(trace_file, 'a') as fp:
+                    fp.write(json.dumps(trace.to_dict(total_seconds)) + '\n')
+            except OSError:
+                pass
+            return result
+        return cast(F, wrapper)
+    return decorator
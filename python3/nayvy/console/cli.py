@@ -1,13 +1,23 @@
+import os
 import sys
-from typing import Any
+import time
+from typing import Any, Tuple
 
 import click
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
 
+from nayvy.aop.latency import LatencyRecorder
+from nayvy.importing.fixer import LinterForFix
+from nayvy.importing.ranking import CompletionMatcher, ImportRanker
 from nayvy.projects.path import (
     ProjectImportHelperBuilder,
     ImportPathFormat,
 )
+from nayvy.projects.registry import ProjectImportHelperRegistry, render_stats
+from nayvy.service.local import NayvyService, ServiceOptions
+from nayvy.service.lsp import DEFAULT_COMPLETION_LIMIT, LanguageServer
+from nayvy.service.rpc import RpcServer, get_default_socket_path, serve_unix
+from ..projects.modules.cache import CacheStats
 from ..projects.modules.loader import SyntacticModuleLoader
 
 CONTEXT_SETTINGS = dict(
@@ -99,5 +109,299 @@ def list_imports(
     return
 
 
+@nayvy_sub_command
+@click.argument('python_script_path', nargs=1)
+@click.option(
+    '--cache/--no-cache',
+    default=False,
+    help='Use the persistent module cache.',
+)
+@click.option(
+    '--cache-dir',
+    default='',
+    help='Directory of the module cache (XDG cache dir if empty).',
+)
+@click.option('--workers', default=0, help='Number of processes parsing project files.')
+@click.option('--queries', default=100, help='Number of sample completion queries.')
+@click.option(
+    '--limit',
+    default=200,
+    help='Max number of candidates of each completion query.',
+)
+def stats(
+    python_script_path: str,
+    cache: bool,
+    cache_dir: str,
+    workers: int,
+    queries: int,
+    limit: int,
+) -> None:
+    """ Build the project index and report its size, cache hit rates and latency.
+    """
+    cache_stats = CacheStats()
+    registry = ProjectImportHelperRegistry()
+    latencies = LatencyRecorder()
+    builder = ProjectImportHelperBuilder(
+        python_script_path,
+        SyntacticModuleLoader(),
+        ImportPathFormat.ALL_ABSOLUTE,
+        ['setup.py', 'pyproject.toml'],
+        False,
+        use_cache=cache,
+        cache_root=cache_dir,
+        workers=workers,
+        cache_stats=cache_stats,
+    )
+    start = time.perf_counter()
+    helper = registry.get(builder)
+    latencies.record('build', time.perf_counter() - start)
+    if helper is None:
+        panic('Failed to load project')
+        return
+
+    # Complete the first characters of names spread over the index.
+    names = sorted(name for name, _ in helper.items())
+    step = max(len(names) // queries, 1) if queries > 0 else len(names) + 1
+    ranker = ImportRanker(helper.current_mod_path, helper.index.module_of)
+    for name in names[::step][:queries]:
+        start = time.perf_counter()
+        ranker.rank(helper, name[:2], limit)
+        latencies.record('completion', time.perf_counter() - start)
+
+    for line in render_stats(
+        registry.project_stats(),
+        {
+            'project index': registry.stats,
+            'module cache': cache_stats,
+        },
+        latencies.summary(),
+    ):
+        print(line)
+    return
+
+
+@nayvy_sub_command
+@click.argument('python_script_path', nargs=1)
+@click.argument('query', nargs=1)
+@click.option(
+    '--sqlite/--no-sqlite',
+    default=False,
+    help='Search the SQLite database of the project.',
+)
+@click.option(
+    '--cache-dir',
+    default='',
+    help='Directory of the database (XDG cache dir if empty).',
+)
+@click.option('--limit', default=20, help='Max number of symbols found.')
+def search(
+    python_script_path: str,
+    query: str,
+    sqlite: bool,
+    cache_dir: str,
+    limit: int,
+) -> None:
+    """ Search symbols whose names or docstrings contain all words of QUERY.
+    """
+    builder = ProjectImportHelperBuilder(
+        python_script_path,
+        SyntacticModuleLoader(),
+        ImportPathFormat.ALL_ABSOLUTE,
+        ['setup.py', 'pyproject.toml'],
+        False,
+        cache_root=cache_dir,
+        sqlite=sqlite,
+    )
+    helper = builder.build()
+    if helper is None:
+        panic('Failed to load project')
+        return
+
+    for name in helper.index.search(query, limit):
+        single_import = helper[name]
+        if single_import is not None:
+            print(single_import.to_line(color=True))
+    return
+
+
+def _log(msg: str) -> None:
+    print(msg, file=sys.stderr)
+    return
+
+
+def service_options(f: Any) -> Any:
+    """ Options of the service kept by `serve` and `lsp`
+    """
+    for option in reversed([
+        click.option(
+            '--import-config-path',
+            default='',
+            help='Path of the import config.',
+        ),
+        click.option(
+            '--import-path-format',
+            type=click.Choice([f.value for f in ImportPathFormat]),
+            default=ImportPathFormat.ALL_RELATIVE.value,
+        ),
+        click.option(
+            '--linter',
+            type=click.Choice([linter.value for linter in LinterForFix]),
+            default=LinterForFix.RUFF.value,
+        ),
+        click.option(
+            '--matcher',
+            type=click.Choice([matcher.value for matcher in CompletionMatcher]),
+            default=CompletionMatcher.FUZZY.value,
+        ),
+        click.option(
+            '--cache/--no-cache',
+            default=False,
+            help='Use the persistent module cache.',
+        ),
+        click.option(
+            '--cache-dir',
+            default='',
+            help='Directory of the module cache (XDG cache dir if empty).',
+        ),
+        click.option(
+            '--workers',
+            default=0,
+            help=(
+                'Number of processes parsing project files '
+                '(`serve --socket` uses them only with --build).'
+            ),
+        ),
+        click.option('--lazy-signature/--no-lazy-signature', default=False),
+        click.option(
+            '--warmup/--no-warmup',
+            default=False,
+            help='Never block completion while building indices.',
+        ),
+        click.option(
+            '--memory-mb',
+            default=0,
+            help='Memory budget of project indices in MiB (unlimited if 0).',
+        ),
+        click.option(
+            '--watch/--no-watch',
+            default=False,
+            help='Reflect scripts changed outside editors into indices.',
+        ),
+        click.option(
+            '--compact/--no-compact',
+            default=False,
+            help='Keep project symbols in compact columns.',
+        ),
+        click.option(
+            '--mmap/--no-mmap',
+            default=False,
+            help='Start from indices mapped from files written before.',
+        ),
+        click.option(
+            '--sqlite/--no-sqlite',
+            default=False,
+            help='Keep project symbols in SQLite databases.',
+        ),
+    ]):
+        f = option(f)
+    return f
+
+
+def new_service(latencies: LatencyRecorder, **options: Any) -> NayvyService:
+    return NayvyService(
+        ServiceOptions(
+            import_config_path=options['import_config_path'],
+            import_path_format=ImportPathFormat(options['import_path_format']),
+            linter_for_fix=LinterForFix(options['linter']),
+            index_cache=options['cache'],
+            index_cache_dir=options['cache_dir'],
+            index_workers=options['workers'],
+            lazy_signature=options['lazy_signature'],
+            index_warmup=options['warmup'],
+            index_memory_mb=options['memory_mb'],
+            index_watch=options['watch'],
+            index_compact=options['compact'],
+            index_mmap=options['mmap'],
+            index_sqlite=options['sqlite'],
+            completion_matcher=CompletionMatcher(options['matcher']),
+        ),
+        warning=_log,
+        error=_log,
+        latencies=latencies,
+    )
+
+
+@nayvy_sub_command
+@click.option(
+    '--socket',
+    'socket_path',
+    default='',
+    help='Unix socket path (default: $XDG_RUNTIME_DIR/nayvy.sock).',
+)
+@click.option(
+    '--stdio',
+    is_flag=True,
+    help='Serve a single client over stdin/stdout instead of a socket.',
+)
+@click.option(
+    '--build',
+    'build_paths',
+    multiple=True,
+    help='Build the index of the project of the script before serving.',
+)
+@service_options
+def serve(
+    socket_path: str,
+    stdio: bool,
+    build_paths: Tuple[str, ...],
+    **options: Any,
+) -> None:
+    """ Keep project indices in memory and serve JSON-RPC requests of editors.
+    """
+    latencies = LatencyRecorder()
+    service = new_service(latencies, **options)
+    # Requests on the socket are handled on threads, where forking
+    # the workers is unsafe, so indices to parse in parallel are built
+    # by the main thread before serving.
+    for build_path in build_paths:
+        service.get_stmt_map(os.path.abspath(build_path))
+    if options['workers'] > 1 and not build_paths and not stdio:
+        _log('nayvy: --workers takes effect only on indices built with --build')
+    rpc_server = RpcServer(service, latencies)
+    if stdio:
+        rpc_server.serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+        return
+    socket_path = socket_path or get_default_socket_path()
+    _log(f'nayvy: serving on {socket_path}')
+    try:
+        serve_unix(rpc_server, socket_path)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        panic(f'nayvy: failed to serve on {socket_path}: {e}')
+    return
+
+
+@nayvy_sub_command
+@click.option(
+    '--completion-limit',
+    default=DEFAULT_COMPLETION_LIMIT,
+    help='Max number of completion items.',
+)
+@service_options
+def lsp(
+    completion_limit: int,
+    **options: Any,
+) -> None:
+    """ Run as a language server over stdio.
+    """
+    service = new_service(LatencyRecorder(), **options)
+    LanguageServer(service, completion_limit).serve(
+        sys.stdin.buffer,
+        sys.stdout.buffer,
+    )
+    return
+
+
 def main() -> None:
     cli()
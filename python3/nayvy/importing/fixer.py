@@ -8,7 +8,9 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Any, Generator, List, Optional, Tuple
 
+from ..aop.trace import phase
 from .import_statement import ImportStatement, SingleImport
+from .name_index import SortedNameIndex
 from .utils import get_first_line_num, get_import_block_indices
 
 
@@ -50,6 +52,18 @@ class ImportStatementMap(metaclass=ABCMeta):
     def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
         raise NotImplementedError
 
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        """ Get names starting with `prefix` (case-insensitive).
+
+        Names are sorted case-insensitively, and at most `limit` names
+        are returned if `limit` is positive.
+        Implementations holding many names should override this
+        with an indexed lookup.
+        """
+        return SortedNameIndex(
+            name for name, _ in self.items()
+        ).prefixed(prefix, limit)
+
 
 @dataclass(frozen=True)
 class Fixer:
@@ -145,31 +159,33 @@ class Fixer:
         return res_lines
 
     def fix_lines(self, lines: List[str]) -> Optional[List[str]]:
-        lint_job = sp.run(
-            self.lint_engine.get_cmd_piped(),
-            shell=True,
-            input='\n'.join(lines).encode('utf-8'),
-            stdout=sp.PIPE,
-            stderr=sp.DEVNULL,
-        )
-
-        # Extract result
-        lint_output = lint_job.stdout.decode('utf-8')
-
-        # Parse output
-        unused_imports, undefined_names = self.lint_engine.parse_output(
-            lint_output,
-        )
+        with phase('lint'):
+            lint_job = sp.run(
+                self.lint_engine.get_cmd_piped(),
+                shell=True,
+                input='\n'.join(lines).encode('utf-8'),
+                stdout=sp.PIPE,
+                stderr=sp.DEVNULL,
+            )
+
+            # Extract result
+            lint_output = lint_job.stdout.decode('utf-8')
+
+            # Parse output
+            unused_imports, undefined_names = self.lint_engine.parse_output(
+                lint_output,
+            )
         if not unused_imports and not undefined_names:
             # If there is no problem, return None
             # for prevent vim from updating buffer.
             return None
 
-        fixed_lines = self._fix_lines(
-            lines,
-            unused_imports,
-            undefined_names,
-        )
+        with phase('fix'):
+            fixed_lines = self._fix_lines(
+                lines,
+                unused_imports,
+                undefined_names,
+            )
         return fixed_lines
 
     def add_imports(
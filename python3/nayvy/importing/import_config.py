@@ -5,6 +5,7 @@ from pathlib import Path
 
 from .fixer import ImportStatementMap
 from .import_statement import SingleImport, ImportStatement
+from .name_index import SortedNameIndex
 
 
 class ImportConfig(ImportStatementMap):
@@ -15,6 +16,7 @@ class ImportConfig(ImportStatementMap):
 
     def __init__(self, import_d: Dict[str, SingleImport]) -> None:
         self._import_d = import_d
+        self._name_index: Optional[SortedNameIndex] = None
         return
 
     def __getitem__(self, name: str) -> Optional[SingleImport]:
@@ -24,6 +26,11 @@ class ImportConfig(ImportStatementMap):
         for k, v in self._import_d.items():
             yield (k, v)
 
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        if self._name_index is None:
+            self._name_index = SortedNameIndex(self._import_d)
+        return self._name_index.prefixed(prefix, limit)
+
     @classmethod
     def init(
         cls,
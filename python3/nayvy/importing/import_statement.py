@@ -1,14 +1,20 @@
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pprint import pformat
 
+from nayvy.projects.modules.loader import ModuleLoader
 from nayvy.projects.modules.models import Class, Function
 
 from ..utils.colors import Color
 
 
 class ImportAsPart:
+    """
+    Immutable part of an import statement (`import_what as as_what  # comment`).
+    """
+
+    __slots__ = ('_import_what', '_as_what', '_comment')
 
     IMPORT_AS_RE = r'(?P<import>[\w\.]+)( +as +(?P<as>[\w\.]+)){0,1}( *#(?P<comment>.*)){0,1}'  # noqa
 
@@ -71,6 +77,17 @@ class ImportAsPart:
             comment = ''
         return ImportAsPart(import_what, as_what, comment)
 
+    def _key(self) -> Tuple[str, str, str]:
+        return (self._import_what, self._as_what, self._comment)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ImportAsPart):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
     def __repr__(self) -> str:
         return '{}{}{}'.format(
             self.import_what,
@@ -85,6 +102,8 @@ class ImportStatement:
     i.g.) import tensorflow as tf
     """
 
+    __slots__ = ('_from_what', '_import_as_parts')
+
     FROM_IMPORT_STATEMENT_RE = r'from +(?P<from>[\w\.]+) +import +(?P<other>.*)'
 
     @property
@@ -372,6 +391,18 @@ class SingleImport:
     for the purpose of rendering rich-information in floating window of completion.
     """
 
+    __slots__ = (
+        'name',
+        'statement',
+        'level',
+        'func',
+        'klass',
+        'filepath',
+        'line_begin',
+        'line_end',
+        '_dict_cache',
+    )
+
     # Required
     name: str
     statement: str
@@ -381,6 +412,12 @@ class SingleImport:
     func: Optional[Function]
     klass: Optional[Class]
 
+    # Location of the definition, which is set instead of `func` and `klass`
+    # when they are loaded lazily.
+    filepath: str
+    line_begin: int
+    line_end: int
+
     def __init__(
         self,
         name: str,
@@ -388,6 +425,9 @@ class SingleImport:
         level: int,
         func: Optional[Function] = None,
         klass: Optional[Class] = None,
+        filepath: str = '',
+        line_begin: int = -1,
+        line_end: int = -1,
     ) -> None:
         self.name = name
         self.statement = statement
@@ -395,8 +435,70 @@ class SingleImport:
 
         self.func = func
         self.klass = klass
+
+        self.filepath = filepath
+        self.line_begin = line_begin
+        self.line_end = line_end
+
+        # Memoized results of `to_dict` keyed by `statement_trim_width`
+        # (made on the first call, as most of objects are never listed)
+        self._dict_cache: Optional[Dict[int, Dict[str, Any]]] = None
         return
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memoized results are not worth persisting.
+        return {
+            slot: getattr(self, slot)
+            for slot in self.__slots__
+            if slot != '_dict_cache'
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._dict_cache = None
+        return
+
+    @property
+    def is_lazy(self) -> bool:
+        """ Whether the definition is not loaded yet.
+        """
+        return bool(self.filepath) and self.func is None and self.klass is None
+
+    def resolve(self, loader: ModuleLoader) -> 'SingleImport':
+        """ Get SingleImport with its lazily loaded definition.
+        """
+        if not self.is_lazy:
+            return self
+        try:
+            with open(self.filepath) as f:
+                lines = f.readlines()
+        except Exception:
+            return self
+
+        # Blank lines keep line numbers of the definition as they are.
+        mod = loader.load_module_from_lines(
+            [''] * self.line_begin + lines[self.line_begin:self.line_end]
+        )
+        if mod is None or (
+            self.name not in mod.function_map and
+            self.name not in mod.class_map
+        ):
+            # The file is modified after indexed.
+            mod = loader.load_module_from_lines(lines)
+        if mod is None:
+            return self
+        return SingleImport(
+            self.name,
+            self.statement,
+            self.level,
+            mod.function_map.get(self.name),
+            mod.class_map.get(self.name),
+            self.filepath,
+            self.line_begin,
+            self.line_end,
+        )
+
     def to_line(self, color: bool = False) -> str:
         """ Convert object to line selected by fzf
         """
@@ -473,8 +575,18 @@ class SingleImport:
         """
         Convert object to dictionary for getting it convertible to
         vim variable automatically.
+
+        The result is memoized, as the object is never modified after
+        constructed (updated index holds new objects instead).
+        It is reused as long as the same object is listed again,
+        i.g. while `ProjectImportHelper` keeps the statements looked up.
         """
-        return {
+        if self._dict_cache is None:
+            self._dict_cache = {}
+        cached = self._dict_cache.get(statement_trim_width)
+        if cached is not None:
+            return cached
+        self._dict_cache[statement_trim_width] = {
             'name': self.name,
             'statement': self.statement,
             'trimmed_statement': self.trim_statement(statement_trim_width),
@@ -482,4 +594,6 @@ class SingleImport:
             'info': self.signature_to_floating_window(),
             'func': self.func.to_dict() if self.func else None,
             'klass': self.klass.to_dict() if self.klass else None,
+            'lazy': self.is_lazy,
         }
+        return self._dict_cache[statement_trim_width]
@@ -0,0 +1,52 @@
+"""
+Import statement map integrating the import config and the project
+"""
+import heapq
+from dataclasses import dataclass
+from typing import Any, Generator, List, Optional, Tuple
+
+from nayvy.projects.path import ProjectImportHelper
+
+from .fixer import ImportStatementMap
+from .import_config import ImportConfig
+from .import_statement import SingleImport
+
+
+@dataclass(frozen=True)
+class IntegratedMap(ImportStatementMap):
+    """ Names defined in the project take precedence over the import config.
+    """
+
+    import_config: ImportConfig
+    project_import_helper: ProjectImportHelper
+
+    def __getitem__(self, name: str) -> Optional[SingleImport]:
+        single_import = self.project_import_helper[name]
+        if single_import is not None:
+            return single_import
+        single_import = self.import_config[name]
+        if single_import is not None:
+            return single_import
+        return None
+
+    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
+        for k, v in self.project_import_helper.items():
+            yield k, v
+
+        for k, v in self.import_config.items():
+            yield k, v
+
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        res: List[str] = []
+        for name in heapq.merge(
+            self.project_import_helper.names_with_prefix(prefix, limit),
+            self.import_config.names_with_prefix(prefix, limit),
+            key=lambda name: (name.lower(), name),
+        ):
+            if res and res[-1] == name:
+                # Defined in both.
+                continue
+            res.append(name)
+            if 0 < limit <= len(res):
+                break
+        return res
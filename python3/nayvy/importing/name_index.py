@@ -0,0 +1,54 @@
+"""
+Sorted index of importable names for prefix queries
+"""
+from bisect import bisect_left, insort
+from typing import Iterable, List, Tuple
+
+
+class SortedNameIndex:
+    """
+    Names sorted case-insensitively,
+    which answers prefix queries by binary search.
+    """
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self._keys: List[Tuple[str, str]] = sorted(
+            {(name.lower(), name) for name in names}
+        )
+        return
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, name: str) -> None:
+        key = (name.lower(), name)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return
+        insort(self._keys, key)
+        return
+
+    def remove(self, name: str) -> None:
+        key = (name.lower(), name)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+        return
+
+    def prefixed(self, prefix: str, limit: int = -1) -> List[str]:
+        """ Get names starting with `prefix` (case-insensitive).
+
+        At most `limit` names are returned if `limit` is positive.
+        """
+        lower_prefix = prefix.lower()
+        res: List[str] = []
+        i = bisect_left(self._keys, (lower_prefix, ''))
+        while i < len(self._keys):
+            lower_name, name = self._keys[i]
+            if not lower_name.startswith(lower_prefix):
+                break
+            res.append(name)
+            if 0 < limit <= len(res):
+                break
+            i += 1
+        return res
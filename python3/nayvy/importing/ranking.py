@@ -0,0 +1,210 @@
+"""
+Ranking of import candidates for completion and fzf
+"""
+import heapq
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from nayvy.projects.path import ImportPathFormat, mod_relpath
+
+from .fixer import ImportStatementMap
+from .import_statement import SingleImport
+
+# Distance used for modules outside the current package
+FAR_MODULE_DISTANCE = 10
+
+# Weights of the match quality
+MATCH_SCORE = 1.0
+CONSECUTIVE_BONUS = 2.0
+BOUNDARY_BONUS = 3.0
+START_BONUS = 4.0
+CASE_BONUS = 0.5
+GAP_PENALTY = 0.2
+
+# Weights of the candidate itself
+LEVEL_PENALTY = 1.0
+DISTANCE_PENALTY = 0.5
+LENGTH_PENALTY = 0.05
+
+
+class CompletionMatcher(Enum):
+    PREFIX = 'prefix'
+    FUZZY = 'fuzzy'
+
+
+def _is_boundary(name: str, i: int) -> bool:
+    """ Check if `name[i]` begins a word in snake_case or CamelCase.
+    """
+    if i == 0:
+        return True
+    prev, c = name[i - 1], name[i]
+    return (
+        prev == '_' or
+        (prev.islower() and c.isupper()) or
+        (not prev.isdigit() and c.isdigit())
+    )
+
+
+def fuzzy_score(query: str, name: str) -> Optional[float]:
+    """ Score how well `name` matches `query` as a subsequence.
+
+    It returns None if `query` is not a case-insensitive subsequence of
+    `name`. Matches on word boundaries (`snake_case` / `CamelCase`),
+    at the beginning and consecutive matches are preferred.
+    """
+    if not query:
+        return 0.0
+    lower_name = name.lower()
+    score = 0.0
+    name_i = 0
+    prev_matched = -2
+    for c in query:
+        lower_c = c.lower()
+        # Prefer the next word boundary to the next plain occurrence.
+        found = -1
+        for j in range(name_i, len(name)):
+            if lower_name[j] != lower_c:
+                continue
+            if found < 0:
+                found = j
+            if _is_boundary(name, j) or j == prev_matched + 1:
+                found = j
+                break
+        if found < 0:
+            return None
+        score += MATCH_SCORE
+        if found == 0:
+            score += START_BONUS
+        elif found == prev_matched + 1:
+            score += CONSECUTIVE_BONUS
+        elif _is_boundary(name, found):
+            score += BOUNDARY_BONUS
+        else:
+            score -= GAP_PENALTY * (found - prev_matched - 1)
+        if name[found] == c:
+            score += CASE_BONUS
+        prev_matched = found
+        name_i = found + 1
+    return score
+
+
+def module_distance(relative_from_what: str) -> int:
+    """ Distance between the current module and
+    the module imported by the relative path `relative_from_what`.
+
+    i.g.)
+        '.mod'         --> 1
+        '..sub.mod'    --> 3
+        'package.mod'  --> FAR_MODULE_DISTANCE (outside the package)
+    """
+    if not relative_from_what.startswith('.'):
+        return FAR_MODULE_DISTANCE
+    stripped = relative_from_what.lstrip('.')
+    up_count = len(relative_from_what) - len(stripped) - 1
+    down_count = len(stripped.split('.')) if stripped else 0
+    return min(up_count + down_count, FAR_MODULE_DISTANCE)
+
+
+class ImportRanker:
+    """
+    Rank import candidates by the match quality of the name,
+    the import level, and the proximity of the defining module
+    to the current module.
+
+    The defining module of each project import is looked up by
+    `module_of` (i.g. `ProjectIndex.module_of`) rather than its statement.
+    """
+
+    def __init__(
+        self,
+        current_mod_path: str = '',
+        module_of: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> None:
+        self._current_mod_path = current_mod_path
+        self._module_of = module_of
+        # module path -> distance from the current module
+        self._distances: Dict[str, int] = {}
+        return
+
+    def _distance(self, name: str) -> int:
+        if self._module_of is None or not self._current_mod_path:
+            return FAR_MODULE_DISTANCE
+        mod_path = self._module_of(name)
+        if mod_path is None:
+            return FAR_MODULE_DISTANCE
+        distance = self._distances.get(mod_path)
+        if distance is None:
+            distance = module_distance(mod_relpath(
+                mod_path,
+                self._current_mod_path,
+                ImportPathFormat.ALL_RELATIVE,
+            ))
+            self._distances[mod_path] = distance
+        return distance
+
+    def score(self, query: str, single_import: SingleImport) -> Optional[float]:
+        match_score = fuzzy_score(query, single_import.name)
+        if match_score is None:
+            return None
+        distance = 0
+        if single_import.level >= 2:
+            # Only project imports have meaningful module distance.
+            distance = self._distance(single_import.name)
+        return (
+            match_score -
+            LEVEL_PENALTY * single_import.level -
+            DISTANCE_PENALTY * distance -
+            LENGTH_PENALTY * len(single_import.name)
+        )
+
+    def rank_candidates(
+        self,
+        query: str,
+        candidates: Iterable[SingleImport],
+        limit: int = -1,
+    ) -> List[SingleImport]:
+        """ Get candidates matching `query` in descending order of score.
+        """
+        scored: List[Tuple[float, str, SingleImport]] = []
+        for single_import in candidates:
+            score = self.score(query, single_import)
+            if score is None:
+                continue
+            scored.append((score, single_import.name, single_import))
+
+        def key(x: Tuple[float, str, SingleImport]) -> Tuple[float, str]:
+            # Ties are broken alphabetically
+            return (-x[0], x[1])
+
+        if limit > 0:
+            top = heapq.nsmallest(limit, scored, key=key)
+        else:
+            top = sorted(scored, key=key)
+        return [single_import for _, _, single_import in top]
+
+    def rank(
+        self,
+        stmt_map: ImportStatementMap,
+        query: str,
+        limit: int = -1,
+    ) -> List[SingleImport]:
+        """ Rank candidates in `stmt_map`.
+
+        Like most completion engines, the first character of `query`
+        must match the first character of the name,
+        which lets candidates be narrowed by the prefix index.
+        """
+        candidates: Iterable[SingleImport]
+        if query:
+            candidates = (
+                single_import for single_import in (
+                    stmt_map[name]
+                    for name in stmt_map.names_with_prefix(query[0])
+                )
+                if single_import is not None
+            )
+        else:
+            candidates = (
+                single_import for _, single_import in stmt_map.items()
+            )
+        return self.rank_candidates(query, candidates, limit)
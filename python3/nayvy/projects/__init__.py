@@ -21,6 +21,9 @@ def _get_root(
 
         if any([exists(f'{tmp_path}/{indicator}') for indicator in indicators]):
             return tmp_path
+        if dirname(tmp_path) == tmp_path:
+            # Reached the file system root
+            break
         tmp_path = dirname(tmp_path)
         lookup_n += 1
     return None
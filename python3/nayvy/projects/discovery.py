@@ -0,0 +1,286 @@
+"""
+In-process discovery of python scripts under a directory
+"""
+import os
+import re
+from dataclasses import dataclass
+from os.path import abspath
+from typing import Iterator, List, Optional, Pattern, Tuple
+
+# Directories never containing importable project modules
+DEFAULT_PRUNE_DIRS = (
+    '.git',
+    '.hg',
+    '.svn',
+    '.venv',
+    '.tox',
+    '__pycache__',
+    'node_modules',
+    'build',
+)
+
+
+def _translate_glob(pattern: str) -> str:
+    """ Translate a gitignore glob into a regular expression
+    matched against a `/` separated relative path.
+    """
+    res = ''
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            res += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            res += '.*'
+            i += 2
+            continue
+        if c == '*':
+            res += '[^/]*'
+        elif c == '?':
+            res += '[^/]'
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                res += re.escape(c)
+            else:
+                char_class = pattern[i + 1:end]
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+                res += '[{}]'.format(char_class)
+                i = end
+        else:
+            res += re.escape(c)
+        i += 1
+    return res
+
+
+@dataclass(frozen=True)
+class GitIgnoreRule:
+    """ One line of `.gitignore`
+    """
+
+    regex: Pattern[str]
+    negated: bool
+    dir_only: bool
+
+    @classmethod
+    def of(cls, line: str) -> Optional['GitIgnoreRule']:
+        line = line.rstrip('\n').rstrip()
+        if not line or line.startswith('#'):
+            return None
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        if line.startswith('\\'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            return None
+        if '/' in line:
+            # Patterns containing a slash are relative to the .gitignore
+            prefix = ''
+            line = line.lstrip('/')
+        else:
+            prefix = '(?:.*/)?'
+        return GitIgnoreRule(
+            re.compile('^{}{}$'.format(prefix, _translate_glob(line))),
+            negated,
+            dir_only,
+        )
+
+
+@dataclass(frozen=True)
+class GitIgnore:
+    """ Rules of `.gitignore` located in `base_dir`
+    """
+
+    base_dir: str
+    rules: Tuple[GitIgnoreRule, ...]
+
+    @classmethod
+    def of_dir(cls, base_dir: str) -> Optional['GitIgnore']:
+        try:
+            with open(os.path.join(base_dir, '.gitignore')) as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        rules = tuple(
+            rule for rule in (GitIgnoreRule.of(line) for line in lines)
+            if rule is not None
+        )
+        if not rules:
+            return None
+        return GitIgnore(base_dir, rules)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """ Check if `path` is ignored.
+
+        It returns None when no rule matches the path.
+        """
+        relpath = os.path.relpath(path, self.base_dir).replace(os.sep, '/')
+        res: Optional[bool] = None
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(relpath):
+                res = not rule.negated
+        return res
+
+
+def is_ignored(path: str, is_dir: bool, gitignores: List[GitIgnore]) -> bool:
+    """ Check `path` against `gitignores` ordered from outermost.
+    """
+    for gitignore in reversed(gitignores):
+        res = gitignore.match(path, is_dir)
+        if res is not None:
+            return res
+    return False
+
+
+@dataclass(frozen=True)
+class PythonDir:
+    """ Entries of one directory relevant to python script discovery
+    """
+
+    path: str
+    # rules applied to entries, including `.gitignore` of the directory
+    gitignores: List[GitIgnore]
+    sub_dirs: List[str]
+    python_paths: List[str]
+
+
+def scan_python_dir(
+    dirpath: str,
+    gitignores: List[GitIgnore],
+    prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+    respect_gitignore: bool = True,
+) -> Optional[PythonDir]:
+    """ List sub directories and '.py' suffixed files directly under `dirpath`
+    in name order, skipping `prune_dirs` and files ignored by `.gitignore`.
+
+    `gitignores` are rules of parent directories ordered from outermost.
+    None is returned if `dirpath` cannot be read.
+    """
+    if respect_gitignore:
+        gitignore = GitIgnore.of_dir(dirpath)
+        if gitignore is not None:
+            gitignores = gitignores + [gitignore]
+    try:
+        with os.scandir(dirpath) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return None
+
+    sub_dirs: List[str] = []
+    python_paths: List[str] = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir:
+            if entry.name in prune_dirs:
+                continue
+            if is_ignored(entry.path, True, gitignores):
+                continue
+            sub_dirs.append(entry.path)
+        elif entry.name.endswith('.py'):
+            if is_ignored(entry.path, False, gitignores):
+                continue
+            python_paths.append(entry.path)
+    return PythonDir(dirpath, gitignores, sub_dirs, python_paths)
+
+
+def walk_python_dirs(
+    root: str,
+    prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+    respect_gitignore: bool = True,
+    gitignores: Optional[List[GitIgnore]] = None,
+) -> Iterator[Tuple[PythonDir, List[GitIgnore]]]:
+    """ Lazily yield scanned directories under `root` (including itself)
+    with rules of their parent directories, in depth-first name order.
+    """
+    stack: List[Tuple[str, List[GitIgnore]]] = [
+        (abspath(root), gitignores or []),
+    ]
+    while stack:
+        dirpath, parent_gitignores = stack.pop()
+        python_dir = scan_python_dir(
+            dirpath,
+            parent_gitignores,
+            prune_dirs,
+            respect_gitignore,
+        )
+        if python_dir is None:
+            continue
+        yield python_dir, parent_gitignores
+        # Reversed so that sub directories are visited in name order.
+        for sub_dir in reversed(python_dir.sub_dirs):
+            stack.append((sub_dir, python_dir.gitignores))
+
+
+def iter_python_paths(
+    root: str,
+    prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+    respect_gitignore: bool = True,
+) -> Iterator[str]:
+    """ Lazily yield absolute paths of all '.py' suffixed files under `root`.
+
+    The directory tree is walked iteratively with `os.scandir`,
+    skipping `prune_dirs` and files ignored by `.gitignore`.
+    """
+    for python_dir, _ in walk_python_dirs(root, prune_dirs, respect_gitignore):
+        yield from python_dir.python_paths
+
+
+def is_python_path(
+    path: str,
+    root: str,
+    prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+    respect_gitignore: bool = True,
+) -> bool:
+    """ Check if `iter_python_paths(root)` yields `path`,
+    without listing directories.
+    """
+    path, root = abspath(path), abspath(root)
+    if not path.endswith('.py') or not path.startswith(root.rstrip(os.sep) + os.sep):
+        return False
+    names = os.path.relpath(path, root).split(os.sep)
+    gitignores: List[GitIgnore] = []
+    dirpath = root
+    for i, name in enumerate(names):
+        if respect_gitignore:
+            gitignore = GitIgnore.of_dir(dirpath)
+            if gitignore is not None:
+                gitignores = gitignores + [gitignore]
+        dirpath = os.path.join(dirpath, name)
+        is_dir = i < len(names) - 1
+        if is_dir and name in prune_dirs:
+            return False
+        if is_ignored(dirpath, is_dir, gitignores):
+            return False
+    return os.path.isfile(path)
+
+
+def walk_order_key(path: str, root: str) -> List[Tuple[int, str]]:
+    """ Key sorting paths under `root` in the order `iter_python_paths` yields.
+
+    Files in a directory precede its sub directories,
+    and both are in name order.
+    """
+    names = os.path.relpath(path, root).split(os.sep)
+    return [(1, name) for name in names[:-1]] + [(0, names[-1])]
+
+
+def mod_walk_order_key(mod_path: str) -> List[Tuple[int, str]]:
+    """ Key sorting module paths in the order their scripts are walked.
+
+    It is `walk_order_key` of the script relative to its project root.
+    Of definitions of one name, the one latest in this order is imported,
+    as when the project is loaded from scratch.
+    """
+    names = mod_path.split('.')
+    return [(1, name) for name in names[:-1]] + [(0, names[-1] + '.py')]
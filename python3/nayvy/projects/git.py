@@ -0,0 +1,110 @@
+"""
+Change detection of python projects in git repositories
+"""
+import subprocess as sp
+from dataclasses import dataclass
+from os.path import abspath, join
+from typing import FrozenSet, Iterable, List, Optional
+
+from nayvy.projects import get_git_root
+
+
+def _run_git(cwd: str, args: List[str]) -> Optional[str]:
+    """ Get stdout of the git command, or None if it fails.
+    """
+    try:
+        job = sp.run(
+            ['git', '-C', cwd, *args],
+            stdout=sp.PIPE,
+            stderr=sp.DEVNULL,
+        )
+    except OSError:
+        # git is not installed
+        return None
+    if job.returncode != 0:
+        return None
+    return job.stdout.decode('utf-8', 'surrogateescape')
+
+
+@dataclass(frozen=True)
+class GitState:
+    """ State of the git repository containing a project root.
+    """
+
+    root: str
+    # path of `root` relative to the toplevel (empty or ending with '/')
+    prefix: str
+    head: str
+    # absolute paths under `root` differing from HEAD
+    # (modified, added, deleted or untracked)
+    dirty_paths: FrozenSet[str]
+    # absolute paths under `root` in the index, whose changes git reports
+    # (unlike files ignored by `.git/info/exclude` or global excludes)
+    tracked_paths: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def of(cls, root: str) -> Optional['GitState']:
+        """ Get the state, or None if `root` is not in a git repository.
+        """
+        if get_git_root(root, 0) is None:
+            # Spawning git is not worth outside repositories.
+            return None
+        output = _run_git(root, ['rev-parse', '--show-prefix', 'HEAD'])
+        if output is None:
+            return None
+        lines = output.split('\n')
+        if len(lines) < 2 or not lines[1]:
+            return None
+        status = _run_git(root, [
+            'status',
+            '--porcelain',
+            '-z',
+            '--no-renames',
+            '--untracked-files=all',
+            '--',
+            '.',
+        ])
+        if status is None:
+            return None
+        tracked = _run_git(root, ['ls-files', '-z', '--full-name', '--', '.'])
+        if tracked is None:
+            return None
+        state = GitState(abspath(root), lines[0], lines[1], frozenset())
+        return GitState(
+            state.root,
+            state.prefix,
+            state.head,
+            # Each entry is `XY path`.
+            state._to_abspaths(entry[3:] for entry in status.split('\0') if entry),
+            state._to_abspaths(path for path in tracked.split('\0') if path),
+        )
+
+    def _to_abspaths(self, paths: Iterable[str]) -> FrozenSet[str]:
+        """ Convert paths relative to the toplevel into absolute paths,
+        keeping symbolic links in `root` unresolved.
+        """
+        return frozenset(
+            join(self.root, path[len(self.prefix):])
+            for path in paths
+            if path.startswith(self.prefix)
+        )
+
+    def changed_since(self, commit: str) -> Optional[FrozenSet[str]]:
+        """ Get absolute paths under `root` changed in the working tree
+        since `commit`, or None if the commit is unknown.
+        """
+        if commit == self.head:
+            # Changes from HEAD are `dirty_paths`.
+            return frozenset()
+        diff = _run_git(self.root, [
+            'diff',
+            '--name-only',
+            '-z',
+            '--no-renames',
+            commit,
+            '--',
+            '.',
+        ])
+        if diff is None:
+            return None
+        return self._to_abspaths(path for path in diff.split('\0') if path)
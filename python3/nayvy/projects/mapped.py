@@ -0,0 +1,388 @@
+"""
+Memory-mapped binary file of a project index
+
+The file is laid out as follows (little endian):
+
+- header: magic, format version, numbers of symbol records,
+  distinct names and modules, and when the scripts were loaded (`time.time_ns()`)
+- symbol records sorted case-insensitively by name, and then
+  from the module latest in walk order (see `mod_walk_order_key`),
+  each of which is (name offset, name length, module id, line begin, line end)
+- module records, each of which is (module path offset/length,
+  file path offset/length, first row, number of rows)
+- rows: ids of symbol records grouped by module
+- string table of UTF-8 encoded names and paths
+
+It is binary-searched in place, so lookups and prefix queries
+never materialize objects of symbols other than those returned.
+"""
+import os
+import mmap
+import pickle
+import struct
+from itertools import islice
+from os.path import dirname
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from nayvy.importing.fixer import ImportStatementMap
+from nayvy.importing.import_statement import SingleImport
+
+from .discovery import mod_walk_order_key
+from .modules.cache import get_project_cache_dir
+
+MAGIC = b'NAYVYMAP'
+
+# Bump this when the layout changes
+MAPPED_FORMAT_VERSION = 2
+
+MAPPED_FILENAME = 'index.map'
+
+# magic, version, record num, symbol num, module num, loaded_at_ns
+HEADER = struct.Struct('<8sIIIIQ')
+# name offset, name length, module id, line begin, line end
+SYMBOL_RECORD = struct.Struct('<IIIii')
+# module path offset/length, file path offset/length, first row, row num
+MODULE_RECORD = struct.Struct('<IIIIII')
+ROW = struct.Struct('<I')
+
+# (name, module path, file path, line begin, line end) of one symbol
+Location = Tuple[str, str, str, int, int]
+
+
+def get_mapped_index_path(root: str, cache_root: str = '') -> str:
+    """ Get the path of the mapped index of the project at `root`.
+    """
+    return '{}/{}'.format(
+        get_project_cache_dir(root, cache_root),
+        MAPPED_FILENAME,
+    )
+
+
+def _sort_key(name: str) -> Tuple[str, str]:
+    # Same order as `SortedNameIndex`
+    return (name.lower(), name)
+
+
+def write_mapped_index(
+    path: str,
+    locations: Iterable[Location],
+    loaded_at_ns: int,
+) -> None:
+    """ Write symbols at `locations` to `path`.
+
+    Every definition of a name is written, so that the next one
+    is imported if modules of the former ones are loaded again.
+    Failures are silently ignored, as the index can be built again.
+    """
+    symbols = sorted(
+        locations,
+        key=lambda location: mod_walk_order_key(location[1]),
+        reverse=True,
+    )
+    symbols.sort(key=lambda location: _sort_key(location[0]))
+    strings = bytearray()
+    string_offsets: Dict[str, Tuple[int, int]] = {}
+
+    def intern(s: str) -> Tuple[int, int]:
+        res = string_offsets.get(s)
+        if res is None:
+            encoded = s.encode('utf-8', 'surrogateescape')
+            res = (len(strings), len(encoded))
+            strings.extend(encoded)
+            string_offsets[s] = res
+        return res
+
+    mod_ids: Dict[str, int] = {}
+    mod_filepaths: List[str] = []
+    mod_rows: List[List[int]] = []
+    records = bytearray()
+    for row, (name, mod_path, filepath, line_begin, line_end) in enumerate(symbols):
+        mod_id = mod_ids.get(mod_path)
+        if mod_id is None:
+            mod_id = len(mod_ids)
+            mod_ids[mod_path] = mod_id
+            mod_filepaths.append(filepath)
+            mod_rows.append([])
+        mod_rows[mod_id].append(row)
+        records += SYMBOL_RECORD.pack(*intern(name), mod_id, line_begin, line_end)
+
+    modules = bytearray()
+    rows = bytearray()
+    row_num = 0
+    for mod_path, mod_id in mod_ids.items():
+        modules += MODULE_RECORD.pack(
+            *intern(mod_path),
+            *intern(mod_filepaths[mod_id]),
+            row_num,
+            len(mod_rows[mod_id]),
+        )
+        for row in mod_rows[mod_id]:
+            rows += ROW.pack(row)
+        row_num += len(mod_rows[mod_id])
+
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC,
+                MAPPED_FORMAT_VERSION,
+                len(symbols),
+                len({location[0] for location in symbols}),
+                len(mod_ids),
+                loaded_at_ns,
+            ))
+            f.write(records)
+            f.write(modules)
+            f.write(rows)
+            f.write(strings)
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+    return
+
+
+class MappedIndex(ImportStatementMap):
+    """
+    Read-only project index in a file written by `write_mapped_index`.
+
+    Statements import symbols from their absolute module paths,
+    and definitions are to be loaded lazily (see `SingleImport.resolve`).
+    Of modules defining the same name, the one latest in walk order
+    is imported, unless given in `masked_mods` of lookups.
+    """
+
+    def __init__(
+        self,
+        buf: mmap.mmap,
+        record_num: int,
+        symbol_num: int,
+        module_num: int,
+        loaded_at_ns: int,
+    ) -> None:
+        self._buf = buf
+        self.record_num = record_num
+        self.symbol_num = symbol_num
+        self.module_num = module_num
+        self.loaded_at_ns = loaded_at_ns
+        self._modules_offset = HEADER.size + record_num * SYMBOL_RECORD.size
+        self._rows_offset = self._modules_offset + module_num * MODULE_RECORD.size
+        self._strings_offset = self._rows_offset + record_num * ROW.size
+        # module path -> module id, made on the first query by module path
+        self._mod_ids: Optional[Dict[str, int]] = None
+        return
+
+    @classmethod
+    def open(cls, path: str) -> Optional['MappedIndex']:
+        """ Map the file at `path`.
+
+        Missing, broken or incompatible files are silently ignored.
+        """
+        try:
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # ValueError is raised for an empty file.
+            return None
+        try:
+            magic, version, record_num, symbol_num, module_num, loaded_at_ns = (
+                HEADER.unpack_from(buf, 0)
+            )
+        except struct.error:
+            buf.close()
+            return None
+        index = MappedIndex(buf, record_num, symbol_num, module_num, loaded_at_ns)
+        if (
+            magic != MAGIC or
+            version != MAPPED_FORMAT_VERSION or
+            len(buf) < index._strings_offset
+        ):
+            buf.close()
+            return None
+        return index
+
+    def __reduce__(self) -> Any:
+        raise pickle.PicklingError('MappedIndex is written by write_mapped_index')
+
+    def close(self) -> None:
+        self._buf.close()
+        return
+
+    def _string(self, offset: int, length: int) -> str:
+        begin = self._strings_offset + offset
+        return self._buf[begin:begin + length].decode('utf-8', 'surrogateescape')
+
+    def _record(self, row: int) -> Tuple[int, int, int, int, int]:
+        return SYMBOL_RECORD.unpack_from(
+            self._buf,
+            HEADER.size + row * SYMBOL_RECORD.size,
+        )
+
+    def _name(self, row: int) -> str:
+        name_offset, name_length, _, _, _ = self._record(row)
+        return self._string(name_offset, name_length)
+
+    def _module(self, mod_id: int) -> Tuple[int, int, int, int, int, int]:
+        return MODULE_RECORD.unpack_from(
+            self._buf,
+            self._modules_offset + mod_id * MODULE_RECORD.size,
+        )
+
+    def _module_path(self, mod_id: int) -> str:
+        path_offset, path_length, _, _, _, _ = self._module(mod_id)
+        return self._string(path_offset, path_length)
+
+    def _lower_bound(self, key: Tuple[str, str]) -> int:
+        lo, hi = 0, self.record_num
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _sort_key(self._name(mid)) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(
+        self,
+        name: str,
+        masked_mods: AbstractSet[str] = frozenset(),
+    ) -> Optional[int]:
+        """ Get the row of the definition of `name` imported,
+        skipping modules in `masked_mods`.
+        """
+        row = self._lower_bound(_sort_key(name))
+        while row < self.record_num and self._name(row) == name:
+            if not masked_mods:
+                return row
+            _, _, mod_id, _, _ = self._record(row)
+            if self._module_path(mod_id) not in masked_mods:
+                return row
+            row += 1
+        return None
+
+    def _single_import(self, row: int) -> SingleImport:
+        name_offset, name_length, mod_id, line_begin, line_end = self._record(row)
+        name = self._string(name_offset, name_length)
+        path_offset, path_length, filepath_offset, filepath_length, _, _ = (
+            self._module(mod_id)
+        )
+        return SingleImport(
+            name,
+            'from {} import {}'.format(
+                self._string(path_offset, path_length),
+                name,
+            ),
+            2,  # project level
+            filepath=self._string(filepath_offset, filepath_length),
+            line_begin=line_begin,
+            line_end=line_end,
+        )
+
+    def _get_mod_ids(self) -> Dict[str, int]:
+        if self._mod_ids is None:
+            self._mod_ids = {
+                self._module_path(mod_id): mod_id
+                for mod_id in range(self.module_num)
+            }
+        return self._mod_ids
+
+    def has_module(self, mod_path: str) -> bool:
+        return mod_path in self._get_mod_ids()
+
+    def module_paths(self) -> List[str]:
+        return list(self._get_mod_ids())
+
+    def module_names(self, mod_path: str) -> List[str]:
+        mod_id = self._get_mod_ids().get(mod_path)
+        if mod_id is None:
+            return []
+        _, _, _, _, first_row, row_num = self._module(mod_id)
+        begin = self._rows_offset + first_row * ROW.size
+        return [
+            self._name(row)
+            for row, in ROW.iter_unpack(self._buf[begin:begin + row_num * ROW.size])
+        ]
+
+    def module_of(
+        self,
+        name: str,
+        masked_mods: AbstractSet[str] = frozenset(),
+    ) -> Optional[str]:
+        """ Get the module path `name` is imported from.
+        """
+        row = self._find(name, masked_mods)
+        if row is None:
+            return None
+        _, _, mod_id, _, _ = self._record(row)
+        return self._module_path(mod_id)
+
+    def lookup(
+        self,
+        name: str,
+        masked_mods: AbstractSet[str] = frozenset(),
+    ) -> Optional[SingleImport]:
+        """ Get the statement of `name`, skipping modules in `masked_mods`.
+        """
+        row = self._find(name, masked_mods)
+        if row is None:
+            return None
+        return self._single_import(row)
+
+    def iter_locations(self) -> Iterator[Location]:
+        """ Iterate locations of every definition, including shadowed ones.
+        """
+        for row in range(self.record_num):
+            name_offset, name_length, mod_id, line_begin, line_end = self._record(row)
+            path_offset, path_length, filepath_offset, filepath_length, _, _ = (
+                self._module(mod_id)
+            )
+            yield (
+                self._string(name_offset, name_length),
+                self._string(path_offset, path_length),
+                self._string(filepath_offset, filepath_length),
+                line_begin,
+                line_end,
+            )
+
+    def iter_names_with_prefix(self, prefix: str) -> Iterator[str]:
+        """ Iterate names starting with `prefix` (case-insensitive) in order.
+        """
+        lower_prefix = prefix.lower()
+        row = self._lower_bound((lower_prefix, ''))
+        last_name = None
+        while row < self.record_num:
+            name = self._name(row)
+            if not name.lower().startswith(lower_prefix):
+                break
+            if name != last_name:
+                yield name
+                last_name = name
+            row += 1
+
+    # Override
+    def __getitem__(self, name: str) -> Optional[SingleImport]:
+        return self.lookup(name)
+
+    # Override
+    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
+        last_name = None
+        for row in range(self.record_num):
+            single_import = self._single_import(row)
+            if single_import.name != last_name:
+                yield single_import.name, single_import
+                last_name = single_import.name
+
+    # Override
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        names = self.iter_names_with_prefix(prefix)
+        return list(islice(names, limit) if limit > 0 else names)
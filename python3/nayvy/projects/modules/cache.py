@@ -0,0 +1,293 @@
+"""
+Persistent cache of loaded `Module` objects
+"""
+import os
+import pickle
+import hashlib
+from dataclasses import dataclass
+from os.path import abspath, basename, dirname, exists
+from typing import AbstractSet, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+
+from nayvy.projects.discovery import is_python_path, walk_order_key
+from nayvy.projects.git import GitState
+
+from .loader import ModuleLoader
+from .models import FrozenModule, Module
+
+# Bump this when the pickled layout of `FrozenModule` changes
+CACHE_FORMAT_VERSION = 3
+
+CACHE_FILENAME = 'modules.pickle'
+
+# (mtime_ns, size, loaded module)
+# Modules are kept frozen, which are faster to unpickle
+# and cannot be modified by the callers sharing them.
+CacheEntry = Tuple[int, int, FrozenModule]
+
+# (HEAD commit, paths differing from it) when the cache was opened
+GitRevision = Tuple[str, FrozenSet[str]]
+
+
+@dataclass
+class CacheStats:
+    """ Counters of a cache, shared by the caches it is passed to.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def get_cache_root() -> str:
+    """ Get nayvy's cache directory respecting `XDG_CACHE_HOME`.
+    """
+    xdg_root = os.getenv(
+        'XDG_CACHE_HOME',
+        '{}/.cache'.format(
+            os.environ['HOME']
+        )
+    )
+    return '{}/nayvy'.format(xdg_root)
+
+
+def get_project_cache_dir(root: str, cache_root: str = '') -> str:
+    """ Get the cache directory dedicated to the project at `root`.
+    """
+    if not cache_root:
+        cache_root = get_cache_root()
+    project_hash = hashlib.sha1(
+        abspath(root).encode('utf-8'),
+    ).hexdigest()[:16]
+    return '{}/{}'.format(cache_root, project_hash)
+
+
+class CachedModuleLoader(ModuleLoader):
+    """
+    ModuleLoader wrapping another loader, which persists
+    loaded modules of one project root on disk.
+
+    Each entry is keyed by the absolute file path and is reused
+    as long as the mtime and size of the file remain unchanged.
+
+    If the project is in a git repository, the cache records its HEAD.
+    When opened again, entries of files tracked by git and not reported
+    by `git diff` from the recorded HEAD nor `git status` are trusted
+    without `stat` (untracked files, i.g. excluded by `.git/info/exclude`,
+    are always checked),
+    and the scripts of the project are listed without walking directories
+    (see `list_python_paths`).
+    """
+
+    @property
+    def cache_path(self) -> str:
+        return self._cache_path
+
+    def __init__(
+        self,
+        loader: ModuleLoader,
+        cache_path: str,
+        entries: Dict[str, CacheEntry],
+        stats: Optional[CacheStats] = None,
+        git_state: Optional[GitState] = None,
+        stale_paths: Optional[AbstractSet[str]] = None,
+        saved_git_revision: Optional[GitRevision] = None,
+    ) -> None:
+        self._loader = loader
+        self._cache_path = cache_path
+        self._entries = entries
+        self.stats = stats if stats is not None else CacheStats()
+        self._git_state = git_state
+        # paths possibly changed since the cache was saved (None if unknown)
+        self._stale_paths = stale_paths
+        self._touched: Set[str] = set()
+        # The recorded HEAD is updated even if no entry changes.
+        self._dirty = self.git_revision != saved_git_revision
+        return
+
+    @classmethod
+    def open(
+        cls,
+        loader: ModuleLoader,
+        root: str,
+        cache_root: str = '',
+        stats: Optional[CacheStats] = None,
+    ) -> 'CachedModuleLoader':
+        """ Open the cache for the project at `root`.
+
+        Broken or incompatible cache files are silently ignored.
+        """
+        cache_path = '{}/{}'.format(
+            get_project_cache_dir(root, cache_root),
+            CACHE_FILENAME,
+        )
+        entries, git_revision = cls._read(cache_path)
+        git_state = GitState.of(root)
+        stale_paths: Optional[FrozenSet[str]] = None
+        if git_state is not None and git_revision is not None and entries:
+            head, dirty_paths = git_revision
+            changed_paths = git_state.changed_since(head)
+            if changed_paths is not None:
+                stale_paths = changed_paths | git_state.dirty_paths | dirty_paths
+            if stale_paths is not None and any(
+                basename(path) == '.gitignore' for path in stale_paths
+            ):
+                # Scripts to be discovered may have changed.
+                stale_paths = None
+        return CachedModuleLoader(
+            loader,
+            cache_path,
+            entries,
+            stats,
+            git_state,
+            stale_paths,
+            git_revision,
+        )
+
+    @classmethod
+    def _read(
+        cls,
+        cache_path: str,
+    ) -> Tuple[Dict[str, CacheEntry], Optional[GitRevision]]:
+        if not exists(cache_path):
+            return {}, None
+        try:
+            with open(cache_path, 'rb') as f:
+                version, entries, git_revision = pickle.load(f)
+        except Exception:
+            return {}, None
+        if version != CACHE_FORMAT_VERSION or not isinstance(entries, dict):
+            return {}, None
+        return entries, git_revision
+
+    @property
+    def git_revision(self) -> Optional[GitRevision]:
+        if self._git_state is None:
+            return None
+        return (self._git_state.head, self._git_state.dirty_paths)
+
+    def list_python_paths(self) -> Optional[List[str]]:
+        """ Get scripts of the project from cached entries and changes
+        reported by git, in the order `iter_python_paths` yields.
+
+        None is returned unless git tells what changed since the cache was saved.
+        """
+        if self._git_state is None or self._stale_paths is None:
+            return None
+        root = self._git_state.root
+        paths = set(self._entries) - self._stale_paths
+        paths.update(
+            path for path in self._stale_paths
+            if is_python_path(path, root)
+        )
+        return sorted(paths, key=lambda path: walk_order_key(path, root))
+
+    @property
+    def loader(self) -> ModuleLoader:
+        """ The wrapped loader actually parsing scripts.
+        """
+        return self._loader
+
+    def get_fresh(self, module_filepath: str) -> Optional[Module]:
+        """ Get the cached module only if it is still up to date.
+        """
+        filepath = abspath(module_filepath)
+        entry = self._entries.get(filepath)
+        if (
+            entry is not None and
+            self._git_state is not None and
+            self._stale_paths is not None and
+            filepath not in self._stale_paths and
+            filepath in self._git_state.tracked_paths
+        ):
+            # Unchanged according to git
+            self._touched.add(filepath)
+            self.stats.hits += 1
+            return entry[2].thaw()
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            self.stats.misses += 1
+            return None
+        self._touched.add(filepath)
+        if (
+            entry is not None and
+            entry[0] == stat.st_mtime_ns and
+            entry[1] == stat.st_size
+        ):
+            self.stats.hits += 1
+            return entry[2].thaw()
+        self.stats.misses += 1
+        return None
+
+    def put(
+        self,
+        module_filepath: str,
+        mod: Union[Module, FrozenModule, None],
+    ) -> None:
+        """ Store the module loaded from `module_filepath` elsewhere.
+        """
+        filepath = abspath(module_filepath)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            mod = None
+        self._touched.add(filepath)
+        if mod is None:
+            self._entries.pop(filepath, None)
+        else:
+            if isinstance(mod, Module):
+                mod = mod.freeze()
+            self._entries[filepath] = (stat.st_mtime_ns, stat.st_size, mod)
+        self._dirty = True
+        return
+
+    def load_module_from_path(
+        self,
+        module_filepath: str,
+    ) -> Optional[Module]:
+        mod = self.get_fresh(module_filepath)
+        if mod is not None:
+            return mod
+        mod = self._loader.load_module_from_path(module_filepath)
+        self.put(module_filepath, mod)
+        return mod
+
+    def load_module_from_lines(
+        self,
+        lines: List[str],
+    ) -> Optional[Module]:
+        return self._loader.load_module_from_lines(lines)
+
+    def save(self, prune: bool = True) -> None:
+        """ Write the cache back to disk.
+
+        If `prune` is True, entries of files not loaded through
+        this instance (typically deleted files) are dropped.
+        """
+        if prune:
+            stale_paths = set(self._entries) - self._touched
+            for stale_path in stale_paths:
+                del self._entries[stale_path]
+            self.stats.evictions += len(stale_paths)
+            self._dirty = self._dirty or bool(stale_paths)
+        if not self._dirty:
+            return
+        tmp_path = '{}.{}.tmp'.format(self._cache_path, os.getpid())
+        try:
+            os.makedirs(dirname(self._cache_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(
+                    (CACHE_FORMAT_VERSION, self._entries, self.git_revision),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, self._cache_path)
+        except OSError:
+            return
+        self._dirty = False
+        return
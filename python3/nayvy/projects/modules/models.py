@@ -3,7 +3,7 @@
 """
 import json
 from enum import Enum
-from typing import Any, Dict, List, Tuple, Optional, Generator
+from typing import Any, Dict, List, NamedTuple, Tuple, Optional, Generator
 from dataclasses import asdict, dataclass, is_dataclass
 
 
@@ -85,6 +85,16 @@ class Function:
             'signature_lines': self.signature_lines,
         }
 
+    def freeze(self) -> 'FrozenFunction':
+        return FrozenFunction(
+            self.name,
+            self.docstring,
+            self.line_begin,
+            self.line_end,
+            self.func_decl_type,
+            tuple(self.signature_lines),
+        )
+
 
 @dataclass(frozen=True)
 class Class:
@@ -150,6 +160,15 @@ class Class:
             'signature_lines': self.signature_lines,
         }
 
+    def freeze(self) -> 'FrozenClass':
+        return FrozenClass(
+            self.name,
+            self.line_begin,
+            self.line_end,
+            tuple(f.freeze() for f in self.function_map.values()),
+            tuple(self.signature_lines),
+        )
+
 
 @dataclass(frozen=True)
 class Module:
@@ -286,3 +305,61 @@ class Module:
 
     def to_json(self) -> str:
         return json.dumps(self, cls=JSONEncoder, indent=2)
+
+    def freeze(self) -> 'FrozenModule':
+        return FrozenModule(
+            tuple(f.freeze() for f in self.function_map.values()),
+            tuple(c.freeze() for c in self.class_map.values()),
+        )
+
+
+# Immutable variants of the models above.
+# They are plain tuples without per-instance `__dict__`,
+# so they are smaller, hashable and safe to share between threads and caches.
+# Maps are kept as tuples of values in the order of definitions.
+
+class FrozenFunction(NamedTuple):
+    name: str
+    docstring: str
+    line_begin: int
+    line_end: int
+    func_decl_type: FuncDeclType
+    signature_lines: Tuple[str, ...]
+
+    def thaw(self) -> Function:
+        return Function(
+            self.name,
+            self.docstring,
+            self.line_begin,
+            self.line_end,
+            self.func_decl_type,
+            list(self.signature_lines),
+        )
+
+
+class FrozenClass(NamedTuple):
+    name: str
+    line_begin: int
+    line_end: int
+    functions: Tuple[FrozenFunction, ...]
+    signature_lines: Tuple[str, ...]
+
+    def thaw(self) -> Class:
+        return Class(
+            self.name,
+            self.line_begin,
+            self.line_end,
+            {f.name: f.thaw() for f in self.functions},
+            list(self.signature_lines),
+        )
+
+
+class FrozenModule(NamedTuple):
+    functions: Tuple[FrozenFunction, ...]
+    classes: Tuple[FrozenClass, ...]
+
+    def thaw(self) -> Module:
+        return Module(
+            {f.name: f.thaw() for f in self.functions},
+            {c.name: c.thaw() for c in self.classes},
+        )
@@ -1,19 +1,69 @@
-import glob
-import shutil
-import subprocess as sp
-from dataclasses import dataclass
+import os
+import sys
+import time
+import heapq
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
-from os.path import abspath, dirname, relpath
-from typing import Any, Dict, Generator, List, Optional, Tuple
+from os.path import abspath, dirname, exists, relpath
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+from nayvy.aop.trace import count, phase, timed_iter
 from nayvy.importing.fixer import ImportStatementMap
 from nayvy.importing.import_statement import SingleImport
+from nayvy.importing.name_index import SortedNameIndex
 from nayvy.projects import get_pyproject_root, get_pythonpath_roots
+from nayvy.projects.discovery import iter_python_paths, mod_walk_order_key
+from nayvy.projects.mapped import (
+    Location,
+    MappedIndex,
+    get_mapped_index_path,
+    write_mapped_index,
+)
+from nayvy.projects.modules.cache import CachedModuleLoader, CacheStats
 from nayvy.projects.modules.loader import ModuleLoader
-from nayvy.projects.modules.models import Class, Function, Module
+from nayvy.projects.modules.models import Class, FrozenModule, Function, Module
+from nayvy.projects.sqlite_store import SqliteSymbolStore, get_sqlite_index_path
+from nayvy.projects.symbol_table import SymbolTable
+from nayvy.utils.memory import deep_sizeof
 from nayvy.utils.string_utils import remove_suffix
 
 
+T = TypeVar('T')
+
+# Number of scripts parsed by one task of the process pool
+PARSE_CHUNK_SIZE = 64
+
+# Number of statements measured to estimate the memory of an index
+MEMORY_SAMPLE_NUM = 64
+
+# Max number of statements looked up kept by each helper
+PROJECTED_CACHE_SIZE = 1024
+
+# Margin for coarse mtime of file systems (2 seconds on FAT)
+MTIME_RESOLUTION_NS = 2 * 10 ** 9
+
+# The mapped file is written again at startup
+# once this ratio of its modules are loaded again
+MAPPED_REWRITE_RATIO = 0.1
+
+
 class ImportPathFormat(Enum):
     ALL_ABSOLUTE = 'all_absolute'
     ALL_RELATIVE = 'all_relative'
@@ -34,6 +84,15 @@ def get_pyproject_root_wrapper(
     return pyproject_root
 
 
+def to_mod_path(filepath: str, pyproject_root: str) -> str:
+    """Get dotted module path of `filepath` within python project."""
+    rel_path = relpath(
+        abspath(filepath),
+        abspath(pyproject_root),
+    )
+    return remove_suffix(rel_path.replace('/', '.'), '.py')
+
+
 @dataclass(frozen=True)
 class ModulePath:
     """Represent one module.
@@ -44,6 +103,7 @@ class ModulePath:
 
     mod_path: str
     mod: Module
+    filepath: str = ''
 
     def get_import(self, name: str) -> Optional[str]:
         """Get import statement string."""
@@ -63,13 +123,10 @@ class ModulePath:
         if mod is None:
             return None
 
-        rel_path = relpath(
-            abspath(filepath),
-            abspath(pyproject_root),
-        )
         return ModulePath(
-            remove_suffix(rel_path.replace('/', '.'), '.py'),
+            to_mod_path(filepath, pyproject_root),
             mod,
+            abspath(filepath),
         )
 
 
@@ -110,52 +167,703 @@ def mod_relpath(
 
 def find_all_pythno_paths(root: str) -> List[str]:
     """
-    Get all '.py' suffixed paths under `root`.
-    The strategy is as follows
-    - `fd`
-    - `rg --files`
-    - `python's glob.glob function`
+    Get all '.py' suffixed paths under `root`,
+    skipping pruned directories and files ignored by `.gitignore`.
     """
-    # fd
-    fd_executable = shutil.which('fd')
-    if fd_executable:
-        output = sp.run(
-            f'{fd_executable} .py$ {root}',
-            shell=True,
-            stdout=sp.PIPE,
-        ).stdout.decode('utf-8')
-        return output.split('\n')
-
-    # rg
-    rg_executable = shutil.which('rg')
-    if rg_executable:
-        output = sp.run(
-            f'{rg_executable} --files {root} | grep -e .py$',
-            shell=True,
-            stdout=sp.PIPE,
-        ).stdout.decode('utf-8')
-        return output.split('\n')
-
-    all_python_script_paths = glob.glob(
-        '{}/**/*.py'.format(root),
-        recursive=True,
+    return list(iter_python_paths(root))
+
+
+def iter_chunks(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Lazily split `items` into lists of length `size`."""
+    chunk: List[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_modules(
+    loader: ModuleLoader,
+    filepaths: List[str],
+) -> List[Optional[FrozenModule]]:
+    """Load a chunk of scripts (executed in worker processes).
+
+    Modules are returned frozen, as tuples are faster to pass between processes.
+    """
+    res: List[Optional[FrozenModule]] = []
+    for filepath in filepaths:
+        mod = loader.load_module_from_path(filepath)
+        res.append(mod.freeze() if mod is not None else None)
+    return res
+
+
+@dataclass(frozen=True)
+class _ParseTask:
+    """A chunk of scripts, whose modules missing from the cache
+    are being loaded in a worker process."""
+
+    filepaths: List[str]
+    cached: Dict[str, Module]
+    future: 'Optional[Future[List[Optional[FrozenModule]]]]'
+
+    @classmethod
+    def submit(
+        cls,
+        executor: Executor,
+        loader: ModuleLoader,
+        filepaths: List[str],
+    ) -> '_ParseTask':
+        cached: Dict[str, Module] = {}
+        inner_loader = loader
+        if isinstance(loader, CachedModuleLoader):
+            inner_loader = loader.loader
+            for filepath in filepaths:
+                mod = loader.get_fresh(filepath)
+                if mod is not None:
+                    cached[filepath] = mod
+        pending = [filepath for filepath in filepaths if filepath not in cached]
+        future = None
+        if pending:
+            future = executor.submit(_load_modules, inner_loader, pending)
+        return _ParseTask(filepaths, cached, future)
+
+    def results(
+        self,
+        loader: ModuleLoader,
+    ) -> Iterator[Tuple[str, Optional[Module]]]:
+        loaded: Dict[str, Optional[Module]] = dict(self.cached)
+        if self.future is not None:
+            pending = [
+                filepath for filepath in self.filepaths
+                if filepath not in self.cached
+            ]
+            for filepath, frozen in zip(pending, self.future.result()):
+                loaded[filepath] = frozen.thaw() if frozen is not None else None
+                if isinstance(loader, CachedModuleLoader):
+                    loader.put(filepath, frozen)
+        for filepath in self.filepaths:
+            yield filepath, loaded[filepath]
+
+
+def can_fork_safely() -> bool:
+    """Check if worker processes can be forked from the current thread.
+
+    Forked children inherit locks held by other threads (i.g. warming up
+    indices or serving requests), which are never released in them.
+    """
+    return (
+        threading.current_thread() is threading.main_thread() and
+        threading.active_count() == 1
     )
-    return all_python_script_paths
+
+
+@dataclass
+class ProjectIndex(ImportStatementMap):
+    """Symbols defined in a python project, independent of the importing file.
+
+    Each symbol is imported from its absolute module path,
+    and `ProjectImportHelper` makes statements relative on demand,
+    so that one index is shared by all files of the project.
+    Of modules defining the same name, the one latest in walk order
+    (see `mod_walk_order_key`) is imported, and the others are kept
+    to fall back to when it is removed.
+    If `lazy_signature` is True, only the location of each definition
+    is kept and its signature is loaded by `SingleImport.resolve`.
+    If `compact` is True, symbols are kept in a `SymbolTable` instead
+    (signatures are loaded lazily as well).
+    They can also be kept in a `SqliteSymbolStore` given as `_symbols`.
+
+    If `_base` is given, symbols are looked up in the mapped file as well,
+    unless their modules are loaded again (or removed) since it was written.
+    """
+
+    lazy_signature: bool = False
+    compact: bool = False
+    _import_stmt_map: Dict[str, SingleImport] = field(default_factory=dict)
+    # module path -> names defined in the module
+    _mod_names: Dict[str, List[str]] = field(default_factory=dict)
+    # name -> module path the name is currently imported from
+    _name_mods: Dict[str, str] = field(default_factory=dict)
+    # name -> module path -> statements of the other definitions,
+    # one of which is imported if the current one is removed
+    _shadowed: Dict[str, Dict[str, SingleImport]] = field(default_factory=dict)
+    # module path -> file path of the module
+    _mod_filepaths: Dict[str, str] = field(default_factory=dict)
+    # incremented whenever symbols change
+    version: int = field(default=0, compare=False)
+    # when scripts were (re)loaded from disk, in `time.time_ns()`
+    loaded_at_ns: int = field(default=0, compare=False)
+    # built at the first prefix query, and maintained afterwards
+    _name_index: Optional[SortedNameIndex] = field(
+        default=None,
+        compare=False,
+        repr=False,
+    )
+    _symbols: Optional[Union[SymbolTable, SqliteSymbolStore]] = field(
+        default=None,
+        compare=False,
+        repr=False,
+    )
+    _base: Optional[MappedIndex] = field(
+        default=None,
+        compare=False,
+        repr=False,
+    )
+    # modules of `_base` loaded again or removed
+    _masked_mods: Set[str] = field(default_factory=set, compare=False, repr=False)
+    _masked_symbol_num: int = field(default=0, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.compact and self._symbols is None:
+            self._symbols = SymbolTable()
+        return
+
+    @property
+    def base(self) -> Optional[MappedIndex]:
+        return self._base
+
+    @property
+    def sqlite(self) -> bool:
+        return isinstance(self._symbols, SqliteSymbolStore)
+
+    @property
+    def masked_module_num(self) -> int:
+        """Number of modules of `_base` loaded again or removed."""
+        return len(self._masked_mods)
+
+    @property
+    def module_num(self) -> int:
+        if self._symbols is not None:
+            num = self._symbols.module_num
+        else:
+            num = len(self._mod_names)
+        if self._base is not None:
+            num += self._base.module_num - len(self._masked_mods)
+        return num
+
+    @property
+    def symbol_num(self) -> int:
+        if self._symbols is not None:
+            num = self._symbols.symbol_num
+        else:
+            num = len(self._import_stmt_map)
+        if self._base is not None:
+            # Names also defined by loaded modules are counted twice.
+            num += self._base.symbol_num - self._masked_symbol_num
+        return num
+
+    def _has_own_module(self, mod_path: str) -> bool:
+        if self._symbols is not None:
+            return self._symbols.has_module(mod_path)
+        return mod_path in self._mod_names
+
+    def _in_base(self, mod_path: str) -> bool:
+        return (
+            self._base is not None and
+            mod_path not in self._masked_mods and
+            self._base.has_module(mod_path)
+        )
+
+    def has_module(self, mod_path: str) -> bool:
+        return self._has_own_module(mod_path) or self._in_base(mod_path)
+
+    def module_paths(self) -> List[str]:
+        if self._symbols is not None:
+            res = self._symbols.module_paths()
+        else:
+            res = list(self._mod_names)
+        if self._base is not None:
+            res += [
+                mod_path for mod_path in self._base.module_paths()
+                if mod_path not in self._masked_mods
+            ]
+        return res
+
+    def module_names(self, mod_path: str) -> List[str]:
+        """Get names defined in one module."""
+        if self._in_base(mod_path):
+            assert self._base is not None
+            return self._base.module_names(mod_path)
+        if self._symbols is not None:
+            return self._symbols.module_names(mod_path)
+        return list(self._mod_names.get(mod_path, []))
+
+    def _own_module_of(self, name: str) -> Optional[str]:
+        if self._symbols is not None:
+            return self._symbols.module_of(name)
+        return self._name_mods.get(name)
+
+    def _base_module_of(self, name: str) -> Optional[str]:
+        if self._base is None:
+            return None
+        return self._base.module_of(name, self._masked_mods)
+
+    def _imported_from_base(self, name: str) -> bool:
+        """Check if `name` is imported from `_base` rather than loaded modules."""
+        base_mod_path = self._base_module_of(name)
+        if base_mod_path is None:
+            return False
+        own_mod_path = self._own_module_of(name)
+        return own_mod_path is None or (
+            mod_walk_order_key(base_mod_path) > mod_walk_order_key(own_mod_path)
+        )
+
+    def module_of(self, name: str) -> Optional[str]:
+        """Get the module path `name` is currently imported from."""
+        if self._imported_from_base(name):
+            return self._base_module_of(name)
+        return self._own_module_of(name)
+
+    def lookup_outside(
+        self,
+        name: str,
+        mod_path: str,
+    ) -> Optional[Tuple[str, SingleImport]]:
+        """Get the module path and statement of `name` imported from the others.
+
+        It is the definition imported if the module `mod_path` were removed.
+        """
+        own: Optional[Tuple[str, SingleImport]] = None
+        if self._symbols is not None:
+            own = self._symbols.lookup_outside(name, mod_path)
+        elif name in self._name_mods:
+            definitions = {
+                self._name_mods[name]: self._import_stmt_map[name],
+                **self._shadowed.get(name, {}),
+            }
+            definitions.pop(mod_path, None)
+            if definitions:
+                next_mod_path = max(definitions, key=mod_walk_order_key)
+                own = next_mod_path, definitions[next_mod_path]
+        if self._base is None:
+            return own
+        masked_mods = self._masked_mods | {mod_path}
+        base_mod_path = self._base.module_of(name, masked_mods)
+        if base_mod_path is not None and (
+            own is None or
+            mod_walk_order_key(base_mod_path) > mod_walk_order_key(own[0])
+        ):
+            base_import = self._base.lookup(name, masked_mods)
+            assert base_import is not None
+            return base_mod_path, base_import
+        return own
+
+    def is_fresh(self, mod_path: str, filepath: str) -> bool:
+        """Check if the module is known to be loaded from the current script.
+
+        Only the database records how each module was loaded,
+        so False is returned unless symbols are kept in it.
+        """
+        if isinstance(self._symbols, SqliteSymbolStore):
+            return self._symbols.is_fresh(mod_path, filepath)
+        return False
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Search names of symbols whose names or docstrings match `query`.
+
+        Without the database, only docstrings of signatures
+        kept in memory are searched, in the order of names.
+        """
+        if isinstance(self._symbols, SqliteSymbolStore):
+            return self._symbols.search(query, limit)
+        words = [word.lower() for word in query.split()]
+        if not words:
+            return []
+        res: List[str] = []
+        for name in self.names_with_prefix(''):
+            single_import = self[name]
+            if single_import is None:
+                continue
+            text = name.lower()
+            if single_import.func is not None:
+                text += ' ' + single_import.func.docstring.lower()
+            if all(word in text for word in words):
+                res.append(name)
+                if 0 < limit <= len(res):
+                    break
+        return res
+
+    def iter_locations(self) -> Iterator[Location]:
+        """Iterate locations of all definitions to be written to a mapped file.
+
+        Definitions shadowed by modules later in walk order are included.
+        """
+        if isinstance(self._symbols, SymbolTable):
+            yield from self._symbols.iter_locations()
+        elif self._symbols is not None:
+            for name, single_import in self._symbols.items():
+                mod_path = self._symbols.module_of(name)
+                assert mod_path is not None
+                yield self._location(name, mod_path, single_import)
+        else:
+            for mod_path, names in self._mod_names.items():
+                for name in dict.fromkeys(names):
+                    if self._name_mods[name] == mod_path:
+                        single_import = self._import_stmt_map[name]
+                    else:
+                        single_import = self._shadowed[name][mod_path]
+                    yield self._location(name, mod_path, single_import)
+        if self._base is not None:
+            for location in self._base.iter_locations():
+                if location[1] not in self._masked_mods:
+                    yield location
+
+    def _location(
+        self,
+        name: str,
+        mod_path: str,
+        single_import: SingleImport,
+    ) -> Location:
+        definition = single_import.func or single_import.klass
+        if definition is not None:
+            line_begin, line_end = definition.line_begin, definition.line_end
+        else:
+            line_begin, line_end = single_import.line_begin, single_import.line_end
+        return (
+            name,
+            mod_path,
+            single_import.filepath or self._mod_filepaths.get(mod_path, ''),
+            line_begin,
+            line_end,
+        )
+
+    def estimate_memory(self) -> int:
+        """ Approximate memory of the index in bytes.
+
+        Unlike `deep_sizeof` of the whole index, only a sample of
+        statements is measured, so it is cheap enough to call after each build.
+        Pages of the mapped file are not counted.
+        """
+        if self._symbols is not None:
+            return self._symbols.estimate_memory()
+        sample: List[SingleImport] = []
+        for single_import in self._import_stmt_map.values():
+            sample.append(single_import)
+            if len(sample) >= MEMORY_SAMPLE_NUM:
+                break
+        if not sample:
+            return 0
+        per_symbol = deep_sizeof(sample) / len(sample)
+        # Keys are shared with statements, so only containers are added.
+        containers = (
+            sys.getsizeof(self._import_stmt_map) +
+            sys.getsizeof(self._name_mods) +
+            sys.getsizeof(self._shadowed) +
+            sys.getsizeof(self._mod_names) +
+            sys.getsizeof(self._mod_filepaths) +
+            sum(sys.getsizeof(names) for names in self._mod_names.values())
+        )
+        return int(per_symbol * (len(self._import_stmt_map))) + containers
+
+    def _own_get(self, name: str) -> Optional[SingleImport]:
+        if self._symbols is not None:
+            return self._symbols[name]
+        return self._import_stmt_map.get(name, None)
+
+    # Override
+    def __getitem__(self, name: str) -> Optional[SingleImport]:
+        if self._imported_from_base(name):
+            assert self._base is not None
+            return self._base.lookup(name, self._masked_mods)
+        return self._own_get(name)
+
+    # Override
+    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
+        own_items = (
+            self._symbols.items() if self._symbols is not None
+            else self._import_stmt_map.items()
+        )
+        if self._base is None:
+            yield from own_items
+            return
+        for name, single_import in own_items:
+            if not self._imported_from_base(name):
+                yield name, single_import
+        for name in self._base.iter_names_with_prefix(''):
+            if self._imported_from_base(name):
+                base_import = self._base.lookup(name, self._masked_mods)
+                assert base_import is not None
+                yield name, base_import
+
+    # Override
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        if self._symbols is not None:
+            own_names = self._symbols.names_with_prefix(prefix, limit)
+        else:
+            if self._name_index is None:
+                self._name_index = SortedNameIndex(self._import_stmt_map)
+            own_names = self._name_index.prefixed(prefix, limit)
+        if self._base is None:
+            return own_names
+        res: List[str] = []
+        for name in heapq.merge(
+            own_names,
+            (
+                name for name in self._base.iter_names_with_prefix(prefix)
+                if self._base_module_of(name) is not None
+            ),
+            key=lambda name: (name.lower(), name),
+        ):
+            if res and res[-1] == name:
+                # Defined in both.
+                continue
+            res.append(name)
+            if 0 < limit <= len(res):
+                break
+        return res
+
+    def _add_stmt(
+        self,
+        modpath: ModulePath,
+        name: str,
+        func: Optional[Function],
+        klass: Optional[Class],
+    ) -> None:
+        statement = f'from {modpath.mod_path} import {name}'
+        definition = func or klass
+        if self.lazy_signature and modpath.filepath and definition is not None:
+            single_import = SingleImport(
+                name,
+                statement,
+                2,  # project level
+                filepath=modpath.filepath,
+                line_begin=definition.line_begin,
+                line_end=definition.line_end,
+            )
+        else:
+            single_import = SingleImport(
+                name,
+                statement,
+                2,  # project level
+                func,
+                klass,
+            )
+        current_mod_path = self._name_mods.get(name)
+        if current_mod_path is not None and current_mod_path != modpath.mod_path:
+            if (
+                mod_walk_order_key(modpath.mod_path) <
+                mod_walk_order_key(current_mod_path)
+            ):
+                # Shadowed by the module later in walk order
+                self._shadowed.setdefault(name, {})[modpath.mod_path] = single_import
+                return
+            self._shadowed.setdefault(name, {})[current_mod_path] = (
+                self._import_stmt_map[name]
+            )
+        self._import_stmt_map[name] = single_import
+        self._name_mods[name] = modpath.mod_path
+        if self._name_index is not None:
+            self._name_index.add(name)
+
+    def _mask(self, mod_path: str) -> bool:
+        """Hide symbols of the module in `_base`."""
+        if not self._in_base(mod_path):
+            return False
+        assert self._base is not None
+        self._masked_mods.add(mod_path)
+        self._masked_symbol_num += len(self._base.module_names(mod_path))
+        return True
+
+    def upsert_module(self, modpath: ModulePath) -> None:
+        """Add (or replace) all symbols defined in one module."""
+        self.version += 1
+        self._mask(modpath.mod_path)
+        if self._symbols is not None:
+            self._symbols.upsert_module(modpath.mod_path, modpath.filepath, modpath.mod)
+            return
+        self._remove_module(modpath.mod_path)
+        for name, func in modpath.mod.function_map.items():
+            self._add_stmt(modpath, name, func, None)
+        for name, klass in modpath.mod.class_map.items():
+            self._add_stmt(modpath, name, None, klass)
+        self._mod_names[modpath.mod_path] = [
+            *modpath.mod.function_map,
+            *modpath.mod.class_map,
+        ]
+        self._mod_filepaths[modpath.mod_path] = modpath.filepath
+
+    def remove_module(self, mod_path: str) -> None:
+        """Remove all symbols defined in one module."""
+        masked = self._mask(mod_path)
+        if self._symbols is not None:
+            removed = self._symbols.remove_module(mod_path)
+        else:
+            removed = self._remove_module(mod_path)
+        if removed or masked:
+            self.version += 1
+
+    def _remove_module(self, mod_path: str) -> bool:
+        if mod_path not in self._mod_names:
+            return False
+        self._mod_filepaths.pop(mod_path, None)
+        for name in self._mod_names.pop(mod_path):
+            shadowed = self._shadowed.get(name)
+            if self._name_mods.get(name) != mod_path:
+                # Shadowed by the module later in walk order
+                if shadowed is not None:
+                    shadowed.pop(mod_path, None)
+                    if not shadowed:
+                        del self._shadowed[name]
+                continue
+            if shadowed:
+                # Fall back to the definition next in walk order.
+                next_mod_path = max(shadowed, key=mod_walk_order_key)
+                self._import_stmt_map[name] = shadowed.pop(next_mod_path)
+                self._name_mods[name] = next_mod_path
+                if not shadowed:
+                    del self._shadowed[name]
+                continue
+            del self._import_stmt_map[name]
+            del self._name_mods[name]
+            if self._name_index is not None:
+                self._name_index.remove(name)
+        return True
 
 
 @dataclass
 class ProjectImportHelper(ImportStatementMap):
-    """Importing helper that providing import within project."""
+    """Importing helper that providing import within project.
+
+    It is a view of `index` from the module `current_mod_path`.
+    Statements of the symbols looked up are made relative
+    according to `import_path_format`,
+    and symbols of the current module are hidden
+    (or imported from the other modules defining the same names).
+    """
+
+    index: ProjectIndex
+    current_mod_path: str = ''
+    import_path_format: ImportPathFormat = ImportPathFormat.ALL_ABSOLUTE
+    # module path -> `from` part of statements (memoized `mod_relpath`)
+    _from_whats: Dict[str, str] = field(
+        default_factory=dict,
+        compare=False,
+        repr=False,
+    )
+    # name -> statement looked up (None if hidden) for `_projected_version`
+    # of the index, least recently used first
+    _projected: 'OrderedDict[str, Optional[SingleImport]]' = field(
+        default_factory=OrderedDict,
+        compare=False,
+        repr=False,
+    )
+    _projected_version: int = field(default=-1, compare=False, repr=False)
+
+    @property
+    def version(self) -> int:
+        return self.index.version
+
+    @property
+    def module_num(self) -> int:
+        return self.index.module_num
+
+    @property
+    def symbol_num(self) -> int:
+        return self.index.symbol_num
+
+    def estimate_memory(self) -> int:
+        return self.index.estimate_memory()
+
+    def _project(
+        self,
+        name: str,
+        single_import: Optional[SingleImport] = None,
+    ) -> Optional[SingleImport]:
+        """Get the statement of `name` imported from the current module.
+
+        `single_import` of the index is looked up unless given.
+        Results are kept until the index changes, so that names listed again
+        get the same objects (reusing their memoized `to_dict`),
+        even from backends making new objects on each lookup.
+        """
+        if self._projected_version != self.index.version:
+            self._projected.clear()
+            self._projected_version = self.index.version
+        if name in self._projected:
+            self._projected.move_to_end(name)
+            return self._projected[name]
+        if single_import is None:
+            single_import = self.index[name]
+        projected = (
+            self._make_projected(name, single_import)
+            if single_import is not None else None
+        )
+        self._projected[name] = projected
+        if len(self._projected) > PROJECTED_CACHE_SIZE:
+            self._projected.popitem(last=False)
+        return projected
 
-    _import_stmt_map: Dict[str, SingleImport]
+    def _make_projected(
+        self,
+        name: str,
+        single_import: SingleImport,
+    ) -> Optional[SingleImport]:
+        mod_path = self.index.module_of(name)
+        if mod_path is None:
+            return None
+        if mod_path == self.current_mod_path:
+            # Symbols of the current module are never imported,
+            # but the same names defined by the others are.
+            outside = self.index.lookup_outside(name, mod_path)
+            if outside is None:
+                return None
+            mod_path, single_import = outside
+        from_what = self._from_whats.get(mod_path)
+        if from_what is None:
+            from_what = mod_relpath(
+                mod_path,
+                self.current_mod_path,
+                self.import_path_format,
+            )
+            self._from_whats[mod_path] = from_what
+        if from_what == mod_path:
+            return single_import
+        return SingleImport(
+            name,
+            f'from {from_what} import {name}',
+            single_import.level,
+            single_import.func,
+            single_import.klass,
+            single_import.filepath,
+            single_import.line_begin,
+            single_import.line_end,
+        )
 
     # Override
     def __getitem__(self, name: str) -> Optional[SingleImport]:
-        return self._import_stmt_map.get(name, None)
+        return self._project(name)
 
     # Override
     def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
-        return ((k, v) for k, v in self._import_stmt_map.items())
+        for name, single_import in self.index.items():
+            projected = self._project(name, single_import)
+            if projected is not None:
+                yield name, projected
+
+    # Override
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        hidden = len(self.index.module_names(self.current_mod_path))
+        names = self.index.names_with_prefix(
+            prefix,
+            limit + hidden if limit > 0 else limit,
+        )
+        res = [
+            name for name in names
+            if self.index.module_of(name) != self.current_mod_path or
+            self.index.lookup_outside(name, self.current_mod_path) is not None
+        ]
+        return res[:limit] if limit > 0 else res
+
+    def upsert_module(self, modpath: ModulePath) -> None:
+        """Add (or replace) all symbols defined in one module of the index."""
+        self.index.upsert_module(modpath)
+
+    def remove_module(self, mod_path: str) -> None:
+        """Remove all symbols defined in one module of the index."""
+        self.index.remove_module(mod_path)
 
 
 @dataclass(frozen=True)
@@ -165,72 +873,231 @@ class ProjectImportHelperBuilder:
     import_path_format: ImportPathFormat
     pyproject_root_markers: List[str]
     requires_in_pyproject: bool
+    # Persist loaded modules under `cache_root` (XDG cache dir if empty)
+    use_cache: bool = False
+    cache_root: str = ''
+    # Parse scripts in a process pool if more than one worker is given
+    workers: int = 0
+    lazy_signature: bool = False
+    # Keep symbols of the index in a `SymbolTable`
+    compact: bool = False
+    # Start from the index mapped from a file under `cache_root`,
+    # which is written after built
+    mapped: bool = False
+    # Keep symbols of the index in a database under `cache_root`
+    # (takes precedence over `compact` and `mapped`)
+    sqlite: bool = False
+    # Counters accumulating hits and misses of the persistent cache
+    cache_stats: Optional[CacheStats] = field(default=None, compare=False)
 
-    def make_stmt_relative(
-        self,
-        modpath: ModulePath,
-        modpath_target: ModulePath,
-    ) -> str:
-        return mod_relpath(
-            modpath_target.mod_path,
-            modpath.mod_path,
-            self.import_path_format,
+    def _get_loader(self, root: str) -> ModuleLoader:
+        if not self.use_cache:
+            return self.loader
+        return CachedModuleLoader.open(
+            self.loader,
+            root,
+            self.cache_root,
+            self.cache_stats,
         )
 
-    def _add_stmt(
+    def _load_all(
         self,
-        stmt_map: Dict[str, SingleImport],
-        current_modpath: ModulePath,
-        modpath: ModulePath,
-        name: str,
-        func: Optional[Function],
-        klass: Optional[Class],
-    ) -> None:
-        stmt_map[name] = SingleImport(
-            name,
-            'from {} import {}'.format(
-                self.make_stmt_relative(current_modpath, modpath),
-                name,
-            ),
-            2,  # project level
-            func,
-            klass,
-        )
+        loader: ModuleLoader,
+        filepaths: Iterable[str],
+    ) -> Iterator[Tuple[str, Optional[Module]]]:
+        """Lazily load scripts, in the order of `filepaths`."""
+        if self.workers <= 1 or not can_fork_safely():
+            for filepath in filepaths:
+                yield filepath, loader.load_module_from_path(filepath)
+            return
 
-    def make_map(
-        self,
-        current_modpath: ModulePath,
-        all_modpaths: List[ModulePath],
-    ) -> Dict[str, SingleImport]:
-        import_stmt_map: Dict[str, SingleImport] = {}
-        for modpath in all_modpaths:
-            for name, func in modpath.mod.function_map.items():
-                self._add_stmt(import_stmt_map, current_modpath, modpath, name, func, None)
-            for name, klass in modpath.mod.class_map.items():
-                self._add_stmt(import_stmt_map, current_modpath, modpath, name, None, klass)
-        return import_stmt_map
+        start_methods = multiprocessing.get_all_start_methods()
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Embedding interpreters (vim) cannot spawn python itself.
+            mp_context=multiprocessing.get_context(
+                'fork' if 'fork' in start_methods else None,
+            ),
+        ) as executor:
+            # Bound the number of chunks held in memory at once.
+            in_flight: Deque[_ParseTask] = deque()
+            for chunk in iter_chunks(filepaths, PARSE_CHUNK_SIZE):
+                in_flight.append(_ParseTask.submit(executor, loader, chunk))
+                while len(in_flight) > self.workers * 2:
+                    yield from in_flight.popleft().results(loader)
+            while in_flight:
+                yield from in_flight.popleft().results(loader)
 
-    def build(self) -> Optional[ProjectImportHelper]:
-        # Current project detection
-        pyproject_root = get_pyproject_root_wrapper(
+    def get_pyproject_root(self) -> Optional[str]:
+        return get_pyproject_root_wrapper(
             self.current_filepath,
             self.pyproject_root_markers,
             self.requires_in_pyproject,
         )
-        if pyproject_root is None:
+
+    def build(self) -> Optional[ProjectImportHelper]:
+        # Current project detection
+        with phase('root_detection'):
+            pyproject_root = self.get_pyproject_root()
+        if pyproject_root is None or not exists(self.current_filepath):
             return None
+        return self.view(self.build_index(pyproject_root), pyproject_root)
 
-        # Current module
-        current_modpath = ModulePath.of_filepath(
-            self.loader,
-            self.current_filepath,
-            pyproject_root,
+    def view(
+        self,
+        index: ProjectIndex,
+        pyproject_root: str,
+    ) -> ProjectImportHelper:
+        """ Get the helper of the current file viewing `index` of its project.
+        """
+        return ProjectImportHelper(
+            index,
+            to_mod_path(self.current_filepath, pyproject_root),
+            self.import_path_format,
         )
-        if current_modpath is None:
+
+    def build_index(self, pyproject_root: str) -> ProjectIndex:
+        """ Build the index of the project at `pyproject_root`.
+
+        If `mapped` is True and the mapped file is found, only scripts
+        modified since it was written are loaded on top of it.
+        Otherwise it is built from scratch (and written if `mapped` is True).
+        If `sqlite` is True, the index is kept in the database instead.
+        """
+        if self.sqlite:
+            index = self.build_sqlite_index(pyproject_root)
+            if index is not None:
+                return index
+        elif self.mapped:
+            with phase('map'):
+                base = MappedIndex.open(
+                    get_mapped_index_path(pyproject_root, self.cache_root),
+                )
+            if base is not None:
+                index = ProjectIndex(
+                    self.lazy_signature,
+                    self.compact,
+                    loaded_at_ns=base.loaded_at_ns,
+                    _base=base,
+                )
+                self.refresh(index, pyproject_root)
+                if index.masked_module_num > base.module_num * MAPPED_REWRITE_RATIO:
+                    self.save_mapped_index(index, pyproject_root)
+                return index
+
+        index = ProjectIndex(
+            self.lazy_signature,
+            self.compact,
+            loaded_at_ns=time.time_ns(),
+        )
+        self._load_projects(index, pyproject_root)
+        count('symbols', index.symbol_num)
+        if self.mapped:
+            self.save_mapped_index(index, pyproject_root)
+        return index
+
+    def build_sqlite_index(self, pyproject_root: str) -> Optional[ProjectIndex]:
+        """ Build the index of the project at `pyproject_root` in its database.
+
+        Only scripts modified since they were last loaded
+        (possibly by other vim instances) are loaded into it.
+        None is returned if the database cannot be opened.
+        """
+        with phase('sqlite_open'):
+            store = SqliteSymbolStore.open(
+                get_sqlite_index_path(pyproject_root, self.cache_root),
+            )
+        if store is None:
+            return None
+        index = ProjectIndex(
+            self.lazy_signature,
+            self.compact,
+            loaded_at_ns=store.loaded_at_ns,
+            _symbols=store,
+        )
+        if index.loaded_at_ns:
+            self.refresh(index, pyproject_root)
+        else:
+            index.loaded_at_ns = time.time_ns()
+            self._load_projects(index, pyproject_root)
+            count('symbols', index.symbol_num)
+        store.loaded_at_ns = index.loaded_at_ns
+        return index
+
+    def save_mapped_index(self, index: ProjectIndex, pyproject_root: str) -> None:
+        """ Write `index` of the project at `pyproject_root` to the mapped file.
+        """
+        with phase('map_save'):
+            write_mapped_index(
+                get_mapped_index_path(pyproject_root, self.cache_root),
+                index.iter_locations(),
+                index.loaded_at_ns,
+            )
+        return
+
+    def refresh(
+        self,
+        index: ProjectIndex,
+        pyproject_root: str,
+    ) -> Optional[ProjectIndex]:
+        """ Bring `index` loaded before (i.g. restored from disk) up to date.
+
+        Only scripts modified (or added) since it was loaded are loaded again,
+        and modules whose scripts are gone are removed.
+        None is returned if `index` was built with other options.
+        """
+        if (
+            index.lazy_signature != self.lazy_signature or
+            index.compact != self.compact or
+            index.sqlite != self.sqlite
+        ):
             return None
+        modified_since_ns = index.loaded_at_ns - MTIME_RESOLUTION_NS
+        index.loaded_at_ns = time.time_ns()
+        seen = self._load_projects(index, pyproject_root, modified_since_ns)
+        for mod_path in index.module_paths():
+            if mod_path not in seen:
+                index.remove_module(mod_path)
+        count('symbols', index.symbol_num)
+        return index
+
+    def _load_projects(
+        self,
+        index: ProjectIndex,
+        pyproject_root: str,
+        modified_since_ns: Optional[int] = None,
+    ) -> Set[str]:
+        """ Load modules of the project and PYTHONPATH into `index`.
+
+        If `modified_since_ns` is given, modules already in `index`
+        are loaded only if modified since then.
+        Module paths of all scripts found are returned.
+        """
+        seen: Set[str] = set()
 
-        # Get all modules from the current project and PYTHONPATH
-        all_modpaths: List[ModulePath] = []
+        def iter_stale_paths(root: str, loader: ModuleLoader) -> Iterator[str]:
+            filepaths: Optional[Iterable[str]] = None
+            if isinstance(loader, CachedModuleLoader):
+                # Listed without walking directories if git tells changes.
+                filepaths = loader.list_python_paths()
+            if filepaths is None:
+                filepaths = iter_python_paths(root)
+            for filepath in filepaths:
+                mod_path = to_mod_path(filepath, root)
+                if modified_since_ns is not None and index.has_module(mod_path):
+                    try:
+                        mtime_ns = os.stat(filepath).st_mtime_ns
+                    except OSError:
+                        # Listed from the cache, but removed since
+                        continue
+                    if (
+                        mtime_ns <= modified_since_ns or
+                        index.is_fresh(mod_path, abspath(filepath))
+                    ):
+                        seen.add(mod_path)
+                        continue
+                seen.add(mod_path)
+                yield filepath
 
         # Add modules from current project
         project_paths = [pyproject_root]
@@ -238,22 +1105,26 @@ class ProjectImportHelperBuilder:
         project_paths.extend(get_pythonpath_roots())
 
         for root in project_paths:
-            python_script_paths = find_all_pythno_paths(root)
-            maybe_modpaths = [
-                ModulePath.of_filepath(
-                    self.loader,
-                    _filepath,
-                    root,
-                )
-                for _filepath in python_script_paths
-            ]
-            # Filter out None and self
-            for modpath in maybe_modpaths:
-                if modpath is None:
-                    continue
-                if modpath.mod_path == current_modpath.mod_path:
+            loader = self._get_loader(root)
+            python_script_paths = timed_iter(
+                iter_stale_paths(root, loader),
+                'discovery',
+            )
+            for _filepath, mod in timed_iter(
+                self._load_all(loader, python_script_paths),
+                'parse',
+            ):
+                count('files')
+                if mod is None:
                     continue
-                all_modpaths.append(modpath)
-
-        stmt_map = self.make_map(current_modpath, all_modpaths)
-        return ProjectImportHelper(stmt_map)
+                with phase('make_map'):
+                    index.upsert_module(ModulePath(
+                        to_mod_path(_filepath, root),
+                        mod,
+                        abspath(_filepath),
+                    ))
+            if isinstance(loader, CachedModuleLoader):
+                with phase('cache_save'):
+                    # Unchanged scripts are not loaded through the cache.
+                    loader.save(prune=modified_since_ns is None)
+        return seen
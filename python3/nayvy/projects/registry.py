@@ -0,0 +1,517 @@
+"""
+In-process registry of `ProjectImportHelper` shared across editor commands
+"""
+import os
+import threading
+from collections import OrderedDict
+from os.path import abspath, exists
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from nayvy.aop.latency import LatencySummary
+from nayvy.projects import get_pythonpath_roots
+from nayvy.projects.modules.cache import CacheStats
+from nayvy.projects.modules.loader import ModuleLoader, SyntacticModuleLoader
+from nayvy.projects.path import (
+    ModulePath,
+    ProjectImportHelper,
+    ProjectImportHelperBuilder,
+    ProjectIndex,
+    to_mod_path,
+)
+from nayvy.projects.snapshot import load_snapshot, save_snapshot
+from nayvy.projects.watcher import FileWatcher
+from nayvy.utils.memory import deep_sizeof, format_bytes
+
+# Max number of files of a project keeping their own helper
+HELPER_NUM_PER_PROJECT = 16
+
+
+def is_under(filepath: str, root: str) -> bool:
+    """ Check if `filepath` is located under the directory `root`.
+    """
+    return abspath(filepath).startswith(abspath(root).rstrip(os.sep) + os.sep)
+
+
+@dataclass(frozen=True)
+class ProjectStats:
+
+    root: str
+    # number of files with their own helper viewing the index
+    helper_num: int
+    module_num: int
+    symbol_num: int
+    memory_bytes: int
+
+    @classmethod
+    def of_index(
+        cls,
+        root: str,
+        index: ProjectIndex,
+        helper_num: int,
+    ) -> 'ProjectStats':
+        return ProjectStats(
+            root,
+            helper_num,
+            index.module_num,
+            index.symbol_num,
+            deep_sizeof(index),
+        )
+
+    def to_lines(self) -> List[str]:
+        return [
+            self.root,
+            f'  helpers: {self.helper_num}',
+            f'  modules: {self.module_num}',
+            f'  symbols: {self.symbol_num}',
+            f'  memory: {format_bytes(self.memory_bytes)}',
+        ]
+
+
+def render_stats(
+    projects: List[ProjectStats],
+    caches: Dict[str, CacheStats],
+    latencies: Dict[str, LatencySummary],
+) -> List[str]:
+    """ Render stats into human readable lines.
+    """
+    lines = ['# projects']
+    for project in projects:
+        lines += project.to_lines()
+    lines += ['', '# caches']
+    for name, stats in caches.items():
+        lines.append(
+            f'{name}: hits {stats.hits}, misses {stats.misses}, '
+            f'evictions {stats.evictions} '
+            f'(hit rate {stats.hit_rate:.1%})'
+        )
+    lines += ['', '# latency of recent calls']
+    for name, summary in latencies.items():
+        lines.append(
+            f'{name}: {summary.count} calls, '
+            f'p50 {summary.p50 * 1000:.1f}ms, '
+            f'p95 {summary.p95 * 1000:.1f}ms'
+        )
+    return lines
+
+
+@dataclass
+class _WarmUp:
+
+    thread: threading.Thread
+    # files written while warming up, applied to the built index
+    written_paths: List[str] = field(default_factory=list)
+    cancelled: bool = False
+
+
+# (project root, index, builder) of an evicted index
+_Evicted = Tuple[str, ProjectIndex, ProjectImportHelperBuilder]
+
+
+class ProjectImportHelperRegistry:
+    """
+    Keep built `ProjectIndex` objects alive for the process lifetime.
+
+    One index is kept for each project root and shared by all of its files,
+    each of which gets its own `ProjectImportHelper` viewing the index
+    (only the `HELPER_NUM_PER_PROJECT` most recently used ones are kept).
+
+    If `memory_budget_bytes` is positive, indices of the least recently used
+    projects are evicted while their estimated memory exceeds the budget.
+    Evicted indices are written to the cache directory of their builder
+    (as the mapped file if the builder uses it),
+    unless kept in a database, which is always up to date,
+    so that they are restored later by loading only modified scripts.
+
+    If `watcher` is given, projects of cached indices (and PYTHONPATH)
+    are watched, and scripts changed outside the editor are reflected
+    into indices before each `get`.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = 0,
+        watcher: Optional[FileWatcher] = None,
+    ) -> None:
+        self.memory_budget_bytes = memory_budget_bytes
+        self.watcher = watcher
+        # project root -> index, in least recently used order
+        self._indices: 'OrderedDict[str, ProjectIndex]' = OrderedDict()
+        # project root -> file -> helper, in least recently used order
+        self._helpers: 'Dict[str, OrderedDict[str, ProjectImportHelper]]' = {}
+        # project root -> estimated memory of the index
+        self._sizes: Dict[str, int] = {}
+        # project root -> builder of its index, used to persist it
+        self._builders: Dict[str, ProjectImportHelperBuilder] = {}
+        self.stats = CacheStats()
+        # project root -> index being built in background
+        self._warm_ups: Dict[str, _WarmUp] = {}
+        self._lock = threading.RLock()
+        # Held while walking roots, which must not block `get` of others
+        self._watcher_lock = threading.Lock()
+        # roots evicted while the watcher is walking others
+        self._unwatched_roots: List[str] = []
+        return
+
+    def get(
+        self,
+        builder: ProjectImportHelperBuilder,
+        wait: bool = True,
+    ) -> Optional[ProjectImportHelper]:
+        """ Get the helper of the current file of `builder`,
+        building the index of its project with `builder` if missing.
+
+        If `wait` is False, it never blocks. A missing index is built
+        in background (see `warm_up`), and None is returned until then.
+        """
+        root = builder.get_pyproject_root()
+        if root is None or not exists(builder.current_filepath):
+            # Not in a project, or the current buffer is not saved yet
+            return None
+        self.apply_watched_changes()
+        with self._lock:
+            index = self._lookup(root)
+            if index is not None:
+                self.stats.hits += 1
+                return self._get_helper(root, index, builder)
+            warm_up = self._warm_ups.get(root)
+        if not wait:
+            self._start_warm_up(root, builder)
+            return None
+        if warm_up is not None:
+            warm_up.thread.join()
+            with self._lock:
+                index = self._lookup(root)
+                if index is not None:
+                    self.stats.hits += 1
+                    return self._get_helper(root, index, builder)
+        self.stats.misses += 1
+        index = self._build(root, builder)
+        with self._lock:
+            evicted = self._put(root, index, builder)
+            helper = self._get_helper(root, index, builder)
+        self._persist(evicted)
+        return helper
+
+    def _lookup(self, root: str) -> Optional[ProjectIndex]:
+        index = self._indices.get(root)
+        if index is not None:
+            self._indices.move_to_end(root)
+        return index
+
+    def _get_helper(
+        self,
+        root: str,
+        index: ProjectIndex,
+        builder: ProjectImportHelperBuilder,
+    ) -> ProjectImportHelper:
+        """ Get the helper of the current file of `builder` viewing `index`.
+        """
+        helpers = self._helpers.setdefault(root, OrderedDict())
+        filepath = abspath(builder.current_filepath)
+        helper = helpers.get(filepath)
+        if (
+            helper is None or
+            helper.index is not index or
+            helper.import_path_format != builder.import_path_format
+        ):
+            helper = builder.view(index, root)
+            helpers[filepath] = helper
+            while len(helpers) > HELPER_NUM_PER_PROJECT:
+                helpers.popitem(last=False)
+        helpers.move_to_end(filepath)
+        return helper
+
+    def _build(
+        self,
+        root: str,
+        builder: ProjectImportHelperBuilder,
+    ) -> ProjectIndex:
+        """ Restore the index evicted before, or build it from scratch.
+        """
+        # Changes while building are applied by next `get`.
+        self._watch(root)
+        # Mapped indices and databases are restored by the builder.
+        snapshot = (
+            None if builder.mapped or builder.sqlite
+            else load_snapshot(root, builder.cache_root)
+        )
+        if snapshot is not None:
+            index = builder.refresh(snapshot, root)
+            if index is not None:
+                return index
+        return builder.build_index(root)
+
+    def _put(
+        self,
+        root: str,
+        index: ProjectIndex,
+        builder: ProjectImportHelperBuilder,
+    ) -> List[_Evicted]:
+        """ Add `index` as the most recently used one,
+        and evict other projects to keep the memory budget.
+        """
+        self._indices[root] = index
+        self._indices.move_to_end(root)
+        self._sizes[root] = index.estimate_memory()
+        self._builders[root] = builder
+        return self._evict_over_budget()
+
+    def _evict_over_budget(self) -> List[_Evicted]:
+        """ Evict indices of the least recently used projects
+        while their estimated memory exceeds the budget.
+        """
+        evicted: List[_Evicted] = []
+        if self.memory_budget_bytes <= 0:
+            return evicted
+        while (
+            sum(self._sizes.values()) > self.memory_budget_bytes and
+            len(self._indices) > 1
+        ):
+            # The most recently used project is never evicted.
+            evicted_root = next(iter(self._indices))
+            evicted.append((
+                evicted_root,
+                self._evict(evicted_root),
+                self._builders[evicted_root],
+            ))
+        return evicted
+
+    def _watch(self, root: str) -> None:
+        if self.watcher is None:
+            return
+        with self._watcher_lock:
+            self._unwatch_evicted()
+            for watched_root in [root, *get_pythonpath_roots()]:
+                self.watcher.add_root(watched_root)
+        return
+
+    def _unwatch_evicted(self) -> None:
+        """ Stop watching evicted roots, with `_watcher_lock` held.
+        """
+        assert self.watcher is not None
+        with self._lock:
+            roots = self._unwatched_roots
+            self._unwatched_roots = []
+        for root in roots:
+            self.watcher.remove_root(root)
+        return
+
+    def apply_watched_changes(self) -> None:
+        """ Reflect scripts changed since the last call into cached indices.
+
+        Skipped while another thread is walking roots to be watched,
+        and the changes are applied by a later call.
+        """
+        if self.watcher is None:
+            return
+        if not self._watcher_lock.acquire(blocking=False):
+            return
+        try:
+            self._unwatch_evicted()
+            changed_paths = self.watcher.poll()
+        finally:
+            self._watcher_lock.release()
+        if not changed_paths:
+            return
+        evicted: List[_Evicted] = []
+        with self._lock:
+            loader = SyntacticModuleLoader()
+            for filepath in changed_paths:
+                evicted += self._update_file(filepath, loader)
+        self._persist(evicted)
+        return
+
+    def _persist(self, evicted: List[_Evicted]) -> None:
+        for root, index, builder in evicted:
+            if index.sqlite:
+                # Modules are written to the database when upserted.
+                continue
+            if builder.mapped:
+                builder.save_mapped_index(index, root)
+            else:
+                save_snapshot(root, index, builder.cache_root)
+        return
+
+    def warm_up(self, builder: ProjectImportHelperBuilder) -> None:
+        """ Start building the index on a background thread
+        unless it is already built or being built.
+        """
+        root = builder.get_pyproject_root()
+        if root is None:
+            return
+        self._start_warm_up(root, builder)
+        return
+
+    def is_warming_up(self, builder: ProjectImportHelperBuilder) -> bool:
+        root = builder.get_pyproject_root()
+        if root is None:
+            return False
+        with self._lock:
+            return root in self._warm_ups
+
+    def _start_warm_up(
+        self,
+        root: str,
+        builder: ProjectImportHelperBuilder,
+    ) -> None:
+        with self._lock:
+            if root in self._warm_ups or root in self._indices:
+                return
+            self.stats.misses += 1
+            thread = threading.Thread(
+                target=self._run_warm_up,
+                args=(root, builder),
+                name='nayvy-warm-up',
+                daemon=True,
+            )
+            self._warm_ups[root] = _WarmUp(thread)
+        thread.start()
+        return
+
+    def _run_warm_up(
+        self,
+        root: str,
+        builder: ProjectImportHelperBuilder,
+    ) -> None:
+        index = None
+        evicted: List[_Evicted] = []
+        try:
+            index = self._build(root, builder)
+        finally:
+            with self._lock:
+                warm_up = self._warm_ups.pop(root)
+                if (
+                    index is not None and
+                    not warm_up.cancelled and
+                    root not in self._indices
+                ):
+                    # The build may have read files before they were written.
+                    for filepath in warm_up.written_paths:
+                        self._update_indices(
+                            filepath,
+                            builder.loader,
+                            {root: index},
+                        )
+                    evicted = self._put(root, index, builder)
+        self._persist(evicted)
+        return
+
+    def update_file(self, filepath: str, loader: ModuleLoader) -> None:
+        """ Reflect the current content of `filepath` into cached indices.
+
+        Only the written (or deleted) file is loaded again,
+        and its symbols are replaced in every affected index.
+        """
+        with self._lock:
+            evicted = self._update_file(filepath, loader)
+        self._persist(evicted)
+        return
+
+    def _update_file(self, filepath: str, loader: ModuleLoader) -> List[_Evicted]:
+        """ Update cached indices with `_lock` held,
+        and evict others if the updated ones grow over the memory budget.
+        """
+        for warm_up in self._warm_ups.values():
+            warm_up.written_paths.append(filepath)
+        for root in self._update_indices(filepath, loader, self._indices):
+            self._sizes[root] = self._indices[root].estimate_memory()
+        return self._evict_over_budget()
+
+    def _update_indices(
+        self,
+        filepath: str,
+        loader: ModuleLoader,
+        indices: Mapping[str, ProjectIndex],
+    ) -> List[str]:
+        """ Reflect `filepath` into `indices`, and get roots of the updated ones.
+        """
+        pythonpath_roots = [
+            root for root in get_pythonpath_roots()
+            if is_under(filepath, root)
+        ]
+        # project root of indices -> root the module path is relative to
+        mod_roots: Dict[str, str] = {}
+        for root in indices:
+            if pythonpath_roots:
+                # Modules in PYTHONPATH are shared by every project.
+                mod_roots[root] = pythonpath_roots[0]
+            elif is_under(filepath, root):
+                mod_roots[root] = root
+        if not mod_roots:
+            return []
+
+        mod = loader.load_module_from_path(filepath) if exists(filepath) else None
+        for root, mod_root in mod_roots.items():
+            mod_path = to_mod_path(filepath, mod_root)
+            if mod is None:
+                indices[root].remove_module(mod_path)
+            else:
+                indices[root].upsert_module(ModulePath(
+                    mod_path,
+                    mod,
+                    abspath(filepath),
+                ))
+        return list(mod_roots)
+
+    def invalidate(self, filepath: str) -> None:
+        """ Drop indices that may contain symbols defined in `filepath`.
+        """
+        if any(is_under(filepath, root) for root in get_pythonpath_roots()):
+            # Modules in PYTHONPATH are shared by every project.
+            self.clear()
+            return
+        with self._lock:
+            for root in list(self._indices):
+                if is_under(filepath, root):
+                    self._evict(root)
+            for root, warm_up in self._warm_ups.items():
+                if is_under(filepath, root):
+                    warm_up.cancelled = True
+        return
+
+    def clear(self) -> None:
+        with self._lock:
+            for root in list(self._indices):
+                self._evict(root)
+            for warm_up in self._warm_ups.values():
+                warm_up.cancelled = True
+        return
+
+    def _evict(self, root: str) -> ProjectIndex:
+        index = self._indices.pop(root)
+        self._helpers.pop(root, None)
+        self._sizes.pop(root, None)
+        if self.watcher is not None and root not in get_pythonpath_roots():
+            if self._watcher_lock.acquire(blocking=False):
+                try:
+                    self.watcher.remove_root(root)
+                finally:
+                    self._watcher_lock.release()
+            else:
+                # Removed by the thread using the watcher next
+                self._unwatched_roots.append(root)
+        self.stats.evictions += 1
+        return index
+
+    def memory_bytes(self) -> int:
+        """ Estimated memory of all cached indices, compared to the budget.
+        """
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def project_stats(self) -> List[ProjectStats]:
+        """ Get sizes of cached indices by project.
+
+        It walks all objects of indices to estimate their memory,
+        so it is not meant to be called frequently.
+        """
+        with self._lock:
+            indices = sorted(
+                (root, index, len(self._helpers.get(root, {})))
+                for root, index in self._indices.items()
+            )
+        return [
+            ProjectStats.of_index(root, index, helper_num)
+            for root, index, helper_num in indices
+        ]
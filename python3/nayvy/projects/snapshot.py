@@ -0,0 +1,82 @@
+"""
+Snapshots of `ProjectIndex` evicted from memory
+
+A snapshot is consumed when it is restored, and then it is brought
+up to date by `ProjectImportHelperBuilder.refresh`,
+which loads only scripts modified since the index was loaded.
+"""
+import os
+import pickle
+from os.path import dirname, exists
+from typing import Optional
+
+from .modules.cache import get_project_cache_dir
+from .path import ProjectIndex
+
+# Bump this when the pickled layout of `ProjectIndex` changes
+SNAPSHOT_FORMAT_VERSION = 3
+
+SNAPSHOT_FILENAME = 'index.pickle'
+
+
+def get_snapshot_path(root: str, cache_root: str = '') -> str:
+    """ Get the path of the snapshot of the index of the project at `root`.
+    """
+    return '{}/{}'.format(
+        get_project_cache_dir(root, cache_root),
+        SNAPSHOT_FILENAME,
+    )
+
+
+def save_snapshot(
+    root: str,
+    index: ProjectIndex,
+    cache_root: str = '',
+) -> None:
+    """ Write `index` of the project at `root` to disk.
+
+    Failures are silently ignored, as the index can be built again.
+    """
+    snapshot_path = get_snapshot_path(root, cache_root)
+    tmp_path = '{}.{}.tmp'.format(snapshot_path, os.getpid())
+    try:
+        os.makedirs(dirname(snapshot_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(
+                (SNAPSHOT_FORMAT_VERSION, index),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, snapshot_path)
+    except (OSError, pickle.PicklingError):
+        return
+    return
+
+
+def load_snapshot(
+    root: str,
+    cache_root: str = '',
+) -> Optional[ProjectIndex]:
+    """ Read (and remove) the snapshot of the index of the project at `root`.
+
+    Broken or incompatible snapshots are silently ignored.
+    """
+    snapshot_path = get_snapshot_path(root, cache_root)
+    if not exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, 'rb') as f:
+            version, index = pickle.load(f)
+    except Exception:
+        return None
+    finally:
+        try:
+            os.remove(snapshot_path)
+        except OSError:
+            pass
+    if (
+        version != SNAPSHOT_FORMAT_VERSION or
+        not isinstance(index, ProjectIndex)
+    ):
+        return None
+    return index
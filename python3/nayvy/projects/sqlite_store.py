@@ -0,0 +1,529 @@
+"""
+SQLite database of symbols defined in project modules
+"""
+import os
+import pickle
+import sqlite3
+import hashlib
+import threading
+from os.path import dirname
+from typing import Any, Generator, Iterator, List, Optional, Tuple
+
+from nayvy.importing.fixer import ImportStatementMap
+from nayvy.importing.import_statement import SingleImport
+
+from .discovery import mod_walk_order_key
+from .modules.cache import get_project_cache_dir
+from .modules.models import Module
+from .symbol_table import KIND_CLASS, KIND_FUNCTION
+
+# Bump this when the schema changes (older databases are dropped)
+SQLITE_FORMAT_VERSION = 2
+
+SQLITE_FILENAME = 'index.sqlite3'
+
+# Seconds to wait for other processes (i.g. vim instances) writing
+BUSY_TIMEOUT_SECONDS = 5.0
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS modules (
+        id INTEGER PRIMARY KEY,
+        mod_path TEXT NOT NULL UNIQUE,
+        filepath TEXT NOT NULL,
+        walk_order TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        hash TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS symbols (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        lower_name TEXT NOT NULL,
+        kind INTEGER NOT NULL,
+        module_id INTEGER NOT NULL
+            REFERENCES modules(id) ON DELETE CASCADE,
+        line_begin INTEGER NOT NULL,
+        line_end INTEGER NOT NULL,
+        signature TEXT NOT NULL,
+        docstring TEXT NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name)',
+    'CREATE INDEX IF NOT EXISTS symbols_lower_name ON symbols (lower_name, name)',
+    'CREATE INDEX IF NOT EXISTS symbols_module_id ON symbols (module_id)',
+]
+
+# Full-text index of symbols, kept in sync with `symbols` by triggers
+FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5 (
+        name,
+        docstring,
+        content='symbols',
+        content_rowid='id'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS symbols_fts_insert AFTER INSERT ON symbols
+    BEGIN
+        INSERT INTO symbols_fts (rowid, name, docstring)
+        VALUES (new.id, new.name, new.docstring);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS symbols_fts_delete AFTER DELETE ON symbols
+    BEGIN
+        INSERT INTO symbols_fts (symbols_fts, rowid, name, docstring)
+        VALUES ('delete', old.id, old.name, old.docstring);
+    END
+    ''',
+]
+
+# Definitions of a name, the one imported first: of the module latest
+# in walk order (see `mod_walk_order_key`), and defined last in the module
+DEFINITIONS = '''
+    FROM symbols AS s JOIN modules AS m ON s.module_id = m.id
+    WHERE s.name = ?
+    ORDER BY m.walk_order DESC, s.id DESC
+'''
+
+# Columns of a definition to make `SingleImport`
+LOCATION = 'SELECT s.name, m.mod_path, m.filepath, s.line_begin, s.line_end'
+
+
+def get_sqlite_index_path(root: str, cache_root: str = '') -> str:
+    """ Get the path of the database of the project at `root`.
+    """
+    return '{}/{}'.format(
+        get_project_cache_dir(root, cache_root),
+        SQLITE_FILENAME,
+    )
+
+
+def _encode_walk_order(mod_path: str) -> str:
+    """ Encode `mod_walk_order_key` into a string of the same order.
+    """
+    return '\x01'.join(
+        '{}{}'.format(kind, name) for kind, name in mod_walk_order_key(mod_path)
+    )
+
+
+def _upper_bound(prefix: str) -> Optional[str]:
+    """ Get the smallest string greater than all strings starting with `prefix`.
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10ffff:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def _stat_and_hash(filepath: str) -> Tuple[int, int, str]:
+    """ Get (mtime_ns, size, sha1 of the content) of the script.
+    """
+    try:
+        stat = os.stat(filepath)
+        with open(filepath, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return (0, -1, '')
+    return (stat.st_mtime_ns, stat.st_size, digest)
+
+
+class SqliteSymbolStore(ImportStatementMap):
+    """
+    Symbols stored in a SQLite database per project instead of in memory.
+
+    It has the same interface as `SymbolTable`:
+    statements import symbols from their absolute module paths,
+    and definitions are to be loaded lazily (see `SingleImport.resolve`).
+    Each module is updated in one transaction, and the database is
+    in WAL mode, so that vim instances opening the same project
+    read it concurrently and see modules upserted by each other.
+
+    Of modules defining the same name, the one latest in walk order
+    is imported, as in `SymbolTable`.
+
+    Prefix queries are range scans over an index of lowercased names,
+    and docstrings are searched with FTS5 if sqlite is built with it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, fts: bool) -> None:
+        self._conn = conn
+        self._fts = fts
+        # The connection is shared with the thread warming up the index.
+        self._lock = threading.Lock()
+        return
+
+    @classmethod
+    def open(cls, path: str) -> Optional['SqliteSymbolStore']:
+        """ Open (or create) the database at `path`.
+
+        Databases of other format versions are cleared,
+        and None is returned if the database cannot be opened.
+        """
+        try:
+            os.makedirs(dirname(path), exist_ok=True)
+            conn = sqlite3.connect(
+                path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+        except (OSError, sqlite3.Error):
+            return None
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA foreign_keys = ON')
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version != SQLITE_FORMAT_VERSION:
+                    for table in ['symbols_fts', 'symbols', 'modules', 'meta']:
+                        conn.execute(f'DROP TABLE IF EXISTS {table}')
+                    conn.execute(f'PRAGMA user_version = {SQLITE_FORMAT_VERSION}')
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                fts = cls._create_fts(conn)
+        except sqlite3.Error:
+            conn.close()
+            return None
+        return SqliteSymbolStore(conn, fts)
+
+    @staticmethod
+    def _create_fts(conn: sqlite3.Connection) -> bool:
+        """ Create the full-text index, or return False if FTS5 is missing.
+        """
+        try:
+            conn.execute('SAVEPOINT fts')
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+            conn.execute('RELEASE fts')
+        except sqlite3.OperationalError:
+            conn.execute('ROLLBACK TO fts')
+            conn.execute('RELEASE fts')
+            return False
+        return True
+
+    def __reduce__(self) -> Any:
+        raise pickle.PicklingError('SqliteSymbolStore is persisted by itself')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        return
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _scalar(self, sql: str, params: Tuple[Any, ...] = ()) -> Any:
+        rows = self._query(sql, params)
+        return rows[0][0] if rows else None
+
+    @property
+    def loaded_at_ns(self) -> int:
+        """ When scripts were last (re)loaded into the database.
+        """
+        value = self._scalar(
+            "SELECT value FROM meta WHERE key = 'loaded_at_ns'",
+        )
+        return value if value is not None else 0
+
+    @loaded_at_ns.setter
+    def loaded_at_ns(self, value: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('loaded_at_ns', ?)",
+                (value,),
+            )
+        return
+
+    @property
+    def module_num(self) -> int:
+        return int(self._scalar('SELECT COUNT(*) FROM modules'))
+
+    @property
+    def symbol_num(self) -> int:
+        return int(self._scalar('SELECT COUNT(DISTINCT name) FROM symbols'))
+
+    @property
+    def fts(self) -> bool:
+        return self._fts
+
+    def has_module(self, mod_path: str) -> bool:
+        return self._scalar(
+            'SELECT 1 FROM modules WHERE mod_path = ?',
+            (mod_path,),
+        ) is not None
+
+    def module_paths(self) -> List[str]:
+        return [
+            mod_path for mod_path, in
+            self._query('SELECT mod_path FROM modules ORDER BY id')
+        ]
+
+    def module_names(self, mod_path: str) -> List[str]:
+        return [
+            name for name, in self._query(
+                '''
+                SELECT s.name
+                FROM symbols AS s JOIN modules AS m ON s.module_id = m.id
+                WHERE m.mod_path = ?
+                ORDER BY s.id
+                ''',
+                (mod_path,),
+            )
+        ]
+
+    def module_of(self, name: str) -> Optional[str]:
+        """ Get the module path `name` is currently imported from.
+        """
+        mod_path: Optional[str] = self._scalar(
+            'SELECT m.mod_path' + DEFINITIONS + 'LIMIT 1',
+            (name,),
+        )
+        return mod_path
+
+    def kind(self, name: str) -> Optional[int]:
+        """ Get `KIND_FUNCTION` or `KIND_CLASS` of the definition of `name`.
+        """
+        kind: Optional[int] = self._scalar(
+            'SELECT s.kind' + DEFINITIONS + 'LIMIT 1',
+            (name,),
+        )
+        return kind
+
+    def is_fresh(self, mod_path: str, filepath: str) -> bool:
+        """ Check if the module stored is loaded from the current script.
+
+        Scripts touched but unchanged (i.g. by checking out branches)
+        are recognized by their hashes, and their mtime is updated.
+        """
+        rows = self._query(
+            'SELECT filepath, mtime_ns, size, hash FROM modules WHERE mod_path = ?',
+            (mod_path,),
+        )
+        if not rows:
+            return False
+        stored_filepath, mtime_ns, size, digest = rows[0]
+        if stored_filepath != filepath:
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+            return True
+        if stat.st_size != size:
+            return False
+        new_mtime_ns, _, new_digest = _stat_and_hash(filepath)
+        if new_digest != digest:
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE modules SET mtime_ns = ? WHERE mod_path = ?',
+                (new_mtime_ns, mod_path),
+            )
+        return True
+
+    @staticmethod
+    def _single_import(row: Tuple[Any, ...]) -> SingleImport:
+        name, mod_path, filepath, line_begin, line_end = row
+        return SingleImport(
+            name,
+            f'from {mod_path} import {name}',
+            2,  # project level
+            filepath=filepath,
+            line_begin=line_begin,
+            line_end=line_end,
+        )
+
+    # Override
+    def __getitem__(self, name: str) -> Optional[SingleImport]:
+        rows = self._query(
+            LOCATION + DEFINITIONS + 'LIMIT 1',
+            (name,),
+        )
+        return self._single_import(rows[0]) if rows else None
+
+    def lookup_outside(
+        self,
+        name: str,
+        mod_path: str,
+    ) -> Optional[Tuple[str, SingleImport]]:
+        """ Get the module path and statement of `name` imported
+        if the module `mod_path` were removed.
+        """
+        for row in self._query(LOCATION + DEFINITIONS, (name,)):
+            if row[1] != mod_path:
+                return row[1], self._single_import(row)
+        return None
+
+    # Override
+    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
+        rows = self._query(
+            LOCATION + '''
+            FROM symbols AS s JOIN modules AS m ON s.module_id = m.id
+            WHERE s.id = (
+                SELECT s2.id
+                FROM symbols AS s2 JOIN modules AS m2 ON s2.module_id = m2.id
+                WHERE s2.name = s.name
+                ORDER BY m2.walk_order DESC, s2.id DESC
+                LIMIT 1
+            )
+            ORDER BY s.id
+            ''',
+        )
+        for row in rows:
+            yield row[0], self._single_import(row)
+
+    # Override
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        # Same order as `SortedNameIndex`, as UTF-8 is compared by code points.
+        lower_prefix = prefix.lower()
+        upper = _upper_bound(lower_prefix)
+        sql = 'SELECT DISTINCT lower_name, name FROM symbols WHERE lower_name >= ?'
+        params: Tuple[Any, ...] = (lower_prefix,)
+        if upper is not None:
+            sql += ' AND lower_name < ?'
+            params += (upper,)
+        sql += ' ORDER BY lower_name, name LIMIT ?'
+        params += (limit if limit > 0 else -1,)
+        return [name for _, name in self._query(sql, params)]
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """ Search names of symbols whose names or docstrings match `query`.
+
+        `query` is a sequence of words, all of which must be found.
+        Names are ranked by bm25 with FTS5, and by name otherwise.
+        """
+        words = query.split()
+        if not words:
+            return []
+        if self._fts:
+            match = ' '.join(
+                '"{}"'.format(word.replace('"', '""')) for word in words
+            )
+            sql = '''
+                SELECT s.name FROM symbols_fts AS f
+                JOIN symbols AS s ON s.id = f.rowid
+                WHERE symbols_fts MATCH ?
+                ORDER BY f.rank
+            '''
+            params: Tuple[Any, ...] = (match,)
+        else:
+            sql = 'SELECT name FROM symbols WHERE {} ORDER BY lower_name, name'.format(
+                ' AND '.join(
+                    "(name || ' ' || docstring) LIKE ? ESCAPE '\\'"
+                    for _ in words
+                ),
+            )
+            params = tuple(
+                '%{}%'.format(
+                    word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'),
+                )
+                for word in words
+            )
+        res: List[str] = []
+        for name, in self._query(sql, params):
+            if name in res:
+                continue
+            res.append(name)
+            if 0 < limit <= len(res):
+                break
+        return res
+
+    def _iter_rows(
+        self,
+        mod: Module,
+    ) -> Iterator[Tuple[str, str, int, int, int, str, str]]:
+        for name, func in mod.function_map.items():
+            yield (
+                name,
+                name.lower(),
+                KIND_FUNCTION,
+                func.line_begin,
+                func.line_end,
+                '\n'.join(func.signature_lines),
+                func.docstring,
+            )
+        for name, klass in mod.class_map.items():
+            yield (
+                name,
+                name.lower(),
+                KIND_CLASS,
+                klass.line_begin,
+                klass.line_end,
+                '\n'.join(klass.signature_lines),
+                '',
+            )
+
+    def upsert_module(self, mod_path: str, filepath: str, mod: Module) -> None:
+        """ Add (or replace) all symbols defined in one module.
+        """
+        mtime_ns, size, digest = _stat_and_hash(filepath)
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM modules WHERE mod_path = ?', (mod_path,))
+            mod_id = self._conn.execute(
+                '''
+                INSERT INTO modules (
+                    mod_path, filepath, walk_order, mtime_ns, size, hash
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    mod_path,
+                    filepath,
+                    _encode_walk_order(mod_path),
+                    mtime_ns,
+                    size,
+                    digest,
+                ),
+            ).lastrowid
+            self._conn.executemany(
+                '''
+                INSERT INTO symbols (
+                    name, lower_name, kind, line_begin, line_end,
+                    signature, docstring, module_id
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (row + (mod_id,) for row in self._iter_rows(mod)),
+            )
+        return
+
+    def remove_module(self, mod_path: str) -> bool:
+        """ Remove all symbols defined in one module.
+
+        It returns whether the module was in the database.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM modules WHERE mod_path = ?',
+                (mod_path,),
+            )
+        return cursor.rowcount > 0
+
+    def estimate_memory(self) -> int:
+        """ Approximate memory of the store in bytes.
+
+        Only the page cache of the connection is counted.
+        """
+        page_size = int(self._scalar('PRAGMA page_size'))
+        cache_size = int(self._scalar('PRAGMA cache_size'))
+        # Negative `cache_size` is in KiB.
+        if cache_size < 0:
+            return -cache_size * 1024
+        return cache_size * page_size
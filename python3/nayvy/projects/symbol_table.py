@@ -0,0 +1,293 @@
+"""
+Compact columnar store of symbols defined in project modules
+"""
+import sys
+from array import array
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
+
+from nayvy.importing.fixer import ImportStatementMap
+from nayvy.importing.import_statement import SingleImport
+from nayvy.importing.name_index import SortedNameIndex
+from nayvy.projects.discovery import mod_walk_order_key
+from nayvy.projects.modules.models import Module
+
+KIND_FUNCTION = 0
+KIND_CLASS = 1
+
+# Max number of `SingleImport` objects kept once materialized
+MATERIALIZED_CACHE_SIZE = 1024
+
+
+class SymbolTable(ImportStatementMap):
+    """
+    Symbols kept in parallel columns instead of one `SingleImport` each.
+
+    Module paths are interned into a table, and each row holds
+    the name, kind, module id and line range of one definition.
+    `SingleImport` objects (importing from the absolute module path)
+    are made only when accessed, with their definitions to be loaded lazily
+    (see `SingleImport.resolve`).
+    Of modules defining the same name, the one latest in walk order
+    is imported, and rows of the others are kept to fall back to.
+    """
+
+    def __init__(self) -> None:
+        # module id -> module path / file path
+        self._mod_paths: List[str] = []
+        self._mod_filepaths: List[str] = []
+        self._mod_ids: Dict[str, int] = {}
+        # module id -> rows of symbols defined in the module
+        self._mod_rows: Dict[int, 'array[int]'] = {}
+
+        # Columns (None name marks a free row)
+        self._names: List[Optional[str]] = []
+        self._kinds = array('b')
+        self._mods = array('i')
+        self._line_begins = array('i')
+        self._line_ends = array('i')
+        self._free_rows: List[int] = []
+
+        # name -> row the name is currently imported from
+        self._rows: Dict[str, int] = {}
+        # name -> rows of the other definitions of the name
+        self._shadowed: Dict[str, List[int]] = {}
+        self._name_index: Optional[SortedNameIndex] = None
+        self._materialized: Dict[str, SingleImport] = {}
+        return
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state['_name_index'] = None
+        state['_materialized'] = {}
+        return state
+
+    @property
+    def module_num(self) -> int:
+        return len(self._mod_rows)
+
+    @property
+    def symbol_num(self) -> int:
+        return len(self._rows)
+
+    def has_module(self, mod_path: str) -> bool:
+        mod_id = self._mod_ids.get(mod_path)
+        return mod_id is not None and mod_id in self._mod_rows
+
+    def module_paths(self) -> List[str]:
+        return [self._mod_paths[mod_id] for mod_id in self._mod_rows]
+
+    def module_names(self, mod_path: str) -> List[str]:
+        mod_id = self._mod_ids.get(mod_path)
+        if mod_id is None or mod_id not in self._mod_rows:
+            return []
+        return [
+            name for name in (self._names[row] for row in self._mod_rows[mod_id])
+            if name is not None
+        ]
+
+    def module_of(self, name: str) -> Optional[str]:
+        """ Get the module path `name` is currently imported from.
+        """
+        row = self._rows.get(name)
+        return self._mod_paths[self._mods[row]] if row is not None else None
+
+    def kind(self, name: str) -> Optional[int]:
+        """ Get `KIND_FUNCTION` or `KIND_CLASS` of the definition of `name`.
+        """
+        row = self._rows.get(name)
+        return self._kinds[row] if row is not None else None
+
+    # Override
+    def __getitem__(self, name: str) -> Optional[SingleImport]:
+        row = self._rows.get(name)
+        if row is None:
+            return None
+        return self._single_import(name, row)
+
+    # Override
+    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
+        return (
+            (name, self._single_import(name, row))
+            for name, row in self._rows.items()
+        )
+
+    # Override
+    def names_with_prefix(self, prefix: str, limit: int = -1) -> List[str]:
+        if self._name_index is None:
+            self._name_index = SortedNameIndex(self._rows)
+        return self._name_index.prefixed(prefix, limit)
+
+    def iter_locations(self) -> Iterator[Tuple[str, str, str, int, int]]:
+        """ Iterate locations of every definition, including shadowed ones.
+        """
+        for mod_id, rows in self._mod_rows.items():
+            for row in rows:
+                name = self._names[row]
+                assert name is not None
+                yield (
+                    name,
+                    self._mod_paths[mod_id],
+                    self._mod_filepaths[mod_id],
+                    self._line_begins[row],
+                    self._line_ends[row],
+                )
+
+    def lookup_outside(
+        self,
+        name: str,
+        mod_path: str,
+    ) -> Optional[Tuple[str, SingleImport]]:
+        """ Get the module path and statement of `name` imported
+        if the module `mod_path` were removed.
+        """
+        row = self._rows.get(name)
+        if row is None:
+            return None
+        rows = [
+            row for row in [row, *self._shadowed.get(name, [])]
+            if self._mod_paths[self._mods[row]] != mod_path
+        ]
+        if not rows:
+            return None
+        row = max(rows, key=self._walk_order_key)
+        return self._mod_paths[self._mods[row]], self._make_single_import(name, row)
+
+    def _make_single_import(self, name: str, row: int) -> SingleImport:
+        mod_id = self._mods[row]
+        return SingleImport(
+            name,
+            f'from {self._mod_paths[mod_id]} import {name}',
+            2,  # project level
+            filepath=self._mod_filepaths[mod_id],
+            line_begin=self._line_begins[row],
+            line_end=self._line_ends[row],
+        )
+
+    def _single_import(self, name: str, row: int) -> SingleImport:
+        single_import = self._materialized.get(name)
+        if single_import is not None:
+            return single_import
+        single_import = self._make_single_import(name, row)
+        if len(self._materialized) >= MATERIALIZED_CACHE_SIZE:
+            self._materialized.clear()
+        self._materialized[name] = single_import
+        return single_import
+
+    def _intern(self, mod_path: str, filepath: str) -> int:
+        mod_id = self._mod_ids.get(mod_path)
+        if mod_id is None:
+            mod_id = len(self._mod_paths)
+            self._mod_paths.append(mod_path)
+            self._mod_filepaths.append(filepath)
+            self._mod_ids[mod_path] = mod_id
+        else:
+            self._mod_filepaths[mod_id] = filepath
+        return mod_id
+
+    def _add_row(
+        self,
+        name: str,
+        kind: int,
+        mod_id: int,
+        line_begin: int,
+        line_end: int,
+    ) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._names[row] = name
+            self._kinds[row] = kind
+            self._mods[row] = mod_id
+            self._line_begins[row] = line_begin
+            self._line_ends[row] = line_end
+        else:
+            row = len(self._names)
+            self._names.append(name)
+            self._kinds.append(kind)
+            self._mods.append(mod_id)
+            self._line_begins.append(line_begin)
+            self._line_ends.append(line_end)
+        current = self._rows.get(name)
+        if current is not None and self._mods[current] != mod_id:
+            if self._walk_order_key(row) < self._walk_order_key(current):
+                # Shadowed by the module later in walk order
+                self._shadowed.setdefault(name, []).append(row)
+                return row
+            self._shadowed.setdefault(name, []).append(current)
+        self._rows[name] = row
+        self._materialized.pop(name, None)
+        if self._name_index is not None:
+            self._name_index.add(name)
+        return row
+
+    def _walk_order_key(self, row: int) -> List[Tuple[int, str]]:
+        return mod_walk_order_key(self._mod_paths[self._mods[row]])
+
+    def upsert_module(self, mod_path: str, filepath: str, mod: Module) -> None:
+        """ Add (or replace) all symbols defined in one module.
+        """
+        self.remove_module(mod_path)
+        mod_id = self._intern(mod_path, filepath)
+        rows = array('i')
+        for name, func in mod.function_map.items():
+            rows.append(self._add_row(
+                name,
+                KIND_FUNCTION,
+                mod_id,
+                func.line_begin,
+                func.line_end,
+            ))
+        for name, klass in mod.class_map.items():
+            rows.append(self._add_row(
+                name,
+                KIND_CLASS,
+                mod_id,
+                klass.line_begin,
+                klass.line_end,
+            ))
+        self._mod_rows[mod_id] = rows
+        return
+
+    def remove_module(self, mod_path: str) -> bool:
+        """ Remove all symbols defined in one module.
+
+        It returns whether the module was in the table.
+        """
+        mod_id = self._mod_ids.get(mod_path)
+        if mod_id is None or mod_id not in self._mod_rows:
+            return False
+        for row in self._mod_rows.pop(mod_id):
+            name = self._names[row]
+            assert name is not None
+            shadowed = self._shadowed.get(name)
+            if self._rows.get(name) == row:
+                self._materialized.pop(name, None)
+                if shadowed:
+                    # Fall back to the definition next in walk order.
+                    next_row = max(shadowed, key=self._walk_order_key)
+                    shadowed.remove(next_row)
+                    self._rows[name] = next_row
+                else:
+                    del self._rows[name]
+                    if self._name_index is not None:
+                        self._name_index.remove(name)
+            elif shadowed is not None and row in shadowed:
+                shadowed.remove(row)
+            if shadowed is not None and not shadowed:
+                del self._shadowed[name]
+            self._names[row] = None
+            self._free_rows.append(row)
+        return True
+
+    def estimate_memory(self) -> int:
+        """ Approximate memory of the table in bytes.
+        """
+        columns = [self._kinds, self._mods, self._line_begins, self._line_ends]
+        return (
+            sum(sys.getsizeof(column) for column in columns) +
+            sys.getsizeof(self._names) +
+            sum(sys.getsizeof(name) for name in self._rows) +
+            sys.getsizeof(self._rows) +
+            sys.getsizeof(self._shadowed) +
+            sum(sys.getsizeof(rows) for rows in self._mod_rows.values()) +
+            sum(sys.getsizeof(mod_path) for mod_path in self._mod_paths) * 2
+        )
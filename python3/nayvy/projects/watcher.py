@@ -0,0 +1,499 @@
+"""
+Watchers of python scripts changed outside the editor
+
+A watcher reports paths of `.py` files created, modified, deleted
+or renamed (both the old and the new path) under watched roots,
+so that they are reflected into project indices one by one
+instead of rescanning whole projects.
+
+`poll` never blocks, and watchers are not thread-safe.
+"""
+import os
+import time
+import errno
+import ctypes
+import select
+import struct
+import ctypes.util
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from os.path import abspath, basename, dirname, join
+from typing import Deque, Dict, List, Set, Tuple
+
+from .discovery import (
+    DEFAULT_PRUNE_DIRS,
+    GitIgnore,
+    is_ignored,
+    scan_python_dir,
+    walk_python_dirs,
+)
+from .path import MTIME_RESOLUTION_NS
+
+# (mtime_ns, size) of a file, which changes whenever it is written
+Stamp = Tuple[int, int]
+
+# Seconds between polls of `PollingWatcher`
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Number of files whose stamps are checked by one poll of `PollingWatcher`
+DEFAULT_FILES_PER_POLL = 1000
+
+
+def _stamp(path: str) -> Stamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (-1, -1)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _is_under(path: str, root: str) -> bool:
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+@dataclass
+class _DirState:
+
+    # rules of parent directories, to scan the directory again
+    parent_gitignores: List[GitIgnore]
+    # rules applied to entries of the directory
+    gitignores: List[GitIgnore]
+    stamp: Stamp
+    # when the directory was scanned, in `time.time_ns()`
+    scanned_at_ns: int
+    sub_dirs: Set[str] = field(default_factory=set)
+    # python script -> its stamp
+    files: Dict[str, Stamp] = field(default_factory=dict)
+
+
+class FileWatcher(ABC):
+    """
+    Base of watchers keeping the directory tree of watched roots.
+    """
+
+    def __init__(self, prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS) -> None:
+        self.prune_dirs = prune_dirs
+        self.roots: List[str] = []
+        self._dirs: Dict[str, _DirState] = {}
+        return
+
+    @property
+    def file_num(self) -> int:
+        return sum(len(state.files) for state in self._dirs.values())
+
+    def files_under(self, dirpath: str) -> List[str]:
+        """ Get scripts known under `dirpath`.
+        """
+        return [
+            path
+            for watched_dir, state in self._dirs.items()
+            if _is_under(watched_dir, dirpath)
+            for path in state.files
+        ]
+
+    def add_root(self, root: str) -> None:
+        """ Start watching scripts under `root`.
+        """
+        root = abspath(root)
+        if root in self.roots:
+            return
+        self.roots.append(root)
+        if root not in self._dirs:
+            self._add_tree(root, [])
+        return
+
+    def remove_root(self, root: str) -> None:
+        """ Stop watching scripts under `root`, unless under another root.
+        """
+        root = abspath(root)
+        if root not in self.roots:
+            return
+        self.roots.remove(root)
+        for dirpath in list(self._dirs):
+            if _is_under(dirpath, root) and not any(
+                _is_under(dirpath, other) for other in self.roots
+            ):
+                self._forget_dir(dirpath)
+        return
+
+    @abstractmethod
+    def poll(self) -> List[str]:
+        """ Get paths of scripts changed since the last poll.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return
+
+    def _watch_dir(self, dirpath: str) -> None:
+        """ Hook called when a directory is found.
+        """
+        return
+
+    def _unwatch_dir(self, dirpath: str) -> None:
+        """ Hook called when a directory is gone.
+        """
+        return
+
+    def _file_stamp(self, path: str) -> Stamp:
+        return (0, 0)
+
+    def _add_tree(self, dirpath: str, gitignores: List[GitIgnore]) -> List[str]:
+        """ Start watching `dirpath` and its sub directories.
+
+        Scripts found there are returned.
+        """
+        found: List[str] = []
+        for python_dir, parent_gitignores in walk_python_dirs(
+            dirpath,
+            self.prune_dirs,
+            gitignores=gitignores,
+        ):
+            if python_dir.path in self._dirs:
+                continue
+            self._watch_dir(python_dir.path)
+            self._dirs[python_dir.path] = _DirState(
+                parent_gitignores,
+                python_dir.gitignores,
+                _stamp(python_dir.path),
+                time.time_ns(),
+                set(python_dir.sub_dirs),
+                {
+                    path: self._file_stamp(path)
+                    for path in python_dir.python_paths
+                },
+            )
+            found += python_dir.python_paths
+        return found
+
+    def _remove_tree(self, dirpath: str) -> List[str]:
+        """ Stop watching `dirpath` and its sub directories.
+
+        Scripts known there are returned.
+        """
+        removed: List[str] = []
+        for path in list(self._dirs):
+            if _is_under(path, dirpath):
+                removed += self._forget_dir(path)
+        parent = self._dirs.get(dirname(dirpath))
+        if parent is not None:
+            parent.sub_dirs.discard(dirpath)
+        return removed
+
+    def _forget_dir(self, dirpath: str) -> List[str]:
+        self._unwatch_dir(dirpath)
+        return list(self._dirs.pop(dirpath).files)
+
+    def _rescan_dir(self, dirpath: str) -> List[str]:
+        """ Scan `dirpath` again, and get scripts changed there.
+        """
+        state = self._dirs[dirpath]
+        python_dir = scan_python_dir(
+            dirpath,
+            state.parent_gitignores,
+            self.prune_dirs,
+        )
+        if python_dir is None:
+            return self._remove_tree(dirpath)
+
+        changed: List[str] = []
+        files = {
+            path: self._file_stamp(path)
+            for path in python_dir.python_paths
+        }
+        for path, stamp in files.items():
+            if state.files.get(path) != stamp:
+                changed.append(path)
+        changed += [path for path in state.files if path not in files]
+        state.files = files
+        state.gitignores = python_dir.gitignores
+        state.stamp = _stamp(dirpath)
+        state.scanned_at_ns = time.time_ns()
+
+        sub_dirs = set(python_dir.sub_dirs)
+        for sub_dir in sorted(state.sub_dirs - sub_dirs):
+            changed += self._remove_tree(sub_dir)
+        for sub_dir in sorted(sub_dirs - state.sub_dirs):
+            changed += self._add_tree(sub_dir, python_dir.gitignores)
+        state.sub_dirs = sub_dirs
+        return changed
+
+
+class PollingWatcher(FileWatcher):
+    """
+    Watcher comparing stamps of directories and files.
+
+    Creation, deletion and renaming change the mtime of the directory,
+    so only changed directories are scanned again.
+    Files modified in place are found by checking a bounded number of
+    files per poll in turn.
+    """
+
+    def __init__(
+        self,
+        prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        files_per_poll: int = DEFAULT_FILES_PER_POLL,
+    ) -> None:
+        super().__init__(prune_dirs)
+        self.interval = interval
+        self.files_per_poll = files_per_poll
+        self._last_polled = -float('inf')
+        # files to be checked by next polls
+        self._check_queue: Deque[str] = deque()
+        return
+
+    # Override
+    def _file_stamp(self, path: str) -> Stamp:
+        return _stamp(path)
+
+    # Override
+    def poll(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._last_polled < self.interval:
+            return []
+        self._last_polled = now
+
+        changed: List[str] = []
+        for dirpath in list(self._dirs):
+            state = self._dirs.get(dirpath)
+            if state is None:
+                # Removed with its parent
+                continue
+            stamp = _stamp(dirpath)
+            if (
+                stamp != state.stamp or
+                # Changed right after the scan may keep the coarse mtime.
+                stamp[0] >= state.scanned_at_ns - MTIME_RESOLUTION_NS
+            ):
+                changed += self._rescan_dir(dirpath)
+
+        if not self._check_queue:
+            self._check_queue.extend(
+                path for state in self._dirs.values() for path in state.files
+            )
+        for _ in range(min(self.files_per_poll, len(self._check_queue))):
+            path = self._check_queue.popleft()
+            state = self._dirs.get(dirname(path))
+            if state is None or path not in state.files:
+                continue
+            stamp = _stamp(path)
+            if stamp != state.files[path]:
+                state.files[path] = stamp
+                changed.append(path)
+        return list(dict.fromkeys(changed))
+
+
+# Constants of inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE |
+    IN_MOVED_FROM |
+    IN_MOVED_TO |
+    IN_CREATE |
+    IN_DELETE |
+    IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher(FileWatcher):
+    """
+    Watcher receiving events of watched directories from inotify(7).
+
+    Roots with directories which cannot be watched
+    (i.g. ENOSPC when exceeding `max_user_watches`)
+    are handed over to a `PollingWatcher`.
+
+    OSError is raised if inotify is unavailable,
+    and AttributeError if the C library doesn't provide it.
+    """
+
+    def __init__(
+        self,
+        prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        super().__init__(prune_dirs)
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6',
+            use_errno=True,
+        )
+        self._libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+        self._wds: Dict[int, str] = {}
+        self._dir_wds: Dict[str, int] = {}
+        self._polling = PollingWatcher(prune_dirs, poll_interval)
+        # directories failed to be watched, whose roots are to be polled
+        self._unwatchable: List[str] = []
+        return
+
+    # Override
+    @property
+    def file_num(self) -> int:
+        return super().file_num + self._polling.file_num
+
+    # Override
+    def add_root(self, root: str) -> None:
+        if abspath(root) in self._polling.roots:
+            return
+        super().add_root(root)
+        self._poll_unwatchable()
+        return
+
+    # Override
+    def remove_root(self, root: str) -> None:
+        super().remove_root(root)
+        self._polling.remove_root(root)
+        return
+
+    # Override
+    def _add_tree(self, dirpath: str, gitignores: List[GitIgnore]) -> List[str]:
+        try:
+            return super()._add_tree(dirpath, gitignores)
+        except OSError:
+            self._unwatchable.append(dirpath)
+            return []
+
+    def _poll_unwatchable(self) -> List[str]:
+        """ Hand over roots of directories failed to be watched to the polling watcher.
+
+        Scripts under those directories are returned.
+        """
+        found: List[str] = []
+        for dirpath in self._unwatchable:
+            for root in [root for root in self.roots if _is_under(dirpath, root)]:
+                super().remove_root(root)
+                self._polling.add_root(root)
+            found += self._polling.files_under(dirpath)
+        self._unwatchable.clear()
+        return found
+
+    # Override
+    def _watch_dir(self, dirpath: str) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd,
+            os.fsencode(dirpath),
+            WATCH_MASK,
+        )
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                # Gone (or unreadable) before being watched
+                return
+            # i.g.) ENOSPC when exceeding `max_user_watches`
+            raise OSError(err, os.strerror(err), dirpath)
+        self._wds[wd] = dirpath
+        self._dir_wds[dirpath] = wd
+        return
+
+    # Override
+    def _unwatch_dir(self, dirpath: str) -> None:
+        wd = self._dir_wds.pop(dirpath, None)
+        if wd is not None:
+            self._wds.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+        return
+
+    def _read_events(self) -> List[Tuple[int, int, str]]:
+        events: List[Tuple[int, int, str]] = []
+        while select.select([self._fd], [], [], 0)[0]:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + name_len].rstrip(b'\0'))
+                offset += name_len
+                events.append((wd, mask, name))
+        return events
+
+    # Override
+    def poll(self) -> List[str]:
+        changed: List[str] = []
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events are lost, so every directory is scanned again.
+                for dirpath in list(self._dirs):
+                    if dirpath in self._dirs:
+                        changed += self._rescan_dir(dirpath)
+                continue
+            if mask & IN_IGNORED:
+                dirpath = self._wds.pop(wd, '')
+                if self._dir_wds.get(dirpath) == wd:
+                    del self._dir_wds[dirpath]
+                continue
+            parent = self._wds.get(wd)
+            state = self._dirs.get(parent) if parent is not None else None
+            if parent is None or state is None:
+                continue
+            path = join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed += self._remove_tree(path)
+                elif (
+                    mask & (IN_CREATE | IN_MOVED_TO) and
+                    basename(path) not in self.prune_dirs and
+                    not is_ignored(path, True, state.gitignores)
+                ):
+                    state.sub_dirs.add(path)
+                    changed += self._add_tree(path, state.gitignores)
+                continue
+            if name == '.gitignore':
+                changed += self._rescan_dir(parent)
+                continue
+            if not name.endswith('.py'):
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                if state.files.pop(path, None) is not None:
+                    changed.append(path)
+            elif not is_ignored(path, False, state.gitignores):
+                state.files[path] = (0, 0)
+                changed.append(path)
+        changed += self._poll_unwatchable()
+        changed += self._polling.poll()
+        return list(dict.fromkeys(changed))
+
+    # Override
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._polling.close()
+        return
+
+
+def new_watcher(
+    prune_dirs: Tuple[str, ...] = DEFAULT_PRUNE_DIRS,
+) -> FileWatcher:
+    """ Get the inotify watcher where available, or the polling watcher.
+    """
+    try:
+        return InotifyWatcher(prune_dirs)
+    except (OSError, AttributeError):
+        return PollingWatcher(prune_dirs)
+
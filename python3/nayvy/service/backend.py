@@ -0,0 +1,79 @@
+"""
+Operations requested by editors, served in process or by `nayvy serve`
+"""
+from abc import ABCMeta, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+class NayvyBackend(metaclass=ABCMeta):
+    """ Interface of operations on the import maps of projects.
+
+    Every argument and return value is JSON serializable,
+    so that the same operations can be requested over RPC.
+    """
+
+    @abstractmethod
+    def list_imports(
+        self,
+        filepath: str,
+        prefix: str = '',
+        limit: int = -1,
+        width: int = -1,
+    ) -> List[Dict[str, Any]]:
+        """ List available imports for `filepath` as completion items.
+
+        If `prefix` or positive `limit` is given, only the first `limit`
+        candidates matching `prefix` are listed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_import_lines(self, filepath: str) -> List[str]:
+        """ List `<name> : <statement>` lines of all available imports.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def resolve_import(self, filepath: str, name: str) -> str:
+        """ Render the signature of `name` for a completion item.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fix_lines(self, filepath: str, lines: List[str]) -> Optional[List[str]]:
+        """ Add missing imports and remove unused imports of `lines`.
+
+        None is returned if nothing is to be fixed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_imports(
+        self,
+        filepath: str,
+        lines: List[str],
+        names: List[str],
+    ) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def file_written(self, filepath: str) -> None:
+        """ Reflect the written (or deleted) file into the indices.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def warm_up(self, filepath: str) -> None:
+        """ Start building the index of the project of `filepath` in background.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_warming_up(self, filepath: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self) -> List[str]:
+        """ Report sizes of indices, cache hit rates and recent latency.
+        """
+        raise NotImplementedError
@@ -0,0 +1,152 @@
+"""
+Client of `nayvy serve`, implementing `NayvyBackend` over RPC
+"""
+import json
+import socket
+from typing import Any, Dict, List, Optional
+
+from .backend import NayvyBackend
+from .rpc import JSONRPC_VERSION
+
+
+class RpcError(Exception):
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f'{message} ({code})')
+        self.code = code
+        return
+
+
+class RpcClient:
+    """
+    Connection to the server listening on `socket_path`,
+    opened at the first request and reopened after failures.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 10.0) -> None:
+        self._socket_path = socket_path
+        self._timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._last_id = 0
+        return
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(self._socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        return self._sock
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        return
+
+    def call(self, method: str, params: Dict[str, Any]) -> Any:
+        self._last_id += 1
+        request = {
+            'jsonrpc': JSONRPC_VERSION,
+            'id': self._last_id,
+            'method': method,
+            'params': params,
+        }
+        try:
+            sock = self._connect()
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            response = json.loads(self._read_line(sock))
+        except (OSError, ValueError):
+            self.close()
+            raise
+        if 'error' in response:
+            raise RpcError(response['error']['code'], response['error']['message'])
+        return response.get('result')
+
+    def _read_line(self, sock: socket.socket) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError('Connection closed by the server')
+            chunks.append(chunk)
+            if chunk.endswith(b'\n'):
+                return b''.join(chunks)
+
+
+class RemoteBackend(NayvyBackend):
+
+    def __init__(self, client: RpcClient) -> None:
+        self._client = client
+        return
+
+    # Override
+    def list_imports(
+        self,
+        filepath: str,
+        prefix: str = '',
+        limit: int = -1,
+        width: int = -1,
+    ) -> List[Dict[str, Any]]:
+        return self._client.call('list_imports', {  # type: ignore
+            'filepath': filepath,
+            'prefix': prefix,
+            'limit': limit,
+            'width': width,
+        })
+
+    # Override
+    def list_import_lines(self, filepath: str) -> List[str]:
+        return self._client.call(  # type: ignore
+            'list_import_lines',
+            {'filepath': filepath},
+        )
+
+    # Override
+    def resolve_import(self, filepath: str, name: str) -> str:
+        return self._client.call(  # type: ignore
+            'resolve_import',
+            {'filepath': filepath, 'name': name},
+        )
+
+    # Override
+    def fix_lines(self, filepath: str, lines: List[str]) -> Optional[List[str]]:
+        return self._client.call(  # type: ignore
+            'fix_lines',
+            {'filepath': filepath, 'lines': lines},
+        )
+
+    # Override
+    def add_imports(
+        self,
+        filepath: str,
+        lines: List[str],
+        names: List[str],
+    ) -> List[str]:
+        return self._client.call('add_imports', {  # type: ignore
+            'filepath': filepath,
+            'lines': lines,
+            'names': names,
+        })
+
+    # Override
+    def file_written(self, filepath: str) -> None:
+        self._client.call('file_written', {'filepath': filepath})
+        return
+
+    # Override
+    def warm_up(self, filepath: str) -> None:
+        self._client.call('warm_up', {'filepath': filepath})
+        return
+
+    # Override
+    def is_warming_up(self, filepath: str) -> bool:
+        return bool(self._client.call('is_warming_up', {'filepath': filepath}))
+
+    # Override
+    def stats(self) -> List[str]:
+        return self._client.call('stats', {})  # type: ignore
@@ -0,0 +1,301 @@
+"""
+In-process implementation of `NayvyBackend`
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from nayvy.aop.latency import LatencyRecorder
+from nayvy.aop.trace import phase
+from nayvy.importing.fixer import Fixer, ImportStatementMap, LintEngine, LinterForFix
+from nayvy.importing.flake8 import Flake8Engine
+from nayvy.importing.import_config import ImportConfig
+from nayvy.importing.import_statement import SingleImport
+from nayvy.importing.integrated import IntegratedMap
+from nayvy.importing.pyflakes import PyflakesEngine
+from nayvy.importing.ranking import CompletionMatcher, ImportRanker
+from nayvy.importing.ruff import RuffEngine
+from nayvy.projects.modules.cache import CacheStats
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.path import ImportPathFormat, ProjectImportHelperBuilder
+from nayvy.projects.registry import ProjectImportHelperRegistry, render_stats
+from nayvy.projects.watcher import new_watcher
+
+from .backend import NayvyBackend
+
+DEFAULT_PYPROJECT_ROOT_MARKERS = [
+    'pyproject.toml',
+    'setup.py',
+    'setup.cfg',
+    'requirements.txt',
+]
+
+
+@dataclass(frozen=True)
+class ServiceOptions:
+    """ Options of the service, corresponding to `g:nayvy_*` variables.
+    """
+
+    import_config_path: str = ''
+    import_path_format: ImportPathFormat = ImportPathFormat.ALL_RELATIVE
+    linter_for_fix: LinterForFix = LinterForFix.RUFF
+    pyproject_root_markers: List[str] = field(
+        default_factory=lambda: list(DEFAULT_PYPROJECT_ROOT_MARKERS),
+    )
+    index_cache: bool = False
+    index_cache_dir: str = ''
+    index_workers: int = 0
+    lazy_signature: bool = False
+    # Completion doesn't wait for the index being built in background.
+    index_warmup: bool = False
+    # Memory budget of project indices in MiB (unlimited if not positive)
+    index_memory_mb: int = 0
+    # Reflect scripts changed outside the editor into project indices.
+    index_watch: bool = False
+    # Keep project symbols in compact columns (signatures are loaded lazily).
+    index_compact: bool = False
+    # Start from the index mapped from a file written after built.
+    index_mmap: bool = False
+    # Keep project symbols in a database shared by processes.
+    index_sqlite: bool = False
+    completion_matcher: CompletionMatcher = CompletionMatcher.FUZZY
+
+
+def get_lint_engine(linter_for_fix: LinterForFix) -> LintEngine:
+    if linter_for_fix == LinterForFix.PYFLAKES:
+        return PyflakesEngine()
+    elif linter_for_fix == LinterForFix.FLAKE8:
+        return Flake8Engine()
+    return RuffEngine()
+
+
+def _ignore(msg: str) -> None:
+    return
+
+
+class NayvyService(NayvyBackend):
+    """
+    Keep the import config and project indices for the process lifetime,
+    and serve operations on them.
+    """
+
+    def __init__(
+        self,
+        options: ServiceOptions,
+        warning: Callable[[str], None] = _ignore,
+        error: Callable[[str], None] = _ignore,
+        latencies: Optional[LatencyRecorder] = None,
+    ) -> None:
+        self.options = options
+        self._warning = warning
+        self._error = error
+        self.latencies = latencies if latencies is not None else LatencyRecorder()
+        self.registry = ProjectImportHelperRegistry(
+            options.index_memory_mb * 1024 * 1024,
+            new_watcher() if options.index_watch else None,
+        )
+        self.module_cache_stats = CacheStats()
+        self._import_config: Optional[ImportConfig] = None
+        # (key identifying maps and menu width, the maps, listed items)
+        # The maps are referenced to keep their ids unique while cached.
+        self._all_import_dicts: Optional[
+            Tuple[Tuple[int, ...], ImportStatementMap, List[Dict[str, Any]]]
+        ] = None
+        return
+
+    def get_import_config(self) -> Optional[ImportConfig]:
+        if self._import_config is None:
+            self._import_config = ImportConfig.init(
+                self.options.import_config_path,
+            )
+        return self._import_config
+
+    def get_helper_builder(self, filepath: str) -> ProjectImportHelperBuilder:
+        return ProjectImportHelperBuilder(
+            current_filepath=filepath,
+            loader=SyntacticModuleLoader(),
+            import_path_format=self.options.import_path_format,
+            pyproject_root_markers=self.options.pyproject_root_markers,
+            requires_in_pyproject=False,
+            use_cache=self.options.index_cache,
+            cache_root=self.options.index_cache_dir,
+            workers=self.options.index_workers,
+            lazy_signature=self.options.lazy_signature,
+            compact=self.options.index_compact,
+            mapped=self.options.index_mmap,
+            sqlite=self.options.index_sqlite,
+            cache_stats=self.module_cache_stats,
+        )
+
+    def get_stmt_map(
+        self,
+        filepath: str,
+        wait: bool = True,
+    ) -> Optional[ImportStatementMap]:
+        """ Get the map of the import config and the project of `filepath`.
+
+        If `wait` is False and the project index is not ready yet,
+        only the import config is returned while the index warms up.
+        """
+        with phase('import_config'):
+            config = self.get_import_config()
+        if config is None:
+            self._error('Cannot load nayvy config file')
+            return None
+        builder = self.get_helper_builder(filepath)
+        with phase('project_index'):
+            project_import_helper = self.registry.get(builder, wait)
+        if project_import_helper is None:
+            if not wait and self.registry.is_warming_up(builder):
+                return config
+            self._warning(
+                'cannot load project. '
+                '(check if the current buffer is saved correctly, '
+                'or you are working in a Python project)'
+            )
+            return config
+        return IntegratedMap(
+            config,
+            project_import_helper,
+        )
+
+    def _list_all_import_dicts(
+        self,
+        stmt_map: ImportStatementMap,
+        statement_trim_width: int,
+    ) -> List[Dict[str, Any]]:
+        """ List all items, reusing the last result while the maps are unchanged.
+        """
+        key: Tuple[int, ...] = (id(stmt_map), statement_trim_width)
+        if isinstance(stmt_map, IntegratedMap):
+            key = (
+                id(stmt_map.import_config),
+                id(stmt_map.project_import_helper),
+                stmt_map.project_import_helper.version,
+                statement_trim_width,
+            )
+        if self._all_import_dicts is not None and self._all_import_dicts[0] == key:
+            return self._all_import_dicts[2]
+        with phase('serialize'):
+            res = [
+                single_import.to_dict(statement_trim_width)
+                for _, single_import in stmt_map.items()
+            ]
+        self._all_import_dicts = (key, stmt_map, res)
+        return res
+
+    def _get_ranker(self, stmt_map: ImportStatementMap) -> ImportRanker:
+        if isinstance(stmt_map, IntegratedMap):
+            helper = stmt_map.project_import_helper
+            return ImportRanker(helper.current_mod_path, helper.index.module_of)
+        return ImportRanker()
+
+    # Override
+    def list_imports(
+        self,
+        filepath: str,
+        prefix: str = '',
+        limit: int = -1,
+        width: int = -1,
+    ) -> List[Dict[str, Any]]:
+        # Completion must not block while the index warms up.
+        stmt_map = self.get_stmt_map(filepath, wait=not self.options.index_warmup)
+        if stmt_map is None:
+            return []
+        if not prefix and limit <= 0:
+            return self._list_all_import_dicts(stmt_map, width)
+        single_imports: List[SingleImport]
+        if self.options.completion_matcher == CompletionMatcher.FUZZY:
+            with phase('rank'):
+                single_imports = self._get_ranker(stmt_map).rank(
+                    stmt_map,
+                    prefix,
+                    limit,
+                )
+        else:
+            with phase('prefix_query'):
+                single_imports = []
+                for name in stmt_map.names_with_prefix(prefix, limit):
+                    single_import = stmt_map[name]
+                    if single_import is not None:
+                        single_imports.append(single_import)
+        with phase('serialize'):
+            return [
+                single_import.to_dict(width)
+                for single_import in single_imports
+            ]
+
+    # Override
+    def list_import_lines(self, filepath: str) -> List[str]:
+        stmt_map = self.get_stmt_map(filepath)
+        if stmt_map is None:
+            return []
+        # Nearer and more basic imports come first.
+        return [
+            single_import.to_line(color=True)
+            for single_import in self._get_ranker(stmt_map).rank(stmt_map, '')
+        ]
+
+    # Override
+    def resolve_import(self, filepath: str, name: str) -> str:
+        stmt_map = self.get_stmt_map(filepath, wait=not self.options.index_warmup)
+        if stmt_map is None:
+            return ''
+        single_import = stmt_map[name]
+        if single_import is None:
+            return ''
+        return single_import.resolve(
+            SyntacticModuleLoader(),
+        ).signature_to_floating_window()
+
+    # Override
+    def fix_lines(self, filepath: str, lines: List[str]) -> Optional[List[str]]:
+        stmt_map = self.get_stmt_map(filepath)
+        if stmt_map is None:
+            return lines
+        fixer = Fixer(stmt_map, get_lint_engine(self.options.linter_for_fix))
+        return fixer.fix_lines(lines)
+
+    # Override
+    def add_imports(
+        self,
+        filepath: str,
+        lines: List[str],
+        names: List[str],
+    ) -> List[str]:
+        stmt_map = self.get_stmt_map(filepath)
+        if stmt_map is None:
+            return lines
+        fixer = Fixer(stmt_map, PyflakesEngine())
+        return fixer.add_imports(lines, names)
+
+    # Override
+    def file_written(self, filepath: str) -> None:
+        if filepath.endswith('.nayvy'):
+            self._import_config = None
+            return
+        self.registry.update_file(filepath, SyntacticModuleLoader())
+        return
+
+    # Override
+    def warm_up(self, filepath: str) -> None:
+        if not self.options.index_warmup:
+            return
+        self.registry.warm_up(self.get_helper_builder(filepath))
+        return
+
+    # Override
+    def is_warming_up(self, filepath: str) -> bool:
+        if not self.options.index_warmup:
+            return False
+        return self.registry.is_warming_up(self.get_helper_builder(filepath))
+
+    # Override
+    def stats(self) -> List[str]:
+        return render_stats(
+            self.registry.project_stats(),
+            {
+                'project index': self.registry.stats,
+                'module cache': self.module_cache_stats,
+            },
+            self.latencies.summary(),
+        )
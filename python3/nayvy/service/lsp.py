@@ -0,0 +1,405 @@
+"""
+Language Server Protocol mode of nayvy
+
+It serves, over stdio,
+
+- completion of importable names, inserting their import statements
+  as `additionalTextEdits`,
+- a `source.organizeImports` code action fixing imports of the document.
+
+Open documents are kept in memory (full text sync),
+and saved files are reflected into project indices incrementally.
+"""
+import re
+import json
+from urllib.parse import quote, unquote, urlparse
+from typing import IO, Any, Dict, List, Optional, Union
+from io import BufferedIOBase
+
+from nayvy.importing.utils import get_first_line_num, get_import_block_indices
+
+from .backend import NayvyBackend
+from .rpc import (
+    INTERNAL_ERROR,
+    INVALID_REQUEST,
+    JSONRPC_VERSION,
+    METHOD_NOT_FOUND,
+)
+
+# Max number of completion items returned at once
+DEFAULT_COMPLETION_LIMIT = 200
+
+ORGANIZE_IMPORTS = 'source.organizeImports'
+
+# LSP CompletionItemKind
+KIND_FUNCTION = 3
+KIND_CLASS = 7
+KIND_MODULE = 9
+
+# LSP TextDocumentSyncKind
+SYNC_FULL = 1
+
+_WORD_BEFORE_CURSOR = re.compile(r'(\.?)([A-Za-z0-9_]*)$')
+
+Stream = Union[IO[bytes], BufferedIOBase]
+
+
+def uri_to_path(uri: str) -> str:
+    return unquote(urlparse(uri).path)
+
+
+def path_to_uri(path: str) -> str:
+    return 'file://' + quote(path)
+
+
+def utf16_len(s: str) -> int:
+    return len(s.encode('utf-16-le')) // 2
+
+
+def utf16_prefix(s: str, character: int) -> str:
+    """ Get the part of `s` before the UTF-16 offset `character`.
+    """
+    return s.encode('utf-16-le')[:character * 2].decode('utf-16-le', 'ignore')
+
+
+def import_head(lines: List[str]) -> List[str]:
+    """ Get the leading lines which adding imports may change.
+
+    They are followed by the first line left as it is if any,
+    so edits of them are also edits of the whole `lines`.
+    """
+    indices = get_import_block_indices(lines)
+    end = indices[-1][1] if indices else get_first_line_num(lines)
+    return lines[:end + 1]
+
+
+def lines_to_text_edit(
+    old_lines: List[str],
+    new_lines: List[str],
+) -> Optional[Dict[str, Any]]:
+    """ Get the TextEdit replacing only the changed lines.
+
+    Lines are ones split by '\\n', so the last line has no line break.
+    """
+    if old_lines == new_lines:
+        return None
+    max_common = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < max_common and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < max_common - prefix and
+        old_lines[-1 - suffix] == new_lines[-1 - suffix]
+    ):
+        suffix += 1
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+
+    if suffix > 0:
+        # Whole lines are replaced.
+        return {
+            'range': {
+                'start': {'line': prefix, 'character': 0},
+                'end': {'line': len(old_lines) - suffix, 'character': 0},
+            },
+            'newText': ''.join(line + '\n' for line in new_middle),
+        }
+    # Replaced until the end of the document, which has no line break.
+    end = {
+        'line': len(old_lines) - 1,
+        'character': utf16_len(old_lines[-1]),
+    }
+    if prefix == 0:
+        return {
+            'range': {'start': {'line': 0, 'character': 0}, 'end': end},
+            'newText': '\n'.join(new_middle),
+        }
+    return {
+        'range': {
+            'start': {
+                'line': prefix - 1,
+                'character': utf16_len(old_lines[prefix - 1]),
+            },
+            'end': end,
+        },
+        'newText': ''.join('\n' + line for line in new_middle),
+    }
+
+
+def read_message(rfile: Stream) -> Optional[Any]:
+    """ Read a message framed by `Content-Length` header.
+
+    None is returned at EOF.
+    """
+    content_length = -1
+    while True:
+        line = rfile.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode('ascii').partition(':')
+        if name.strip().lower() == 'content-length':
+            content_length = int(value.strip())
+    if content_length < 0:
+        return None
+    return json.loads(rfile.read(content_length))
+
+
+def write_message(wfile: Stream, message: Dict[str, Any]) -> None:
+    body = json.dumps(message).encode('utf-8')
+    wfile.write(b'Content-Length: %d\r\n\r\n' % len(body))
+    wfile.write(body)
+    wfile.flush()
+    return
+
+
+class LanguageServer:
+    """
+    Translate LSP messages into operations of `backend`.
+    """
+
+    def __init__(
+        self,
+        backend: NayvyBackend,
+        completion_limit: int = DEFAULT_COMPLETION_LIMIT,
+    ) -> None:
+        self._backend = backend
+        self._completion_limit = completion_limit
+        # uri -> lines of the open document
+        self._documents: Dict[str, List[str]] = {}
+        # Whether the client resolves `additionalTextEdits` lazily
+        self._resolve_edits = False
+        self._shutdown = False
+        self.exited = False
+        return
+
+    def handle(self, message: Any) -> Optional[Dict[str, Any]]:
+        """ Handle a message and get the response (None for notifications).
+        """
+        if not isinstance(message, dict) or 'method' not in message:
+            # Responses to requests from the server are never expected.
+            return None
+        method = message['method']
+        params = message.get('params') or {}
+        if 'id' not in message:
+            handler = getattr(self, '_on_' + method.replace('/', '_'), None)
+            if handler is not None:
+                try:
+                    handler(params)
+                except Exception:
+                    # Notifications have no way to report errors.
+                    pass
+            return None
+
+        request_id = message['id']
+        if self._shutdown and method != 'exit':
+            return self._error(request_id, INVALID_REQUEST, 'Server is shut down')
+        handler = {
+            'initialize': self._initialize,
+            'shutdown': self._shutdown_request,
+            'textDocument/completion': self._completion,
+            'completionItem/resolve': self._resolve_completion,
+            'textDocument/codeAction': self._code_action,
+        }.get(method)
+        if handler is None:
+            return self._error(
+                request_id,
+                METHOD_NOT_FOUND,
+                f'Method not found: {method}',
+            )
+        try:
+            result = handler(params)
+        except Exception as e:
+            return self._error(request_id, INTERNAL_ERROR, repr(e))
+        return {'jsonrpc': JSONRPC_VERSION, 'id': request_id, 'result': result}
+
+    def serve(self, rfile: Stream, wfile: Stream) -> None:
+        while not self.exited:
+            message = read_message(rfile)
+            if message is None:
+                return
+            response = self.handle(message)
+            if response is not None:
+                write_message(wfile, response)
+        return
+
+    def _error(self, request_id: Any, code: int, message: str) -> Dict[str, Any]:
+        return {
+            'jsonrpc': JSONRPC_VERSION,
+            'id': request_id,
+            'error': {'code': code, 'message': message},
+        }
+
+    # Lifecycle
+
+    def _initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        resolve_support = (
+            (params.get('capabilities') or {})
+            .get('textDocument', {})
+            .get('completion', {})
+            .get('completionItem', {})
+            .get('resolveSupport', {})
+        )
+        self._resolve_edits = (
+            'additionalTextEdits' in resolve_support.get('properties', [])
+        )
+        return {
+            'capabilities': {
+                'textDocumentSync': {
+                    'openClose': True,
+                    'change': SYNC_FULL,
+                    'save': True,
+                },
+                'completionProvider': {'resolveProvider': True},
+                'codeActionProvider': {'codeActionKinds': [ORGANIZE_IMPORTS]},
+            },
+            'serverInfo': {'name': 'nayvy'},
+        }
+
+    def _shutdown_request(self, params: Dict[str, Any]) -> None:
+        self._shutdown = True
+        return None
+
+    def _on_exit(self, params: Dict[str, Any]) -> None:
+        self.exited = True
+        return
+
+    # Document synchronization
+
+    def _on_textDocument_didOpen(self, params: Dict[str, Any]) -> None:
+        document = params['textDocument']
+        self._documents[document['uri']] = document['text'].split('\n')
+        self._backend.warm_up(uri_to_path(document['uri']))
+        return
+
+    def _on_textDocument_didChange(self, params: Dict[str, Any]) -> None:
+        changes = params['contentChanges']
+        if changes:
+            # Only full text sync is advertised.
+            self._documents[params['textDocument']['uri']] = (
+                changes[-1]['text'].split('\n')
+            )
+        return
+
+    def _on_textDocument_didSave(self, params: Dict[str, Any]) -> None:
+        self._backend.file_written(uri_to_path(params['textDocument']['uri']))
+        return
+
+    def _on_textDocument_didClose(self, params: Dict[str, Any]) -> None:
+        self._documents.pop(params['textDocument']['uri'], None)
+        return
+
+    def _on_workspace_didChangeWatchedFiles(self, params: Dict[str, Any]) -> None:
+        for change in params.get('changes', []):
+            self._backend.file_written(uri_to_path(change['uri']))
+        return
+
+    # Features
+
+    def _import_edits(
+        self,
+        filepath: str,
+        head: List[str],
+        name: str,
+    ) -> List[Dict[str, Any]]:
+        """ Get edits importing `name` into the document led by `head`.
+        """
+        edit = lines_to_text_edit(
+            head,
+            self._backend.add_imports(filepath, head, [name]),
+        )
+        return [edit] if edit is not None else []
+
+    def _completion(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        uri = params['textDocument']['uri']
+        position = params['position']
+        lines = self._documents.get(uri, [])
+        line = lines[position['line']] if position['line'] < len(lines) else ''
+        m = _WORD_BEFORE_CURSOR.search(utf16_prefix(line, position['character']))
+        if m is None or m.group(1):
+            # Attributes are never imported.
+            return {'isIncomplete': False, 'items': []}
+        prefix = m.group(2)
+
+        filepath = uri_to_path(uri)
+        single_imports = self._backend.list_imports(
+            filepath,
+            prefix,
+            self._completion_limit,
+        )
+        # Located once, as only the head is changed by every item.
+        head = import_head(lines)
+        items = []
+        for single_import in single_imports:
+            item: Dict[str, Any] = {
+                'label': single_import['name'],
+                'kind': (
+                    KIND_FUNCTION if single_import['func'] else
+                    KIND_CLASS if single_import['klass'] else
+                    KIND_MODULE
+                ),
+                'detail': single_import['statement'],
+                'data': {'uri': uri, 'name': single_import['name']},
+            }
+            if not single_import['lazy']:
+                item['documentation'] = {
+                    'kind': 'markdown',
+                    'value': single_import['info'],
+                }
+            if not self._resolve_edits:
+                item['additionalTextEdits'] = self._import_edits(
+                    filepath,
+                    head,
+                    single_import['name'],
+                )
+            items.append(item)
+        return {
+            'isIncomplete': (
+                len(items) >= self._completion_limit or
+                self._backend.is_warming_up(filepath)
+            ),
+            'items': items,
+        }
+
+    def _resolve_completion(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        data = item.get('data') or {}
+        uri, name = data.get('uri'), data.get('name')
+        if not uri or not name:
+            return item
+        if 'documentation' not in item:
+            item['documentation'] = {
+                'kind': 'markdown',
+                'value': self._backend.resolve_import(uri_to_path(uri), name),
+            }
+        lines = self._documents.get(uri)
+        if 'additionalTextEdits' not in item and lines is not None:
+            item['additionalTextEdits'] = self._import_edits(
+                uri_to_path(uri),
+                import_head(lines),
+                name,
+            )
+        return item
+
+    def _code_action(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        only = (params.get('context') or {}).get('only')
+        if only and not any(
+            ORGANIZE_IMPORTS.startswith(kind) for kind in only
+        ):
+            return []
+        uri = params['textDocument']['uri']
+        lines = self._documents.get(uri)
+        if lines is None:
+            return []
+        fixed_lines = self._backend.fix_lines(uri_to_path(uri), lines)
+        if fixed_lines is None:
+            return []
+        edit = lines_to_text_edit(lines, fixed_lines)
+        if edit is None:
+            return []
+        return [{
+            'title': 'Fix imports (nayvy)',
+            'kind': ORGANIZE_IMPORTS,
+            'edit': {'changes': {uri: [edit]}},
+        }]
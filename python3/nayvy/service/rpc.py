@@ -0,0 +1,227 @@
+"""
+JSON-RPC 2.0 server of `NayvyBackend` operations
+
+Messages are newline-delimited JSON objects, exchanged over
+a Unix domain socket (shared by editors) or stdio.
+Params are passed by name, i.g.
+
+    {"jsonrpc": "2.0", "id": 1, "method": "list_imports",
+     "params": {"filepath": "/path/to/main.py", "prefix": "np"}}
+"""
+import os
+import json
+import time
+import errno
+import socket
+import inspect
+import threading
+import socketserver
+from io import BufferedIOBase
+from os.path import dirname, exists
+from typing import IO, Any, Dict, Optional, Union
+
+from nayvy.aop.latency import LatencyRecorder
+
+from .backend import NayvyBackend
+
+JSONRPC_VERSION = '2.0'
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Operations exposed over RPC
+METHODS = sorted(NayvyBackend.__abstractmethods__)
+
+
+def get_default_socket_path() -> str:
+    """ Get the socket path shared by editors of the same user.
+    """
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR', '')
+    if runtime_dir:
+        return '{}/nayvy.sock'.format(runtime_dir)
+    return '/tmp/nayvy-{}.sock'.format(os.getuid())
+
+
+def _error_response(
+    request_id: Any,
+    code: int,
+    message: str,
+) -> Dict[str, Any]:
+    return {
+        'jsonrpc': JSONRPC_VERSION,
+        'id': request_id,
+        'error': {'code': code, 'message': message},
+    }
+
+
+class RpcServer:
+    """
+    Dispatch JSON-RPC requests to `backend`.
+
+    Requests are handled one at a time, as indices are not thread-safe.
+    """
+
+    def __init__(
+        self,
+        backend: NayvyBackend,
+        latencies: Optional[LatencyRecorder] = None,
+    ) -> None:
+        self._backend = backend
+        self._latencies = latencies
+        self._lock = threading.Lock()
+        return
+
+    def handle(self, request: Any) -> Optional[Dict[str, Any]]:
+        """ Handle a decoded request.
+
+        None is returned for notifications (requests without id).
+        """
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error_response(None, INVALID_REQUEST, 'Invalid request')
+        request_id = request.get('id')
+        is_notification = 'id' not in request
+        method = request['method']
+        params = request.get('params', {})
+
+        if method not in METHODS:
+            response = _error_response(
+                request_id,
+                METHOD_NOT_FOUND,
+                f'Method not found: {method}',
+            )
+        elif not isinstance(params, dict):
+            response = _error_response(
+                request_id,
+                INVALID_PARAMS,
+                'Params must be passed by name',
+            )
+        else:
+            response = self._call(request_id, method, params)
+        return None if is_notification else response
+
+    def _call(
+        self,
+        request_id: Any,
+        method: str,
+        params: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        operation = getattr(self._backend, method)
+        try:
+            inspect.signature(operation).bind(**params)
+        except TypeError as e:
+            return _error_response(request_id, INVALID_PARAMS, str(e))
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                result = operation(**params)
+        except Exception as e:
+            return _error_response(request_id, INTERNAL_ERROR, repr(e))
+        finally:
+            if self._latencies is not None:
+                self._latencies.record(method, time.perf_counter() - start)
+        return {
+            'jsonrpc': JSONRPC_VERSION,
+            'id': request_id,
+            'result': result,
+        }
+
+    def handle_line(self, line: bytes) -> Optional[bytes]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response: Optional[Dict[str, Any]] = _error_response(
+                None,
+                PARSE_ERROR,
+                'Parse error',
+            )
+        else:
+            response = self.handle(request)
+        if response is None:
+            return None
+        return json.dumps(response).encode('utf-8') + b'\n'
+
+    def serve_stream(
+        self,
+        rfile: Union[IO[bytes], BufferedIOBase],
+        wfile: Union[IO[bytes], BufferedIOBase],
+    ) -> None:
+        """ Serve requests read from `rfile` until EOF.
+        """
+        for line in rfile:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            if response is None:
+                continue
+            wfile.write(response)
+            wfile.flush()
+        return
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+    rpc_server: RpcServer
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    server: UnixServer
+
+    def handle(self) -> None:
+        self.server.rpc_server.serve_stream(self.rfile, self.wfile)
+        return
+
+
+def _is_listening(socket_path: str) -> bool:
+    """ Check if a server accepts connections on `socket_path`.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def bind_unix(rpc_server: RpcServer, socket_path: str) -> UnixServer:
+    """ Bind `socket_path` to serve requests with `rpc_server`.
+
+    OSError is raised if another server is listening on it.
+    """
+    if exists(socket_path):
+        if _is_listening(socket_path):
+            raise OSError(
+                errno.EADDRINUSE,
+                'Another server is listening',
+                socket_path,
+            )
+        # Left by a server which was not shut down cleanly.
+        os.remove(socket_path)
+    os.makedirs(dirname(socket_path) or '.', mode=0o700, exist_ok=True)
+    # Never accessible to other users, even before serving
+    umask = os.umask(0o177)
+    try:
+        server = UnixServer(socket_path, _Handler)
+    finally:
+        os.umask(umask)
+    server.rpc_server = rpc_server
+    return server
+
+
+def serve_unix(rpc_server: RpcServer, socket_path: str) -> None:
+    """ Serve requests of any number of clients connecting to `socket_path`.
+
+    OSError is raised if another server is listening on it.
+    """
+    with bind_unix(rpc_server, socket_path) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+    return
@@ -0,0 +1,39 @@
+import sys
+from typing import Any, Set
+
+
+def deep_sizeof(obj: Any) -> int:
+    """ Approximate memory of `obj` and all objects reachable from it.
+
+    Objects shared by several containers are counted once.
+    Classes, functions and modules are not followed.
+    """
+    seen: Set[int] = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, type):
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        if hasattr(o, '__dict__') and not callable(o):
+            stack.append(vars(o))
+        for slot in getattr(type(o), '__slots__', ()):
+            if hasattr(o, slot):
+                stack.append(getattr(o, slot))
+    return size
+
+
+def format_bytes(size: int) -> str:
+    value = float(size)
+    for unit in ['B', 'KiB', 'MiB']:
+        if value < 1024:
+            return f'{value:.1f} {unit}'
+        value /= 1024
+    return f'{value:.1f} GiB'
@@ -1,3 +1,4 @@
 from .importing import *   # noqa
 from .testing import *  # noqa
 from .config import *  # noqa
+from .instrument import *  # noqa
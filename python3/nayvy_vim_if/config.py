@@ -3,6 +3,7 @@ from typing import List, TypeVar
 
 import vim  # noqa
 from nayvy.importing.fixer import LinterForFix
+from nayvy.importing.ranking import CompletionMatcher
 from nayvy.projects.path import ImportPathFormat
 from pivmy import BaseConfig
 
@@ -15,11 +16,27 @@ class Config(BaseConfig):
     linter_for_fix: LinterForFix = LinterForFix.RUFF
     pyproject_root_markers: List[str] = ['pyproject.toml', 'setup.py', 'setup.cfg', 'requirements.txt']  # noqa
     import_config_path: str = ''
+    # project index
+    index_cache: int = 0
+    index_cache_dir: str = ''
+    index_workers: int = 0
+    lazy_signature: int = 0
+    index_warmup: int = 0
+    index_memory_mb: int = 0
+    index_watch: int = 0
+    index_compact: int = 0
+    index_mmap: int = 0
+    index_sqlite: int = 0
+    trace_file: str = ''
+    # nayvy serve
+    server_socket: str = ''
     # coc.nvim
     coc_enabled: int = 1
     cmp_enabled: int = 0
     coc_completion_icon: str = ' nayvy'
     coc_menu_max_width: int = -1
+    completion_limit: int = 200
+    completion_matcher: CompletionMatcher = CompletionMatcher.FUZZY
 
 
 CONFIG = Config.new('nayvy')
@@ -1,86 +1,139 @@
-from dataclasses import dataclass
-from typing import Any, Dict, Generator, List, Optional, Tuple
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 
 import vim  # noqa
-from nayvy.importing.fixer import Fixer, ImportStatementMap, LintEngine, LinterForFix
-from nayvy.importing.flake8 import Flake8Engine
-from nayvy.importing.import_config import ImportConfig
-from nayvy.importing.import_statement import ImportStatement, SingleImport
-from nayvy.importing.pyflakes import PyflakesEngine
+from nayvy.aop.trace import phase
+from nayvy.importing.import_statement import ImportStatement
 from nayvy.importing.utils import get_first_line_num, get_import_block_indices
-from nayvy.projects.modules.loader import SyntacticModuleLoader
-from nayvy.projects.path import ProjectImportHelper, ProjectImportHelperBuilder
+from nayvy.service.backend import NayvyBackend
+from nayvy.service.client import RemoteBackend, RpcClient
+from nayvy.service.local import NayvyService, ServiceOptions
 
 from .config import CONFIG
+from .instrument import latencies, trace_entry
 from .utils import error, warning
-from nayvy.importing.ruff import RuffEngine
 
+R = TypeVar('R')
 
-@dataclass(frozen=True)
-class IntegratedMap(ImportStatementMap):
+# Shared across commands for the lifetime of the editor process
+_service: Optional[NayvyService] = None
+# Set if g:nayvy_server_socket is given
+_remote_backend: Optional[RemoteBackend] = None
+# The unreachable server is not tried again until `_remote_retry_at`,
+# waiting twice as long after each failure.
+_remote_retry_at = 0.0
+_remote_backoff = 0.0
+REMOTE_BACKOFF_MIN = 1.0
+REMOTE_BACKOFF_MAX = 60.0
+# Not to block the editor while the server is busy
+REMOTE_TIMEOUT = 2.0
 
-    import_config: ImportConfig
-    project_import_helper: ProjectImportHelper
 
-    def __getitem__(self, name: str) -> Optional[SingleImport]:
-        single_import = self.project_import_helper[name]
-        if single_import is not None:
-            return single_import
-        single_import = self.import_config[name]
-        if single_import is not None:
-            return single_import
-        return None
+def get_service() -> NayvyService:
+    """ Get the backend running inside the editor.
+    """
+    global _service
+    if _service is None:
+        _service = NayvyService(
+            ServiceOptions(
+                import_config_path=CONFIG.import_config_path,
+                import_path_format=CONFIG.import_path_format,
+                linter_for_fix=CONFIG.linter_for_fix,
+                pyproject_root_markers=CONFIG.pyproject_root_markers,
+                index_cache=bool(CONFIG.index_cache),
+                index_cache_dir=CONFIG.index_cache_dir,
+                index_workers=CONFIG.index_workers,
+                lazy_signature=bool(CONFIG.lazy_signature),
+                index_warmup=bool(CONFIG.index_warmup),
+                index_memory_mb=CONFIG.index_memory_mb,
+                index_watch=bool(CONFIG.index_watch),
+                index_compact=bool(CONFIG.index_compact),
+                index_mmap=bool(CONFIG.index_mmap),
+                index_sqlite=bool(CONFIG.index_sqlite),
+                completion_matcher=CONFIG.completion_matcher,
+            ),
+            warning=warning,
+            error=error,
+            latencies=latencies,
+        )
+    return _service
 
-    def items(self) -> Generator[Tuple[str, SingleImport], Any, Any]:
-        for k, v in self.project_import_helper.items():
-            yield k, v
 
-        for k, v in self.import_config.items():
-            yield k, v
+def with_backend(f: Callable[[NayvyBackend], R]) -> R:
+    """ Run `f` on the nayvy server if configured, or inside the editor.
 
+    While the server cannot be reached, requests are served inside the editor.
+    Errors reported by the server are raised as they are.
+    """
+    global _remote_backend, _remote_retry_at, _remote_backoff
+    if CONFIG.server_socket and time.monotonic() >= _remote_retry_at:
+        if _remote_backend is None:
+            _remote_backend = RemoteBackend(
+                RpcClient(CONFIG.server_socket, REMOTE_TIMEOUT),
+            )
+        try:
+            with phase('rpc'):
+                result = f(_remote_backend)
+        except (OSError, ValueError) as e:
+            if not _remote_backoff:
+                warning(
+                    'nayvy server is not available, '
+                    f'and runs inside the editor: {e}',
+                )
+            _remote_backoff = min(
+                max(_remote_backoff * 2, REMOTE_BACKOFF_MIN),
+                REMOTE_BACKOFF_MAX,
+            )
+            _remote_retry_at = time.monotonic() + _remote_backoff
+        else:
+            _remote_backoff = 0.0
+            return result
+    return f(get_service())
+
+
+def current_filepath() -> str:
+    # Absolute, as the server may run in another directory.
+    return vim.eval('expand("%:p")')  # type: ignore
+
+
+def nayvy_stats() -> List[str]:
+    """ Report sizes of project indices, cache hit rates and recent latency.
+    """
+    return with_backend(lambda backend: backend.stats())
 
-def init_import_stmt_map(filepath: str) -> Optional[ImportStatementMap]:
-    config = ImportConfig.init(CONFIG.import_config_path)
-    if config is None:
-        error('Cannot load nayvy config file')
-        return None
-    project_import_helper = ProjectImportHelperBuilder(
-        current_filepath=filepath,
-        loader=SyntacticModuleLoader(),
-        import_path_format=CONFIG.import_path_format,
-        pyproject_root_markers=CONFIG.pyproject_root_markers,
-        requires_in_pyproject=False,
-    ).build()
-    if project_import_helper is None:
-        warning(
-            'cannot load project. '
-            '(check if the current buffer is saved correctly, '
-            'or you are working in a Python project)'
-        )
-        return config
-    return IntegratedMap(
-        config,
-        project_import_helper,
-    )
+
+def nayvy_warm_up(filepath: str) -> None:
+    """ Start building the index of the project of `filepath` in background.
+    """
+    if not CONFIG.index_warmup:
+        return
+    with_backend(lambda backend: backend.warm_up(filepath))
+    return
+
+
+def nayvy_is_warming_up() -> bool:
+    """ Check if the index of the current buffer is still being built.
+    """
+    if not CONFIG.index_warmup:
+        return False
+    filepath = current_filepath()
+    return with_backend(lambda backend: backend.is_warming_up(filepath))
+
+
+def nayvy_on_buf_write_post(filepath: str) -> None:
+    """ Update cached import maps affected by the written file.
+    """
+    with_backend(lambda backend: backend.file_written(filepath))
+    return
 
 
+@trace_entry
 def nayvy_fix_lines(lines: List[str]) -> Optional[List[str]]:
-    filepath = vim.eval('expand("%")')
-    stmt_map = init_import_stmt_map(filepath)
-    if stmt_map is None:
-        return lines
-    linter: LintEngine
-    if CONFIG.linter_for_fix == LinterForFix.RUFF:
-        linter = RuffEngine()
-    elif CONFIG.linter_for_fix == LinterForFix.PYFLAKES:
-        linter = PyflakesEngine()
-    elif CONFIG.linter_for_fix == LinterForFix.FLAKE8:
-        linter = Flake8Engine()
-    fixer = Fixer(stmt_map, linter)
-    fixed_lines = fixer.fix_lines(lines)
-    return fixed_lines
+    filepath = current_filepath()
+    return with_backend(lambda backend: backend.fix_lines(filepath, lines))
 
 
+@trace_entry
 def nayvy_auto_imports() -> None:
     """
     Automatically
@@ -91,10 +144,12 @@ def nayvy_auto_imports() -> None:
     fixed_lines = nayvy_fix_lines(lines)
     if fixed_lines:
         # update only if fixed_lines is not None
-        vim.current.buffer[:] = fixed_lines
+        with phase('write_buffer'):
+            vim.current.buffer[:] = fixed_lines
     return
 
 
+@trace_entry
 def nayvy_get_fixed_lines(buffer_nr: int) -> Optional[List[str]]:
     """ Get fixed lines of importing fixed.
 
@@ -104,18 +159,19 @@ def nayvy_get_fixed_lines(buffer_nr: int) -> Optional[List[str]]:
     return nayvy_fix_lines(lines)
 
 
+@trace_entry
 def nayvy_import(names: List[str]) -> None:
-    filepath = vim.eval('expand("%")')
-    stmt_map = init_import_stmt_map(filepath)
-    if stmt_map is None:
-        return None
-    fixer = Fixer(stmt_map, PyflakesEngine())
+    filepath = current_filepath()
     lines = vim.current.buffer[:]
-    fixed_lines = fixer.add_imports(lines, names)
-    vim.current.buffer[:] = fixed_lines
+    fixed_lines = with_backend(
+        lambda backend: backend.add_imports(filepath, lines, names),
+    )
+    with phase('write_buffer'):
+        vim.current.buffer[:] = fixed_lines
     return
 
 
+@trace_entry
 def nayvy_import_stmt(statement: str, level: int) -> None:
     lines = vim.current.buffer[:]
 
@@ -170,19 +226,43 @@ def nayvy_import_stmt(statement: str, level: int) -> None:
     return
 
 
-def nayvy_list_imports(coc_menu_max_width: int = -1) -> List[Dict[str, Any]]:
-    """List all available imports
+@trace_entry
+def nayvy_list_imports(
+    coc_menu_max_width: int = -1,
+    prefix: str = '',
+    limit: int = -1,
+) -> List[Dict[str, Any]]:
+    """List available imports
+
+    If `prefix` or positive `limit` is given, only the first `limit` names
+    starting with `prefix` are converted into vim values.
     """
-    filepath = vim.eval('expand("%")')
-    stmt_map = init_import_stmt_map(filepath)
-    if stmt_map is None:
-        return []
-    return [
-        single_import.to_dict(coc_menu_max_width)
-        for _, single_import in stmt_map.items()
-    ]
+    filepath = current_filepath()
+    return with_backend(lambda backend: backend.list_imports(
+        filepath,
+        prefix,
+        limit,
+        coc_menu_max_width,
+    ))
 
 
+def nayvy_completion_limit() -> int:
+    """ Max number of completion items listed at once (unlimited if not positive).
+    """
+    return CONFIG.completion_limit
+
+
+@trace_entry
+def nayvy_resolve_import(name: str) -> str:
+    """ Render signature of `name` for the selected completion item.
+
+    It is mainly used when signatures are loaded lazily.
+    """
+    filepath = current_filepath()
+    return with_backend(lambda backend: backend.resolve_import(filepath, name))
+
+
+@trace_entry
 def nayvy_list_import_lines_for_fzf() -> List[str]:
     """ List all available import list for fzf
 
@@ -193,11 +273,5 @@ def nayvy_list_import_lines_for_fzf() -> List[str]:
     i.g.) tf : import tensorflow as tf
     ---
     """
-    filepath = vim.eval('expand("%")')
-    stmt_map = init_import_stmt_map(filepath)
-    if stmt_map is None:
-        return []
-    return [
-        single_import.to_line(color=True)
-        for _, single_import in stmt_map.items()
-    ]
+    filepath = current_filepath()
+    return with_backend(lambda backend: backend.list_import_lines(filepath))
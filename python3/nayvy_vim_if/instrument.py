@@ -0,0 +1,57 @@
+import time
+from typing import Any, Callable, List, TypeVar
+
+import vim  # noqa
+from nayvy.aop.latency import LatencyRecorder, recorded
+from nayvy.aop.profile import DEFAULT_TOP_N, ProfileResult, profiled, request_profile
+from nayvy.aop.trace import traced
+from nayvy.projects.modules.cache import get_cache_root
+
+from .config import CONFIG
+from .utils import info
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Lines of the last profile summary shown in the scratch buffer
+_profile_lines: List[str] = []
+# Latency of recent calls of entry points, shown by `:NayvyStats`
+latencies = LatencyRecorder()
+
+
+def show_profile(result: ProfileResult) -> None:
+    global _profile_lines
+    _profile_lines = [
+        f'# nayvy profile of {result.entry}',
+        f'# pstats: {result.pstats_path}',
+        '',
+    ] + result.summary.splitlines()
+    # Open the buffer after the operation (i.g. completion) finishes.
+    vim.command('call timer_start(0, {-> nayvy#show_profile()})')
+    return
+
+
+def trace_entry(f: F) -> F:
+    """ Decorator of entry points called from vim.
+
+    Their latency is recorded, they are traced if g:nayvy_trace_file is set,
+    and profiled once requested by `:NayvyProfile`.
+    """
+    return profiled(show_profile)(
+        recorded(latencies)(traced(lambda: CONFIG.trace_file)(f))
+    )
+
+
+def nayvy_profile_next(top_n: int = DEFAULT_TOP_N) -> None:
+    """ Profile the next nayvy operation.
+    """
+    pstats_path = '{}/profiles/{}.pstats'.format(
+        get_cache_root(),
+        time.strftime('%Y%m%d-%H%M%S'),
+    )
+    request_profile(pstats_path, top_n if top_n > 0 else DEFAULT_TOP_N)
+    info('The next nayvy operation will be profiled')
+    return
+
+
+def nayvy_profile_lines() -> List[str]:
+    return _profile_lines
@@ -13,6 +13,7 @@ from nayvy.testing.autogen import AutoGenerator
 from nayvy.utils.string_utils import remove_prefix
 from nayvy.projects.modules.loader import SyntacticModuleLoader
 from .utils import info, error
+from .instrument import trace_entry
 from .config import CONFIG
 
 
@@ -96,6 +97,7 @@ def get_latest_lines(filepath: str) -> List[str]:
         return win.get_lines()
 
 
+@trace_entry
 def nayvy_auto_touch_test() -> None:
     """ Vim interface for touch unittest script.
     """
@@ -115,6 +117,7 @@ def nayvy_auto_touch_test() -> None:
     return
 
 
+@trace_entry
 def nayvy_test_generate_multiple(fzf_selected_lines: List[str]) -> None:
     func_names = [
         remove_prefix(line.split('::')[1].strip(), 'test_')
@@ -123,6 +126,7 @@ def nayvy_test_generate_multiple(fzf_selected_lines: List[str]) -> None:
     return nayvy_test_generate(func_names)
 
 
+@trace_entry
 def nayvy_test_generate(func_names: List[str] = []) -> None:
     """ Vim interface for jumping or generating unittest.
     """
@@ -198,6 +202,7 @@ def nayvy_test_generate(func_names: List[str] = []) -> None:
     return
 
 
+@trace_entry
 def nayvy_list_tested_and_untested_functions() -> Optional[Tuple[List[str], List[str]]]:
     """ Vim interface for listing up
     - Already tested function
@@ -0,0 +1,39 @@
+import unittest
+
+from nayvy.aop.latency import LatencyRecorder, LatencySummary, percentile, recorded
+
+
+class Test(unittest.TestCase):
+
+    def test_percentile(self) -> None:
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 100) == 100.0
+        assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+        assert percentile([], 50) == 0.0
+        return
+
+    def test_latency_recorder(self) -> None:
+        recorder = LatencyRecorder(window=3)
+        for seconds in [10.0, 1.0, 2.0, 3.0]:
+            recorder.record('completion', seconds)
+        recorder.record('fix', 5.0)
+        # The oldest call is out of the window.
+        assert recorder.summary() == {
+            'completion': LatencySummary(3, 2.0, 3.0),
+            'fix': LatencySummary(1, 5.0, 5.0),
+        }
+        return
+
+    def test_recorded(self) -> None:
+        recorder = LatencyRecorder()
+
+        @recorded(recorder)
+        def f(x: int) -> int:
+            return x + 1
+
+        assert f(1) == 2
+        assert f(2) == 3
+        assert recorder.summary()['f'].count == 2
+        return
@@ -0,0 +1,58 @@
+import pstats
+import shutil
+import unittest
+from os.path import dirname
+from typing import List
+
+from nayvy.aop.profile import ProfileResult, pending_profile, profiled, request_profile
+
+
+def hot_function() -> int:
+    return sum(i for i in range(1000))
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = f'{dirname(__file__)}/test_workdir_profile'
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def test_profiled(self) -> None:
+        results: List[ProfileResult] = []
+
+        @profiled(results.append)
+        def inner() -> int:
+            return hot_function()
+
+        @profiled(results.append)
+        def entry() -> int:
+            return inner()
+
+        # Not profiled unless requested
+        assert entry() == 499500
+        assert results == []
+
+        pstats_path = f'{self.work_dir}/profiles/entry.pstats'
+        request_profile(pstats_path, 5)
+        assert entry() == 499500
+        assert pending_profile() is None
+        # Only the outermost call is profiled, once.
+        assert len(results) == 1
+        result = results[0]
+        assert result.entry == 'entry'
+        assert result.pstats_path == pstats_path
+        assert 'hot_function' in result.summary
+
+        stats = pstats.Stats(pstats_path)
+        assert any(
+            func_name == 'hot_function'
+            for _, _, func_name in stats.stats  # type: ignore
+        )
+
+        assert entry() == 499500
+        assert len(results) == 1
+        return
@@ -0,0 +1,93 @@
+import json
+import shutil
+import time
+import unittest
+from os import makedirs
+from os.path import dirname, exists
+from typing import Iterator, List
+
+from nayvy.aop.trace import Trace, count, current_trace, phase, timed_iter, traced
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_phase_is_exclusive(self) -> None:
+        trace = Trace('entry')
+        with trace.phase('outer'):
+            time.sleep(0.02)
+            with trace.phase('inner'):
+                time.sleep(0.05)
+        assert set(trace.phases) == {'outer', 'inner'}
+        assert trace.phases['inner'] >= 0.05
+        assert trace.phases['outer'] < 0.05
+        return
+
+    def test_count(self) -> None:
+        trace = Trace('entry')
+        trace.count('files')
+        trace.count('files', 2)
+        assert trace.counts == {'files': 3}
+        return
+
+
+class TestTraced(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = f'{dirname(__file__)}/test_workdir_trace'
+        makedirs(self.work_dir, exist_ok=True)
+        self.trace_file = f'{self.work_dir}/trace.jsonl'
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir)
+        return
+
+    def _read_traces(self) -> List[dict]:
+        with open(self.trace_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_traced(self) -> None:
+
+        def produce() -> Iterator[int]:
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        @traced(lambda: self.trace_file)
+        def inner() -> None:
+            with phase('inner_phase'):
+                pass
+            return
+
+        @traced(lambda: self.trace_file)
+        def entry() -> List[int]:
+            count('items', 3)
+            inner()
+            return list(timed_iter(produce(), 'produce'))
+
+        assert entry() == [0, 1, 2]
+        assert entry() == [0, 1, 2]
+        assert current_trace() is None
+
+        traces = self._read_traces()
+        assert len(traces) == 2
+        trace = traces[0]
+        assert trace['entry'] == 'entry'
+        assert set(trace['phases']) == {'inner', 'inner_phase', 'produce'}
+        assert trace['phases']['produce'] >= 0.03
+        assert trace['counts'] == {'items': 3, 'payload_bytes': len('[0, 1, 2]')}
+        assert trace['total_seconds'] >= trace['phases']['produce']
+        return
+
+    def test_traced_disabled(self) -> None:
+
+        @traced(lambda: '')
+        def entry() -> int:
+            with phase('phase'):
+                count('items')
+            assert list(timed_iter([1, 2], 'iter')) == [1, 2]
+            return 1
+
+        assert entry() == 1
+        assert not exists(self.trace_file)
+        return
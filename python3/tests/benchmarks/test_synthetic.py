@@ -0,0 +1,36 @@
+import shutil
+import unittest
+from os.path import dirname
+
+from benchmarks.synthetic import (
+    CLASSES_PER_MODULE,
+    FUNCTIONS_PER_MODULE,
+    METHODS_PER_CLASS,
+    generate_project,
+)
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = f'{dirname(__file__)}/test_workdir'
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def test_generate_project(self) -> None:
+        paths = generate_project(self.work_dir, 30)
+        assert len(paths) == 30
+        # Exceeding modules go to sub packages
+        assert any('/sub0/' in path for path in paths)
+
+        mod = SyntacticModuleLoader().load_module_from_path(paths[-1])
+        assert mod is not None
+        assert len(mod.function_map) == FUNCTIONS_PER_MODULE
+        assert len(mod.class_map) == CLASSES_PER_MODULE
+        for klass in mod.class_map.values():
+            assert len(klass.function_map) == METHODS_PER_CLASS
+        return
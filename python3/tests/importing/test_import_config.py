@@ -19,3 +19,17 @@ class TestImportConfig(unittest.TestCase):
         import_config = ImportConfig._of_config_py(str(nayvy_config_path))
         assert import_config is not None
         return
+
+    def test_names_with_prefix(self) -> None:
+        import_config = ImportConfig._of_lines([
+            'import os',
+            'import sys',
+            'from typing import Optional, List',
+            '',
+            'import numpy as np',
+        ])
+        assert import_config is not None
+        assert import_config.names_with_prefix('o') == ['Optional', 'os']
+        assert import_config.names_with_prefix('O', 1) == ['Optional']
+        assert import_config.names_with_prefix('x') == []
+        return
@@ -1,4 +1,7 @@
+import pickle
 import unittest
+from os.path import dirname
+from pathlib import Path
 from typing import List
 
 from nayvy.importing.import_statement import (
@@ -6,6 +9,7 @@ from nayvy.importing.import_statement import (
     SingleImport,
     ImportStatement
 )
+from nayvy.projects.modules.loader import SyntacticModuleLoader
 
 
 class TestImportAsPart(unittest.TestCase):
@@ -24,6 +28,13 @@ class TestImportAsPart(unittest.TestCase):
         assert res.as_what == ''
         return
 
+    def test_eq(self) -> None:
+        assert ImportAsPart.of('numpy as np') == ImportAsPart('numpy', 'np')
+        assert ImportAsPart.of('numpy') != ImportAsPart('numpy', 'np')
+        assert len({ImportAsPart('sys', ''), ImportAsPart('sys', '')}) == 1
+        assert not hasattr(ImportAsPart('sys', ''), '__dict__')
+        return
+
 
 class TestImportStatement(unittest.TestCase):
 
@@ -281,3 +292,79 @@ class TestSingleImport(unittest.TestCase):
             'from ~ import hoge'
         )
         return
+
+    def test_resolve(self) -> None:
+        filepath = str(
+            Path(dirname(__file__)) /
+            '..' /
+            '_resources' /
+            'sample_project' /
+            'package' /
+            'subpackage' /
+            'sub_main.py'
+        )
+        single_import = SingleImport(
+            'sub_top_level_function1',
+            'from .subpackage.sub_main import sub_top_level_function1',
+            2,
+            filepath=filepath,
+            line_begin=2,
+            line_end=11,
+        )
+        assert single_import.is_lazy
+        resolved = single_import.resolve(SyntacticModuleLoader())
+        assert not resolved.is_lazy
+        assert resolved.func is not None
+        assert resolved.func.line_begin == 2
+        assert resolved.func.signature_lines[0] == 'def sub_top_level_function1('
+
+        # Stale line range falls back to loading whole the module.
+        stale = SingleImport(
+            'SubTopLevelClass1',
+            'from .subpackage.sub_main import SubTopLevelClass1',
+            2,
+            filepath=filepath,
+            line_begin=0,
+            line_end=1,
+        )
+        assert stale.resolve(SyntacticModuleLoader()).klass is not None
+
+        # Not lazy
+        assert SingleImport('hoge', 'import hoge', 0).resolve(
+            SyntacticModuleLoader(),
+        ).func is None
+        return
+
+    def test_to_dict(self) -> None:
+        single_import = SingleImport(
+            'hoge',
+            'from .Hoge import hoge',
+            0,
+        )
+        res = single_import.to_dict(20)
+        assert res['trimmed_statement'] == 'from .H~ import hoge'
+        assert res['lazy'] is False
+        # memoized per width
+        assert single_import.to_dict(20) is res
+        assert single_import.to_dict()['trimmed_statement'] == (
+            'from .Hoge import hoge'
+        )
+        return
+
+    def test_pickle(self) -> None:
+        single_import = SingleImport(
+            'hoge',
+            'from .Hoge import hoge',
+            2,
+            filepath='/project/Hoge.py',
+            line_begin=1,
+            line_end=3,
+        )
+        assert not hasattr(single_import, '__dict__')
+        res = single_import.to_dict()
+        loaded = pickle.loads(pickle.dumps(single_import))
+        assert loaded == single_import
+        # Memoized results are not persisted.
+        assert loaded.to_dict() == res
+        assert loaded.to_dict() is not res
+        return
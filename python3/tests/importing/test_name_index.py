@@ -0,0 +1,27 @@
+import unittest
+
+from nayvy.importing.name_index import SortedNameIndex
+
+
+class TestSortedNameIndex(unittest.TestCase):
+
+    def test_prefixed(self) -> None:
+        index = SortedNameIndex(['os', 'Optional', 'OrderedDict', 'sys', 'os'])
+        assert len(index) == 4
+        assert index.prefixed('o') == ['Optional', 'OrderedDict', 'os']
+        assert index.prefixed('OP') == ['Optional']
+        assert index.prefixed('o', 2) == ['Optional', 'OrderedDict']
+        assert index.prefixed('') == ['Optional', 'OrderedDict', 'os', 'sys']
+        assert index.prefixed('z') == []
+        return
+
+    def test_add_remove(self) -> None:
+        index = SortedNameIndex([])
+        index.add('pprint')
+        index.add('Path')
+        index.add('Path')
+        assert index.prefixed('p') == ['Path', 'pprint']
+        index.remove('Path')
+        index.remove('NotExists')
+        assert index.prefixed('p') == ['pprint']
+        return
@@ -0,0 +1,110 @@
+import unittest
+from dataclasses import dataclass
+from typing import Optional
+
+from nayvy.importing.import_config import ImportConfig
+from nayvy.importing.import_statement import SingleImport
+from nayvy.importing.ranking import (
+    FAR_MODULE_DISTANCE,
+    ImportRanker,
+    fuzzy_score,
+    module_distance,
+)
+
+
+class Test(unittest.TestCase):
+
+    def test_fuzzy_score(self) -> None:
+        assert fuzzy_score('xyz', 'DataFrame') is None
+        assert fuzzy_score('', 'DataFrame') == 0.0
+
+        def score(query: str, name: str) -> float:
+            res = fuzzy_score(query, name)
+            assert res is not None, f'{query} : {name}'
+            return res
+
+        # CamelCase / snake_case boundaries are preferred
+        assert score('DF', 'DataFrame') > score('DF', 'Dfoo_x')
+        assert score('df', 'define_function') > score('df', 'defunct')
+        # Consecutive matches are preferred
+        assert score('path', 'Path') > score('path', 'pxaxtxh')
+        return
+
+    def test_module_distance(self) -> None:
+
+        @dataclass
+        class Case:
+            from_what: str
+            expected: int
+
+        for case in [
+            Case('.', 0),
+            Case('.mod', 1),
+            Case('.sub.mod', 2),
+            Case('..mod', 2),
+            Case('..sub.mod', 3),
+            Case('package.mod', FAR_MODULE_DISTANCE),
+        ]:
+            self.assertEqual(
+                module_distance(case.from_what),
+                case.expected,
+                case.from_what,
+            )
+        return
+
+
+class TestImportRanker(unittest.TestCase):
+
+    def test_rank_candidates(self) -> None:
+        candidates = [
+            SingleImport('Optional', 'from typing import Optional', 0),
+            SingleImport('os', 'import os', 0),
+            SingleImport('open_file', 'from ..io.files import open_file', 2),
+            SingleImport('open_db', 'from .db import open_db', 2),
+            SingleImport('sys', 'import sys', 0),
+        ]
+        ranker = ImportRanker(
+            'package.sub.main',
+            {'open_file': 'package.io.files', 'open_db': 'package.sub.db'}.get,
+        )
+        actual = [
+            single_import.name
+            for single_import in ranker.rank_candidates('op', candidates)
+        ]
+        # nearer module comes first among project imports
+        assert actual.index('open_db') < actual.index('open_file')
+        assert 'sys' not in actual
+        assert 'os' not in actual
+
+        limited = ranker.rank_candidates('op', candidates, 1)
+        assert [limited[0].name] == actual[:1]
+        return
+
+    def test_rank_absolute_statement(self) -> None:
+        near = SingleImport('f1', 'from package.sub.mod import f1', 2)
+        far = SingleImport('f2', 'from other.mod import f2', 2)
+        ranker = ImportRanker(
+            'package.sub.main',
+            {'f1': 'package.sub.mod', 'f2': 'other.mod'}.get,
+        )
+        near_score: Optional[float] = ranker.score('f', near)
+        far_score: Optional[float] = ranker.score('f', far)
+        assert near_score is not None and far_score is not None
+        assert near_score > far_score
+        return
+
+    def test_rank(self) -> None:
+        import_config = ImportConfig._of_lines([
+            'import os',
+            'from typing import Optional',
+            'from collections import OrderedDict',
+        ])
+        assert import_config is not None
+        ranker = ImportRanker()
+        actual = [
+            single_import.name
+            for single_import in ranker.rank(import_config, 'od')
+        ]
+        assert actual == ['OrderedDict']
+        assert len(ranker.rank(import_config, '')) == 3
+        return
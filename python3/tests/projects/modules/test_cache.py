@@ -0,0 +1,133 @@
+import os
+import shutil
+import unittest
+from os.path import dirname
+from pathlib import Path
+from typing import List, Optional
+
+from nayvy.projects.modules.cache import CachedModuleLoader, CacheStats
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.modules.models import Module
+
+
+class CountingLoader(SyntacticModuleLoader):
+
+    def __init__(self) -> None:
+        self.loaded_paths: List[str] = []
+        return
+
+    def load_module_from_path(
+        self,
+        module_filepath: str,
+    ) -> Optional[Module]:
+        self.loaded_paths.append(module_filepath)
+        return super().load_module_from_path(module_filepath)
+
+
+class TestCachedModuleLoader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = f'{dirname(__file__)}/test_workdir'
+        self.project_dir = f'{self.work_dir}/project'
+        self.cache_root = f'{self.work_dir}/cache'
+        Path(self.project_dir).mkdir(parents=True, exist_ok=True)
+        self.script_path = f'{self.project_dir}/mod.py'
+        with open(self.script_path, 'w') as f:
+            f.write('def f1():\n    pass\n')
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir)
+        return
+
+    def _open(self, inner: CountingLoader) -> CachedModuleLoader:
+        return CachedModuleLoader.open(
+            inner,
+            self.project_dir,
+            self.cache_root,
+        )
+
+    def test_load_module_from_path(self) -> None:
+        inner = CountingLoader()
+        loader = self._open(inner)
+        mod = loader.load_module_from_path(self.script_path)
+        assert mod is not None
+        assert 'f1' in mod.function_map
+        loader.save()
+        assert os.path.exists(loader.cache_path)
+
+        # Unchanged file is served from the persisted cache
+        inner = CountingLoader()
+        loader = self._open(inner)
+        mod = loader.load_module_from_path(self.script_path)
+        assert mod is not None
+        assert 'f1' in mod.function_map
+        assert inner.loaded_paths == []
+
+        # Modified file is parsed again
+        with open(self.script_path, 'w') as f:
+            f.write('def f1():\n    pass\n\n\ndef f2():\n    pass\n')
+        mod = loader.load_module_from_path(self.script_path)
+        assert mod is not None
+        assert 'f2' in mod.function_map
+        assert len(inner.loaded_paths) == 1
+        return
+
+    def test_save_prune(self) -> None:
+        loader = self._open(CountingLoader())
+        loader.load_module_from_path(self.script_path)
+        loader.save()
+
+        # Nothing is loaded in this session, so the entry is dropped.
+        loader = self._open(CountingLoader())
+        loader.save()
+
+        inner = CountingLoader()
+        loader = self._open(inner)
+        loader.load_module_from_path(self.script_path)
+        assert len(inner.loaded_paths) == 1
+        return
+
+    def test_stats(self) -> None:
+        stats = CacheStats()
+        loader = CachedModuleLoader.open(
+            CountingLoader(),
+            self.project_dir,
+            self.cache_root,
+            stats,
+        )
+        loader.load_module_from_path(self.script_path)
+        loader.save()
+        assert stats == CacheStats(hits=0, misses=1, evictions=0)
+
+        loader = CachedModuleLoader.open(
+            CountingLoader(),
+            self.project_dir,
+            self.cache_root,
+            stats,
+        )
+        loader.load_module_from_path(self.script_path)
+        assert stats == CacheStats(hits=1, misses=1, evictions=0)
+        assert stats.hit_rate == 0.5
+
+        os.remove(self.script_path)
+        loader = CachedModuleLoader.open(
+            CountingLoader(),
+            self.project_dir,
+            self.cache_root,
+            stats,
+        )
+        loader.save()
+        assert stats.evictions == 1
+        return
+
+    def test_broken_cache_file(self) -> None:
+        loader = self._open(CountingLoader())
+        Path(loader.cache_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(loader.cache_path, 'w') as f:
+            f.write('broken')
+        inner = CountingLoader()
+        loader = self._open(inner)
+        assert loader.load_module_from_path(self.script_path) is not None
+        assert len(inner.loaded_paths) == 1
+        return
@@ -5,6 +5,7 @@ from nayvy.projects.modules.models import (
     Class,
     Module,
     Function,
+    FrozenModule,
     FuncDeclType
 )
 
@@ -131,6 +132,14 @@ class TestModule(unittest.TestCase):
         assert assert_not_none(self.m1.get_nearest_function(19)).name == 'a'
         assert self.m1.get_nearest_function(20) is None
 
+    def test_freeze(self) -> None:
+        frozen = self.m1.freeze()
+        assert isinstance(frozen, FrozenModule)
+        assert frozen.thaw() == self.m1
+        assert hash(frozen) == hash(self.m1.freeze())
+        assert frozen.classes[0].functions[1].name == 'b'
+        return
+
     def test_to_func_list_lines(self) -> None:
         assert self.m1.to_func_list_lines() == [
             'top_level::a',
@@ -0,0 +1,112 @@
+import shutil
+import unittest
+from dataclasses import dataclass
+from os.path import dirname, relpath
+from pathlib import Path
+
+from nayvy.projects.discovery import GitIgnoreRule, iter_python_paths
+
+
+class Test(unittest.TestCase):
+
+    def test_git_ignore_rule(self) -> None:
+
+        @dataclass
+        class Case:
+            pattern: str
+            path: str
+            expected: bool
+
+        for case in [
+            Case('*.py', 'a.py', True),
+            Case('*.py', 'dir/a.py', True),
+            Case('/a.py', 'dir/a.py', False),
+            Case('dir/*.py', 'dir/a.py', True),
+            Case('dir/*.py', 'dir/sub/a.py', False),
+            Case('dir/**/a.py', 'dir/sub/sub/a.py', True),
+            Case('**/gen', 'x/y/gen', True),
+            Case('a[0-9].py', 'a1.py', True),
+            Case('a[!0-9].py', 'a1.py', False),
+            Case('a?.py', 'ab.py', True),
+        ]:
+            rule = GitIgnoreRule.of(case.pattern)
+            assert rule is not None
+            self.assertEqual(
+                bool(rule.regex.match(case.path)),
+                case.expected,
+                f'{case.pattern} : {case.path}',
+            )
+
+        assert GitIgnoreRule.of('# comment') is None
+        assert GitIgnoreRule.of('') is None
+        return
+
+
+class TestIterPythonPaths(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = f'{dirname(__file__)}/test_workdir_discovery'
+        for path in [
+            'main.py',
+            'README.md',
+            'package/__init__.py',
+            'package/mod.py',
+            'package/generated_pb2.py',
+            'package/generated/mod.py',
+            'package/keep/generated_pb2.py',
+            'node_modules/lib.py',
+            '.venv/lib.py',
+            'package/__pycache__/mod.py',
+            'ignored_dir/mod.py',
+        ]:
+            Path(f'{self.work_dir}/{path}').parent.mkdir(
+                parents=True,
+                exist_ok=True,
+            )
+            Path(f'{self.work_dir}/{path}').touch()
+        Path(f'{self.work_dir}/.gitignore').write_text(
+            '# comment\n'
+            'ignored_dir/\n'
+            '*_pb2.py\n'
+        )
+        Path(f'{self.work_dir}/package/.gitignore').write_text(
+            'generated\n'
+            '!keep/generated_pb2.py\n'
+        )
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir)
+        return
+
+    def test_iter_python_paths(self) -> None:
+        actual = [
+            relpath(path, self.work_dir)
+            for path in iter_python_paths(self.work_dir)
+        ]
+        assert actual == [
+            'main.py',
+            'package/__init__.py',
+            'package/mod.py',
+            'package/keep/generated_pb2.py',
+        ]
+        return
+
+    def test_iter_python_paths_without_gitignore(self) -> None:
+        actual = sorted(
+            relpath(path, self.work_dir)
+            for path in iter_python_paths(
+                self.work_dir,
+                respect_gitignore=False,
+            )
+        )
+        assert actual == [
+            'ignored_dir/mod.py',
+            'main.py',
+            'package/__init__.py',
+            'package/generated/mod.py',
+            'package/generated_pb2.py',
+            'package/keep/generated_pb2.py',
+            'package/mod.py',
+        ]
+        return
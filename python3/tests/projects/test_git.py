@@ -0,0 +1,143 @@
+import shutil
+import unittest
+import subprocess as sp
+from os.path import dirname
+from pathlib import Path
+from typing import List
+
+from nayvy.projects.discovery import iter_python_paths
+from nayvy.projects.git import GitState
+from nayvy.projects.modules.cache import CachedModuleLoader
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.path import ImportPathFormat, ProjectImportHelperBuilder
+
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestGitState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = Path(dirname(__file__)) / 'test_workdir_git'
+        self.root = self.work_dir / 'project'
+        self.cache_root = str(self.work_dir / 'cache')
+        (self.root / 'package').mkdir(parents=True, exist_ok=True)
+        (self.root / 'setup.py').write_text('')
+        (self.root / 'package' / 'a.py').write_text('def a():\n    pass\n')
+        (self.root / 'package' / 'b.py').write_text('def b():\n    pass\n')
+        self._git(['init', '-q'])
+        self._commit()
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def _git(self, args: List[str]) -> str:
+        return sp.run(
+            ['git', '-C', str(self.root), *args],
+            stdout=sp.PIPE,
+            check=True,
+        ).stdout.decode()
+
+    def _commit(self) -> None:
+        self._git(['add', '-A'])
+        self._git([
+            '-c', 'user.name=nayvy',
+            '-c', 'user.email=nayvy@example.com',
+            'commit', '-q', '-m', 'commit',
+        ])
+        return
+
+    def test_of(self) -> None:
+        package = self.root / 'package'
+        state = GitState.of(str(package))
+        assert state is not None
+        assert state.root == str(package)
+        assert state.prefix == 'package/'
+        assert state.dirty_paths == frozenset()
+        assert state.tracked_paths == {str(package / 'a.py'), str(package / 'b.py')}
+
+        (package / 'a.py').write_text('')
+        (package / 'c.py').write_text('')
+        state = GitState.of(str(package))
+        assert state is not None
+        assert state.dirty_paths == {str(package / 'a.py'), str(package / 'c.py')}
+        return
+
+    def test_changed_since(self) -> None:
+        state = GitState.of(str(self.root))
+        assert state is not None
+        assert state.changed_since(state.head) == frozenset()
+
+        (self.root / 'package' / 'a.py').rename(self.root / 'package' / 'c.py')
+        self._commit()
+        (self.root / 'package' / 'b.py').write_text('')
+        new_state = GitState.of(str(self.root))
+        assert new_state is not None
+        assert new_state.changed_since(state.head) == {
+            str(self.root / 'package' / 'a.py'),
+            str(self.root / 'package' / 'b.py'),
+            str(self.root / 'package' / 'c.py'),
+        }
+        assert new_state.changed_since('0' * 40) is None
+        return
+
+    def test_cache_revalidation(self) -> None:
+        root = str(self.root)
+        loader = CachedModuleLoader.open(SyntacticModuleLoader(), root, self.cache_root)
+        # Nothing recorded yet
+        assert loader.list_python_paths() is None
+        for path in iter_python_paths(root):
+            loader.load_module_from_path(path)
+        loader.save()
+
+        # Switched to another commit, with uncommitted changes
+        (self.root / 'package' / 'a.py').unlink()
+        (self.root / 'package' / 'c.py').write_text('def c():\n    pass\n')
+        self._commit()
+        (self.root / 'package' / 'd.py').write_text('def d():\n    pass\n')
+        (self.root / 'build').mkdir()
+        (self.root / 'build' / 'e.py').write_text('')
+
+        loader = CachedModuleLoader.open(SyntacticModuleLoader(), root, self.cache_root)
+        assert loader.list_python_paths() == list(iter_python_paths(root))
+
+        # Files git doesn't report are trusted without stat.
+        self._git(['update-index', '--assume-unchanged', 'package/b.py'])
+        (self.root / 'package' / 'b.py').write_text('def b2():\n    pass\n')
+        loader = CachedModuleLoader.open(SyntacticModuleLoader(), root, self.cache_root)
+        mod = loader.load_module_from_path(str(self.root / 'package' / 'b.py'))
+        assert mod is not None
+        assert list(mod.function_map) == ['b']
+        return
+
+    def test_excluded_files(self) -> None:
+        # Hidden from git, but still indexed
+        (self.root / '.git' / 'info').mkdir(parents=True, exist_ok=True)
+        (self.root / '.git' / 'info' / 'exclude').write_text('scratch.py\n')
+        scratch = self.root / 'package' / 'scratch.py'
+        scratch.write_text('def scratchy():\n    pass\n')
+        builder = ProjectImportHelperBuilder(
+            str(self.root / 'package' / 'a.py'),
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_ABSOLUTE,
+            ['setup.py'],
+            False,
+            use_cache=True,
+            cache_root=self.cache_root,
+            mapped=True,
+        )
+        helper = builder.build()
+        assert helper is not None and helper['scratchy'] is not None
+
+        # Checked with stat, as git never reports its changes
+        scratch.write_text('def renamed():\n    pass\n')
+        helper = builder.build()
+        assert helper is not None
+        assert helper['scratchy'] is None
+        assert helper['renamed'] is not None
+
+        scratch.unlink()
+        helper = builder.build()
+        assert helper is not None and helper['renamed'] is None
+        assert helper['b'] is not None
+        return
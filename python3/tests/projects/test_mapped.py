@@ -0,0 +1,143 @@
+import os
+import shutil
+import pickle
+import unittest
+from os.path import dirname
+from pathlib import Path
+
+from nayvy.projects.mapped import MappedIndex, write_mapped_index
+from nayvy.projects.modules.models import Function, Module
+from nayvy.projects.path import ModulePath, ProjectIndex
+
+
+class TestMappedIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = Path(dirname(__file__)) / 'test_workdir_mapped'
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.path = str(self.work_dir / 'index.map')
+        write_mapped_index(
+            self.path,
+            [
+                ('fetch', 'package.mod1', '/project/package/mod1.py', 0, 2),
+                ('Fuga', 'package.mod2', '/project/package/mod2.py', 3, 5),
+                ('bar', 'package.mod1', '/project/package/mod1.py', 4, 6),
+                ('f', 'package.mod2', '/project/package/mod2.py', 7, 9),
+            ],
+            123,
+        )
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def test_open(self) -> None:
+        index = MappedIndex.open(self.path)
+        assert index is not None
+        try:
+            assert index.loaded_at_ns == 123
+            assert index.symbol_num == 4
+            assert index.module_num == 2
+
+            single_import = index['Fuga']
+            assert single_import is not None
+            assert single_import.statement == 'from package.mod2 import Fuga'
+            assert single_import.is_lazy
+            assert single_import.filepath == '/project/package/mod2.py'
+            assert (single_import.line_begin, single_import.line_end) == (3, 5)
+            assert index['fuga'] is None
+            assert index['zzz'] is None
+            assert index.module_of('bar') == 'package.mod1'
+
+            assert index.names_with_prefix('f') == ['f', 'fetch', 'Fuga']
+            assert index.names_with_prefix('F', 2) == ['f', 'fetch']
+            assert index.names_with_prefix('x') == []
+            assert [name for name, _ in index.items()] == ['bar', 'f', 'fetch', 'Fuga']
+
+            assert index.has_module('package.mod1')
+            assert not index.has_module('package.mod3')
+            assert sorted(index.module_names('package.mod1')) == ['bar', 'fetch']
+            assert sorted(index.module_paths()) == ['package.mod1', 'package.mod2']
+            with self.assertRaises(pickle.PicklingError):
+                pickle.dumps(index)
+        finally:
+            index.close()
+        return
+
+    def test_shadowed(self) -> None:
+        write_mapped_index(
+            self.path,
+            [
+                ('foo', 'pkg.a', '/project/pkg/a.py', 0, 2),
+                ('foo', 'pkg.sub.c', '/project/pkg/sub/c.py', 0, 2),
+                ('foo', 'pkg.b', '/project/pkg/b.py', 0, 2),
+            ],
+            123,
+        )
+        index = MappedIndex.open(self.path)
+        assert index is not None
+        try:
+            assert index.symbol_num == 1
+            assert index.record_num == 3
+            # Defined in the module latest in walk order
+            assert index.module_of('foo') == 'pkg.sub.c'
+            assert index.module_of('foo', {'pkg.sub.c'}) == 'pkg.b'
+            single_import = index.lookup('foo', {'pkg.sub.c', 'pkg.b'})
+            assert single_import is not None
+            assert single_import.statement == 'from pkg.a import foo'
+            assert index.lookup('foo', {'pkg.a', 'pkg.b', 'pkg.sub.c'}) is None
+            assert index.names_with_prefix('') == ['foo']
+            assert [name for name, _ in index.items()] == ['foo']
+            assert len(list(index.iter_locations())) == 3
+        finally:
+            index.close()
+        return
+
+    def test_broken_file(self) -> None:
+        assert MappedIndex.open(str(self.work_dir / 'missing.map')) is None
+        for content in [b'', b'broken', b'NAYVYMAP' + b'\xff' * 24]:
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            assert MappedIndex.open(self.path) is None
+        return
+
+    def test_project_index(self) -> None:
+        base = MappedIndex.open(self.path)
+        assert base is not None
+        index = ProjectIndex(_base=base)
+        assert index.module_num == 2
+        assert index.symbol_num == 4
+
+        # Modules loaded again hide their symbols in the file.
+        index.upsert_module(ModulePath(
+            'package.mod1',
+            Module({'fetch2': Function.of_name('fetch2')}, {}),
+            '/project/package/mod1.py',
+        ))
+        assert index.module_num == 2
+        assert index.symbol_num == 3
+        assert index['bar'] is None
+        assert index.module_of('fetch2') == 'package.mod1'
+        assert index.module_names('package.mod1') == ['fetch2']
+        assert index.names_with_prefix('f') == ['f', 'fetch2', 'Fuga']
+        assert index.names_with_prefix('f', 2) == ['f', 'fetch2']
+
+        version = index.version
+        index.remove_module('package.mod2')
+        assert index.version == version + 1
+        assert index['Fuga'] is None
+        assert index.module_paths() == ['package.mod1']
+        assert [name for name, _ in index.items()] == ['fetch2']
+
+        # Written again with the symbols loaded on top of the file
+        path = str(self.work_dir / 'index2.map')
+        write_mapped_index(path, index.iter_locations(), 456)
+        mapped = MappedIndex.open(path)
+        assert mapped is not None
+        assert [name for name, _ in mapped.items()] == ['fetch2']
+        assert mapped.module_of('fetch2') == 'package.mod1'
+        mapped.close()
+        base.close()
+        os.remove(path)
+        return
@@ -1,4 +1,9 @@
+import os
+import time
+import shutil
 import unittest
+import threading
+from unittest import mock
 from os.path import dirname
 from pathlib import Path
 from dataclasses import dataclass
@@ -6,10 +11,15 @@ from dataclasses import dataclass
 from nayvy.projects.path import (
     ModulePath,
     ImportPathFormat,
+    ProjectImportHelper,
     ProjectImportHelperBuilder,
+    ProjectIndex,
+    can_fork_safely,
+    iter_chunks,
     mod_relpath
 )
 from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.sqlite_store import SqliteSymbolStore
 from nayvy.projects.modules.models import (
     Class,
     Module,
@@ -131,6 +141,27 @@ class Test(unittest.TestCase):
             )
 
 
+    def test_iter_chunks(self) -> None:
+        assert list(iter_chunks(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(iter_chunks(iter([]), 2)) == []
+        return
+
+    def test_can_fork_safely(self) -> None:
+        main_thread = threading.main_thread()
+        with mock.patch('threading.current_thread', return_value=main_thread), \
+                mock.patch('threading.active_count', return_value=1):
+            assert can_fork_safely()
+        # Never forked while other threads (i.g. warming up) may hold locks
+        with mock.patch('threading.current_thread', return_value=main_thread), \
+                mock.patch('threading.active_count', return_value=2):
+            assert not can_fork_safely()
+        # nor from threads other than the main one
+        with mock.patch('threading.current_thread', return_value=object()), \
+                mock.patch('threading.active_count', return_value=1):
+            assert not can_fork_safely()
+        return
+
+
 class TestModulePath(unittest.TestCase):
     def setUp(self) -> None:
         self.sample_project_path = (
@@ -247,3 +278,480 @@ class TestProjectImportHelper(unittest.TestCase):
         # Cannot access to function defined in self
         assert actual['top_level_function1'] is None
         return
+
+    def test_build_lazy_signature(self) -> None:
+        actual = ProjectImportHelperBuilder(
+            str(self.sample_project_path / 'package' / 'main.py'),
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+            lazy_signature=True,
+        ).build()
+        assert actual is not None
+        single_import = actual['sub_top_level_function1']
+        assert single_import is not None
+        assert single_import.func is None
+        assert single_import.is_lazy
+        assert single_import.filepath.endswith('sub_main.py')
+        assert (single_import.line_begin, single_import.line_end) == (2, 11)
+        resolved = single_import.resolve(SyntacticModuleLoader())
+        assert resolved.func is not None
+        assert resolved.func.docstring == (
+            'Top level function.\nsignature is multilined.\n'
+        )
+        return
+
+    def test_build_compact(self) -> None:
+        filepath = str(self.sample_project_path / 'package' / 'main.py')
+        expected = ProjectImportHelperBuilder(
+            filepath,
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+            lazy_signature=True,
+        ).build()
+        actual = ProjectImportHelperBuilder(
+            filepath,
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+            compact=True,
+        ).build()
+        assert expected is not None
+        assert actual is not None
+        assert actual.module_num == expected.module_num
+        assert actual.symbol_num == expected.symbol_num
+        assert {
+            name: (stmt.statement, stmt.filepath, stmt.line_begin, stmt.line_end)
+            for name, stmt in actual.items()
+        } == {
+            name: (stmt.statement, stmt.filepath, stmt.line_begin, stmt.line_end)
+            for name, stmt in expected.items()
+        }
+        assert actual.names_with_prefix('sub') == expected.names_with_prefix('sub')
+        # Cannot access to function defined in self
+        assert actual['top_level_function1'] is None
+        return
+
+    def test_build_with_workers(self) -> None:
+        filepath = str(self.sample_project_path / 'package' / 'main.py')
+        expected = ProjectImportHelperBuilder(
+            filepath,
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+        ).build()
+        actual = ProjectImportHelperBuilder(
+            filepath,
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+            workers=2,
+        ).build()
+        cache_root = f'{dirname(__file__)}/test_workdir_cache_workers'
+        try:
+            for _ in range(2):
+                cached = ProjectImportHelperBuilder(
+                    filepath,
+                    SyntacticModuleLoader(),
+                    ImportPathFormat.ALL_RELATIVE,
+                    ['setup.py', 'pyproject.toml'],
+                    False,
+                    use_cache=True,
+                    cache_root=cache_root,
+                    workers=2,
+                ).build()
+                assert cached is not None
+                assert expected is not None
+                assert dict(cached.items()) == dict(expected.items())
+        finally:
+            shutil.rmtree(cache_root, ignore_errors=True)
+        assert expected is not None
+        assert actual is not None
+        assert dict(actual.items()) == dict(expected.items())
+        return
+
+    def test_build_with_cache(self) -> None:
+        cache_root = f'{dirname(__file__)}/test_workdir_cache'
+        try:
+            for _ in range(2):
+                builder = ProjectImportHelperBuilder(
+                    str(
+                        self.sample_project_path /
+                        'package' /
+                        'main.py'
+                    ),
+                    SyntacticModuleLoader(),
+                    ImportPathFormat.ALL_RELATIVE,
+                    ['setup.py', 'pyproject.toml'],
+                    False,
+                    use_cache=True,
+                    cache_root=cache_root,
+                )
+                actual = builder.build()
+                assert actual is not None
+                single_import = actual['sub_top_level_function1']
+                assert single_import is not None
+                assert single_import.statement == (
+                    'from .subpackage.sub_main import sub_top_level_function1'
+                )
+        finally:
+            shutil.rmtree(cache_root, ignore_errors=True)
+        return
+
+    def test_build_mapped(self) -> None:
+        cache_root = f'{dirname(__file__)}/test_workdir_cache_mapped'
+        try:
+            for _ in range(2):
+                builder = ProjectImportHelperBuilder(
+                    str(self.sample_project_path / 'package' / 'main.py'),
+                    SyntacticModuleLoader(),
+                    ImportPathFormat.ALL_RELATIVE,
+                    ['setup.py', 'pyproject.toml'],
+                    False,
+                    cache_root=cache_root,
+                    mapped=True,
+                )
+                actual = builder.build()
+                assert actual is not None
+                single_import = actual['sub_top_level_function1']
+                assert single_import is not None
+                assert single_import.statement == (
+                    'from .subpackage.sub_main import sub_top_level_function1'
+                )
+                assert actual['top_level_function1'] is None
+            # Loaded from the mapped file on the second build
+            assert actual is not None
+            assert actual.index.base is not None
+            single_import = actual['sub_top_level_function1']
+            assert single_import is not None
+            assert single_import.is_lazy
+            assert single_import.filepath.endswith('sub_main.py')
+            assert actual.index.masked_module_num == 0
+        finally:
+            shutil.rmtree(cache_root, ignore_errors=True)
+        return
+
+    def test_build_mapped_shadowed(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_mapped_shadowed'
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        (work_dir / 'pkg').mkdir(parents=True, exist_ok=True)
+        (work_dir / 'setup.py').touch()
+        (work_dir / 'pkg' / 'main.py').touch()
+
+        def write(name: str, content: str) -> None:
+            (work_dir / 'pkg' / name).write_text(content)
+            return
+
+        def build() -> ProjectImportHelper:
+            helper = builder.build()
+            assert helper is not None
+            # Not to be loaded again unless written after the build
+            past_ns = time.time_ns() - 3600 * 10 ** 9
+            for path in (work_dir / 'pkg').iterdir():
+                os.utime(path, ns=(past_ns, past_ns))
+            return helper
+
+        for compact in [False, True]:
+            shutil.rmtree(work_dir / 'cache', ignore_errors=True)
+            write('a.py', 'def foo():\n    pass\n')
+            write('b.py', 'def foo():\n    pass\n')
+            builder = ProjectImportHelperBuilder(
+                str(work_dir / 'pkg' / 'main.py'),
+                SyntacticModuleLoader(),
+                ImportPathFormat.ALL_ABSOLUTE,
+                ['setup.py'],
+                False,
+                cache_root=str(work_dir / 'cache'),
+                compact=compact,
+                mapped=True,
+            )
+            assert build().index.module_of('foo') == 'pkg.b'
+
+            # Loaded again, but still shadowed by the module in the file
+            write('a.py', 'def foo():\n    pass\n\n\ndef bar():\n    pass\n')
+            helper = build()
+            assert helper.index.base is not None
+            assert helper.index.masked_module_num == 1
+            assert helper.index.module_of('foo') == 'pkg.b'
+            single_import = ProjectImportHelper(helper.index, 'pkg.b')['foo']
+            assert single_import is not None
+            assert single_import.statement == 'from pkg.a import foo'
+
+            # Falls back to the definition shadowed in the file.
+            write('b.py', '')
+            helper = build()
+            assert helper.index.base is not None
+            single_import = helper['foo']
+            assert single_import is not None
+            assert single_import.statement == 'from pkg.a import foo'
+            assert helper.names_with_prefix('f') == ['foo']
+
+            # Written again with every definition
+            builder.save_mapped_index(helper.index, str(work_dir))
+            write('a.py', '')
+            assert build()['foo'] is None
+        return
+
+    def test_build_sqlite(self) -> None:
+        cache_root = f'{dirname(__file__)}/test_workdir_cache_sqlite'
+        try:
+            for _ in range(2):
+                builder = ProjectImportHelperBuilder(
+                    str(self.sample_project_path / 'package' / 'main.py'),
+                    SyntacticModuleLoader(),
+                    ImportPathFormat.ALL_RELATIVE,
+                    ['setup.py', 'pyproject.toml'],
+                    False,
+                    cache_root=cache_root,
+                    sqlite=True,
+                )
+                actual = builder.build()
+                assert actual is not None
+                assert actual.index.sqlite
+                single_import = actual['sub_top_level_function1']
+                assert single_import is not None
+                assert single_import.statement == (
+                    'from .subpackage.sub_main import sub_top_level_function1'
+                )
+                assert single_import.is_lazy
+                assert single_import.filepath.endswith('sub_main.py')
+                assert actual['top_level_function1'] is None
+                assert 'sub_top_level_function1' in actual.names_with_prefix('SUB_')
+        finally:
+            shutil.rmtree(cache_root, ignore_errors=True)
+        return
+
+    def test_upsert_module(self) -> None:
+        helper = ProjectImportHelper(
+            ProjectIndex(),
+            'package.main',
+            ImportPathFormat.ALL_ABSOLUTE,
+        )
+        helper.upsert_module(ModulePath(
+            'package.mod1',
+            Module({'f1': Function.of_name('f1')}, {}),
+        ))
+        helper.upsert_module(ModulePath(
+            'package.mod2',
+            Module({'f1': Function.of_name('f1')}, {}),
+        ))
+        single_import = helper['f1']
+        assert single_import is not None
+        assert single_import.statement == 'from package.mod2 import f1'
+
+        # Removing shadowed module keeps the name
+        helper.remove_module('package.mod1')
+        assert helper['f1'] is not None
+
+        helper.upsert_module(ModulePath(
+            'package.mod2',
+            Module({'f2': Function.of_name('f2')}, {}),
+        ))
+        assert helper['f1'] is None
+        assert helper['f2'] is not None
+
+        helper.remove_module('package.mod2')
+        assert list(helper.items()) == []
+        return
+
+    def test_shadowed(self) -> None:
+        def foo_module(mod_path: str) -> ModulePath:
+            return ModulePath(mod_path, Module({'foo': Function.of_name('foo')}, {}))
+
+        work_dir = Path(dirname(__file__)) / 'test_workdir_shadowed'
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        store = SqliteSymbolStore.open(str(work_dir / 'index.sqlite3'))
+        assert store is not None
+        self.addCleanup(store.close)
+
+        for index in [
+            ProjectIndex(),
+            ProjectIndex(compact=True),
+            ProjectIndex(_symbols=store),
+        ]:
+            index.upsert_module(foo_module('pkg.a'))
+            index.upsert_module(foo_module('pkg.b'))
+            assert index.module_of('foo') == 'pkg.b'
+
+            # Same as loaded from scratch, regardless of the order of upserts
+            index.upsert_module(foo_module('pkg.a'))
+            assert index.module_of('foo') == 'pkg.b'
+
+            # Removing the shadowing module falls back to the shadowed one.
+            index.remove_module('pkg.b')
+            single_import = index['foo']
+            assert single_import is not None
+            assert single_import.statement == 'from pkg.a import foo'
+            assert index.module_names('pkg.a') == ['foo']
+
+            # Scripts in a package are walked before its sub packages.
+            index.upsert_module(foo_module('pkg.sub.c'))
+            index.upsert_module(foo_module('pkg.z'))
+            assert index.module_of('foo') == 'pkg.sub.c'
+            index.remove_module('pkg.sub.c')
+            assert index.module_of('foo') == 'pkg.z'
+
+            index.remove_module('pkg.a')
+            index.remove_module('pkg.z')
+            assert index['foo'] is None
+            assert index.names_with_prefix('f') == []
+            assert index.symbol_num == 0
+        return
+
+    def test_names_with_prefix(self) -> None:
+        helper = ProjectImportHelper(ProjectIndex(), 'package.main')
+        helper.upsert_module(ModulePath(
+            'package.mod1',
+            Module({'fetch': Function.of_name('fetch')}, {}),
+        ))
+        assert helper.names_with_prefix('f') == ['fetch']
+
+        # Index is maintained on updates
+        helper.upsert_module(ModulePath(
+            'package.mod2',
+            Module({'Fuga': Function.of_name('Fuga')}, {}),
+        ))
+        assert helper.names_with_prefix('f') == ['fetch', 'Fuga']
+        helper.remove_module('package.mod1')
+        assert helper.names_with_prefix('f') == ['Fuga']
+        return
+
+    def test_view(self) -> None:
+        index = ProjectIndex()
+        index.upsert_module(ModulePath(
+            'package.main',
+            Module({'fa': Function.of_name('fa')}, {}),
+        ))
+        index.upsert_module(ModulePath(
+            'package.sub.mod',
+            Module({'fb': Function.of_name('fb'), 'fc': Function.of_name('fc')}, {}),
+        ))
+        relative = ProjectImportHelper(
+            index,
+            'package.main',
+            ImportPathFormat.ALL_RELATIVE,
+        )
+        absolute = ProjectImportHelper(
+            index,
+            'package.main',
+            ImportPathFormat.ALL_ABSOLUTE,
+        )
+
+        # Symbols of the current module are hidden.
+        assert relative['fa'] is None
+        assert relative.names_with_prefix('f', 1) == ['fb']
+        assert [name for name, _ in relative.items()] == ['fb', 'fc']
+
+        single_import = relative['fb']
+        assert single_import is not None
+        assert single_import.statement == 'from .sub.mod import fb'
+        assert relative['fb'] is single_import
+        # Absolute statements of the index are used as they are.
+        assert absolute['fb'] is index['fb']
+
+        # Statements are made again once the index changes.
+        index.upsert_module(ModulePath(
+            'package.sub.mod',
+            Module({'fb': Function.of_name('fb')}, {}),
+        ))
+        assert relative.version == index.version
+        assert relative['fb'] is not single_import
+        assert relative['fc'] is None
+        return
+
+    def test_view_shadowed(self) -> None:
+        def foo_module(mod_path: str) -> ModulePath:
+            return ModulePath(mod_path, Module({'foo': Function.of_name('foo')}, {}))
+
+        work_dir = Path(dirname(__file__)) / 'test_workdir_view_shadowed'
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        store = SqliteSymbolStore.open(str(work_dir / 'index.sqlite3'))
+        assert store is not None
+        self.addCleanup(store.close)
+
+        for index in [
+            ProjectIndex(),
+            ProjectIndex(compact=True),
+            ProjectIndex(_symbols=store),
+        ]:
+            helper = ProjectImportHelper(
+                index,
+                'pkg.b',
+                ImportPathFormat.ALL_RELATIVE,
+            )
+            helper.upsert_module(foo_module('pkg.a'))
+            helper.upsert_module(foo_module('pkg.b'))
+            assert index.module_of('foo') == 'pkg.b'
+
+            # The name of the current module is imported from the others.
+            single_import = helper['foo']
+            assert single_import is not None
+            assert single_import.statement == 'from .a import foo'
+            assert helper.names_with_prefix('f') == ['foo']
+            assert [name for name, _ in helper.items()] == ['foo']
+
+            helper.remove_module('pkg.a')
+            assert helper['foo'] is None
+            assert helper.names_with_prefix('f') == []
+            assert list(helper.items()) == []
+            helper.remove_module('pkg.b')
+        return
+
+    def test_view_reused(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_view_reused'
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        store = SqliteSymbolStore.open(str(work_dir / 'index.sqlite3'))
+        assert store is not None
+        self.addCleanup(store.close)
+
+        for index in [ProjectIndex(compact=True), ProjectIndex(_symbols=store)]:
+            for import_path_format in [
+                ImportPathFormat.ALL_ABSOLUTE,
+                ImportPathFormat.ALL_RELATIVE,
+            ]:
+                helper = ProjectImportHelper(index, 'pkg.main', import_path_format)
+                helper.upsert_module(ModulePath(
+                    'pkg.mod',
+                    Module({'fa': Function.of_name('fa')}, {}),
+                ))
+                # Objects made by the backend on each lookup are kept,
+                # so that their `to_dict` is memoized.
+                single_import = helper['fa']
+                assert single_import is not None
+                assert helper['fa'] is single_import
+                assert [v for _, v in helper.items()] == [single_import]
+                assert single_import.to_dict() is single_import.to_dict()
+
+                # until the index changes.
+                helper.upsert_module(ModulePath(
+                    'pkg.mod',
+                    Module({'fa': Function.of_name('fa')}, {}),
+                ))
+                assert helper['fa'] is not single_import
+                helper.remove_module('pkg.mod')
+        return
+
+    def test_version(self) -> None:
+        for compact in [False, True]:
+            self._test_version(compact)
+        return
+
+    def _test_version(self, compact: bool) -> None:
+        helper = ProjectImportHelper(ProjectIndex(compact=compact), 'package.main')
+        assert helper.version == 0
+        helper.upsert_module(ModulePath(
+            'package.mod1',
+            Module({'f1': Function.of_name('f1')}, {}),
+        ))
+        assert helper.version == 1
+        helper.remove_module('package.not_indexed')
+        assert helper.version == 1
+        helper.remove_module('package.mod1')
+        assert helper.version == 2
+        return
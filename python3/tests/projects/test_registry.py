@@ -0,0 +1,332 @@
+import os
+import shutil
+import threading
+import unittest
+from os.path import dirname
+from pathlib import Path
+from typing import List, Optional
+
+from nayvy.projects.modules.cache import CacheStats
+from nayvy.projects.path import ImportPathFormat, ProjectImportHelperBuilder
+from nayvy.projects.registry import ProjectImportHelperRegistry, is_under
+from nayvy.projects.watcher import PollingWatcher
+from nayvy.projects.modules.loader import SyntacticModuleLoader
+from nayvy.projects.modules.models import Module
+
+
+class GatedLoader(SyntacticModuleLoader):
+    """ Loader blocking before loading `gated_filename` until released.
+    """
+
+    def __init__(self, gated_filename: str) -> None:
+        self.gated_filename = gated_filename
+        self.reached = threading.Event()
+        self.released = threading.Event()
+        return
+
+    def load_module_from_path(
+        self,
+        module_filepath: str,
+    ) -> Optional[Module]:
+        if module_filepath.endswith(self.gated_filename):
+            self.reached.set()
+            self.released.wait(10)
+        return super().load_module_from_path(module_filepath)
+
+
+class CountingLoader(SyntacticModuleLoader):
+    """ Loader recording paths of loaded scripts.
+    """
+
+    def __init__(self) -> None:
+        self.loaded: List[str] = []
+        return
+
+    def load_module_from_path(
+        self,
+        module_filepath: str,
+    ) -> Optional[Module]:
+        self.loaded.append(module_filepath)
+        return super().load_module_from_path(module_filepath)
+
+
+class Test(unittest.TestCase):
+
+    def test_is_under(self) -> None:
+        assert is_under('/a/b/c.py', '/a')
+        assert is_under('/a/b/c.py', '/a/b/')
+        assert not is_under('/ab/c.py', '/a')
+        assert not is_under('/a', '/a')
+        return
+
+
+class TestProjectImportHelperRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.sample_project_path = (
+            Path(dirname(__file__)) /
+            '..' /
+            '_resources' /
+            'sample_project'
+        )
+        return
+
+    def _builder(self, filepath: str) -> ProjectImportHelperBuilder:
+        return ProjectImportHelperBuilder(
+            filepath,
+            SyntacticModuleLoader(),
+            ImportPathFormat.ALL_RELATIVE,
+            ['setup.py', 'pyproject.toml'],
+            False,
+        )
+
+    def test_get(self) -> None:
+        registry = ProjectImportHelperRegistry()
+        main_path = str(self.sample_project_path / 'package' / 'main.py')
+        sub_main_path = str(
+            self.sample_project_path / 'package' / 'subpackage' / 'sub_main.py'
+        )
+
+        helper = registry.get(self._builder(main_path))
+        assert helper is not None
+        assert registry.get(self._builder(main_path)) is helper
+
+        # Another file of the same project shares the index.
+        sub_helper = registry.get(self._builder(sub_main_path))
+        assert sub_helper is not None
+        assert sub_helper is not helper
+        assert sub_helper.index is helper.index
+        assert registry.stats == CacheStats(hits=2, misses=1, evictions=0)
+
+        # Statements are relative to each file.
+        single_import = helper['sub_top_level_function1']
+        assert single_import is not None
+        assert single_import.statement == (
+            'from .subpackage.sub_main import sub_top_level_function1'
+        )
+        assert sub_helper['sub_top_level_function1'] is None
+        single_import = sub_helper['top_level_function1']
+        assert single_import is not None
+        assert single_import.statement == 'from ..main import top_level_function1'
+        return
+
+    def test_project_stats(self) -> None:
+        registry = ProjectImportHelperRegistry()
+        main_path = str(self.sample_project_path / 'package' / 'main.py')
+        helper = registry.get(self._builder(main_path))
+        assert helper is not None
+
+        project_stats = registry.project_stats()
+        assert len(project_stats) == 1
+        stats = project_stats[0]
+        assert stats.helper_num == 1
+        assert stats.module_num == helper.module_num > 0
+        assert stats.symbol_num == helper.symbol_num > 0
+        assert stats.memory_bytes > 0
+
+        registry.clear()
+        assert registry.project_stats() == []
+        assert registry.stats.evictions == 1
+        return
+
+    def test_invalidate(self) -> None:
+        registry = ProjectImportHelperRegistry()
+        main_path = str(self.sample_project_path / 'package' / 'main.py')
+        helper = registry.get(self._builder(main_path))
+        assert helper is not None
+
+        registry.invalidate('/path/to/another/project/main.py')
+        assert registry.get(self._builder(main_path)) is helper
+
+        registry.invalidate(main_path)
+        assert registry.get(self._builder(main_path)) is not helper
+        return
+
+    def test_update_file(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_registry'
+        try:
+            (work_dir / 'package').mkdir(parents=True, exist_ok=True)
+            (work_dir / 'setup.py').touch()
+            main_path = work_dir / 'package' / 'main.py'
+            sub_path = work_dir / 'package' / 'sub.py'
+            main_path.write_text('def main():\n    pass\n')
+            sub_path.write_text('def f1():\n    pass\n')
+
+            registry = ProjectImportHelperRegistry()
+            helper = registry.get(self._builder(str(main_path)))
+            assert helper is not None
+            assert helper['f1'] is not None
+            assert helper['f2'] is None
+
+            sub_path.write_text('def f2():\n    pass\n')
+            registry.update_file(str(sub_path), SyntacticModuleLoader())
+            assert registry.get(self._builder(str(main_path))) is helper
+            assert helper['f1'] is None
+            single_import = helper['f2']
+            assert single_import is not None
+            assert single_import.statement == 'from .sub import f2'
+
+            sub_path.unlink()
+            registry.update_file(str(sub_path), SyntacticModuleLoader())
+            assert helper['f2'] is None
+
+            # Symbols of the current file are never added.
+            registry.update_file(str(main_path), SyntacticModuleLoader())
+            assert helper['main'] is None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return
+
+    def test_warm_up(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_warm_up'
+        try:
+            (work_dir / 'package').mkdir(parents=True, exist_ok=True)
+            (work_dir / 'setup.py').touch()
+            main_path = work_dir / 'package' / 'a_main.py'
+            sub_path = work_dir / 'package' / 'b_sub.py'
+            main_path.write_text('def main():\n    pass\n')
+            sub_path.write_text('def f1():\n    pass\n')
+            (work_dir / 'package' / 'c_gate.py').write_text('def f3():\n    pass\n')
+
+            registry = ProjectImportHelperRegistry()
+            loader = GatedLoader('c_gate.py')
+            builder = ProjectImportHelperBuilder(
+                str(main_path),
+                loader,
+                ImportPathFormat.ALL_RELATIVE,
+                ['setup.py'],
+                False,
+            )
+            # Never blocks while warming up.
+            assert registry.get(builder, wait=False) is None
+            assert loader.reached.wait(10)
+            assert registry.is_warming_up(builder)
+            assert registry.get(builder, wait=False) is None
+
+            # Written after the warm-up has read it
+            sub_path.write_text('def f2():\n    pass\n')
+            registry.update_file(str(sub_path), SyntacticModuleLoader())
+            loader.released.set()
+
+            helper = registry.get(builder)
+            assert helper is not None
+            assert not registry.is_warming_up(builder)
+            assert registry.get(builder, wait=False) is helper
+            assert helper['f1'] is None
+            assert helper['f2'] is not None
+            assert helper['f3'] is not None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return
+
+    def test_memory_budget(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_memory_budget'
+        try:
+            paths = {}
+            for project in ['project_a', 'project_b']:
+                (work_dir / project / 'package').mkdir(parents=True, exist_ok=True)
+                (work_dir / project / 'setup.py').touch()
+                os.utime(work_dir / project / 'setup.py', (0, 0))
+                for name in ['main', 'sub', 'removed']:
+                    path = work_dir / project / 'package' / f'{name}.py'
+                    path.write_text(f'def {name}_func():\n    pass\n')
+                    # Written long before helpers are built
+                    os.utime(path, (0, 0))
+                    paths[project, name] = path
+            cache_root = str(work_dir / 'cache')
+            loader = CountingLoader()
+
+            def builder(project: str) -> ProjectImportHelperBuilder:
+                return ProjectImportHelperBuilder(
+                    str(paths[project, 'main']),
+                    loader,
+                    ImportPathFormat.ALL_RELATIVE,
+                    ['setup.py'],
+                    False,
+                    cache_root=cache_root,
+                )
+
+            # Only the most recently used project fits in the budget.
+            registry = ProjectImportHelperRegistry(memory_budget_bytes=1)
+            helper_a = registry.get(builder('project_a'))
+            assert helper_a is not None
+            assert helper_a['sub_func'] is not None
+            assert registry.get(builder('project_b')) is not None
+            assert registry.stats.evictions == 1
+            assert [stats.root for stats in registry.project_stats()] == [
+                str(work_dir / 'project_b'),
+            ]
+            assert registry.memory_bytes() > 0
+
+            # Only scripts modified after the eviction are loaded again.
+            paths['project_a', 'sub'].write_text('def new_func():\n    pass\n')
+            paths['project_a', 'removed'].unlink()
+            loader.loaded.clear()
+            restored_a = registry.get(builder('project_a'))
+            assert restored_a is not None
+            assert restored_a is not helper_a
+            assert loader.loaded == [str(paths['project_a', 'sub'])]
+            assert restored_a['sub_func'] is None
+            assert restored_a['new_func'] is not None
+            assert restored_a['removed_func'] is None
+            assert registry.stats.evictions == 2
+
+            # Without the budget, all projects are kept.
+            registry = ProjectImportHelperRegistry()
+            assert registry.get(builder('project_a')) is not None
+            assert registry.get(builder('project_b')) is not None
+            assert registry.stats.evictions == 0
+            assert len(registry.project_stats()) == 2
+
+            # Indices grown by updated scripts are estimated again.
+            memory_bytes = registry.memory_bytes()
+            registry.memory_budget_bytes = memory_bytes
+            paths['project_b', 'sub'].write_text(''.join(
+                f'def sub_func{i}():\n    pass\n' for i in range(100)
+            ))
+            registry.update_file(str(paths['project_b', 'sub']), loader)
+            assert registry.stats.evictions == 1
+            assert [stats.root for stats in registry.project_stats()] == [
+                str(work_dir / 'project_b'),
+            ]
+            assert registry.memory_bytes() > memory_bytes
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return
+
+    def test_watcher(self) -> None:
+        work_dir = Path(dirname(__file__)) / 'test_workdir_registry_watcher'
+        try:
+            (work_dir / 'package').mkdir(parents=True, exist_ok=True)
+            (work_dir / 'setup.py').touch()
+            main_path = work_dir / 'package' / 'main.py'
+            main_path.write_text('def main():\n    pass\n')
+
+            watcher = PollingWatcher(interval=0)
+            registry = ProjectImportHelperRegistry(watcher=watcher)
+            helper = registry.get(self._builder(str(main_path)))
+            assert helper is not None
+            assert watcher.roots[0] == str(work_dir)
+
+            # Written outside the editor
+            sub_path = work_dir / 'package' / 'sub.py'
+            sub_path.write_text('def f1():\n    pass\n')
+            assert registry.get(self._builder(str(main_path))) is helper
+            assert helper['f1'] is not None
+
+            sub_path.unlink()
+            assert registry.get(self._builder(str(main_path))) is helper
+            assert helper['f1'] is None
+
+            # Never waits for another thread walking roots.
+            with registry._watcher_lock:
+                sub_path.write_text('def f1():\n    pass\n')
+                assert registry.get(self._builder(str(main_path))) is helper
+                assert helper['f1'] is None
+                registry.clear()
+                assert watcher.roots == [str(work_dir)]
+            registry.apply_watched_changes()
+            assert watcher.roots == []
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return
@@ -0,0 +1,168 @@
+import os
+import shutil
+import pickle
+import unittest
+import dataclasses
+from os.path import dirname
+from pathlib import Path
+
+from nayvy.projects.modules.models import Class, Function, Module
+from nayvy.projects.path import ModulePath, ProjectIndex
+from nayvy.projects.sqlite_store import SqliteSymbolStore, KIND_CLASS
+
+
+def _class(name: str) -> Class:
+    return Class(
+        name=name,
+        line_begin=3,
+        line_end=5,
+        function_map={},
+        signature_lines=[f'class {name}:'],
+    )
+
+
+class TestSqliteSymbolStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = Path(dirname(__file__)) / 'test_workdir_sqlite'
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.path = str(self.work_dir / 'index.sqlite3')
+        self.script = self.work_dir / 'mod1.py'
+        self.script.write_text('def fetch():\n    pass\n')
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def _open(self) -> SqliteSymbolStore:
+        store = SqliteSymbolStore.open(self.path)
+        assert store is not None
+        self.addCleanup(store.close)
+        return store
+
+    def test_upsert_module(self) -> None:
+        store = self._open()
+        fetch = dataclasses.replace(
+            Function.of_name('fetch'),
+            line_begin=0,
+            line_end=2,
+            docstring='Download the remote repository.',
+        )
+        store.upsert_module(
+            'package.mod1',
+            str(self.script),
+            Module({'fetch': fetch, 'bar': Function.of_name('bar')}, {}),
+        )
+        store.upsert_module(
+            'package.mod2',
+            '/project/package/mod2.py',
+            Module({'bar': Function.of_name('bar')}, {'Fuga': _class('Fuga')}),
+        )
+        assert store.module_num == 2
+        assert store.symbol_num == 3
+        assert store.module_paths() == ['package.mod1', 'package.mod2']
+        assert store.module_names('package.mod1') == ['fetch', 'bar']
+        assert store.kind('Fuga') == KIND_CLASS
+
+        single_import = store['fetch']
+        assert single_import is not None
+        assert single_import.statement == 'from package.mod1 import fetch'
+        assert single_import.is_lazy
+        assert single_import.filepath == str(self.script)
+        assert (single_import.line_begin, single_import.line_end) == (0, 2)
+        assert store['fuga'] is None
+
+        # Defined in the module later in walk order
+        assert store.module_of('bar') == 'package.mod2'
+        assert store.names_with_prefix('') == ['bar', 'fetch', 'Fuga']
+        assert store.names_with_prefix('F') == ['fetch', 'Fuga']
+        assert store.names_with_prefix('f', 1) == ['fetch']
+        assert store.names_with_prefix('x') == []
+        assert sorted(name for name, _ in store.items()) == ['Fuga', 'bar', 'fetch']
+
+        assert store.search('remote') == ['fetch']
+        assert store.search('REPOSITORY download') == ['fetch']
+        assert store.search('fuga') == ['Fuga']
+        assert store.search('remote branch') == []
+
+        store.upsert_module(
+            'package.mod1',
+            str(self.script),
+            Module({'fetch2': Function.of_name('fetch2')}, {}),
+        )
+        assert store['fetch'] is None
+        assert store.search('remote') == []
+        assert store.remove_module('package.mod2')
+        assert not store.remove_module('package.mod2')
+        assert store.module_paths() == ['package.mod1']
+        assert [name for name, _ in store.items()] == ['fetch2']
+        with self.assertRaises(pickle.PicklingError):
+            pickle.dumps(store)
+        return
+
+    def test_shared(self) -> None:
+        store = self._open()
+        store.loaded_at_ns = 123
+        other = self._open()
+        assert other.loaded_at_ns == 123
+
+        # Modules upserted by other processes are seen.
+        other.upsert_module(
+            'package.mod1',
+            str(self.script),
+            Module({'fetch': Function.of_name('fetch')}, {}),
+        )
+        assert store.module_of('fetch') == 'package.mod1'
+        assert store.is_fresh('package.mod1', str(self.script))
+
+        # Touched but unchanged
+        os.utime(self.script, ns=(0, 0))
+        assert store.is_fresh('package.mod1', str(self.script))
+        self.script.write_text('def fetch2():\n    pass\n')
+        assert not store.is_fresh('package.mod1', str(self.script))
+        assert not store.is_fresh('package.mod2', str(self.script))
+        return
+
+    def test_broken_file(self) -> None:
+        with open(self.path, 'wb') as f:
+            f.write(b'broken' * 1024)
+        assert SqliteSymbolStore.open(self.path) is None
+        return
+
+    def test_project_index(self) -> None:
+        store = self._open()
+        index = ProjectIndex(_symbols=store)
+        assert index.sqlite
+        index.upsert_module(ModulePath(
+            'package.mod1',
+            Module({'fetch': Function.of_name('fetch')}, {}),
+            str(self.script),
+        ))
+        assert index.version == 1
+        assert index.has_module('package.mod1')
+        assert index.names_with_prefix('f') == ['fetch']
+        assert index.search('fetch') == ['fetch']
+        index.remove_module('package.mod1')
+        assert index.version == 2
+        assert index['fetch'] is None
+
+        # Searched in memory without the database
+        index = ProjectIndex()
+        assert not index.sqlite
+        index.upsert_module(ModulePath(
+            'package.mod1',
+            Module(
+                {
+                    'fetch': dataclasses.replace(
+                        Function.of_name('fetch'),
+                        docstring='Download the remote repository.',
+                    ),
+                },
+                {},
+            ),
+        ))
+        assert index.search('remote FETCH') == ['fetch']
+        assert index.search('branch') == []
+        assert not index.is_fresh('package.mod1', str(self.script))
+        return
@@ -0,0 +1,91 @@
+import pickle
+import unittest
+from dataclasses import replace
+
+from nayvy.projects.modules.models import Class, Function, Module
+from nayvy.projects.symbol_table import KIND_CLASS, KIND_FUNCTION, SymbolTable
+
+
+def _function(name: str, line_begin: int, line_end: int) -> Function:
+    return replace(
+        Function.of_name(name),
+        line_begin=line_begin,
+        line_end=line_end,
+    )
+
+
+def _class(name: str) -> Class:
+    return Class(name, 0, 1, {}, [])
+
+
+class TestSymbolTable(unittest.TestCase):
+
+    def test_upsert_module(self) -> None:
+        table = SymbolTable()
+        table.upsert_module('package.mod1', '/project/package/mod1.py', Module(
+            {'f1': _function('f1', 0, 2)},
+            {'C1': _class('C1')},
+        ))
+        table.upsert_module('package.mod2', '/project/package/mod2.py', Module(
+            {'f1': _function('f1', 3, 5)},
+            {},
+        ))
+        assert table.module_num == 2
+        assert table.symbol_num == 2
+        assert table.kind('f1') == KIND_FUNCTION
+        assert table.kind('C1') == KIND_CLASS
+        assert table.kind('f2') is None
+
+        single_import = table['f1']
+        assert single_import is not None
+        assert single_import.statement == 'from package.mod2 import f1'
+        assert single_import.is_lazy
+        assert single_import.filepath == '/project/package/mod2.py'
+        assert (single_import.line_begin, single_import.line_end) == (3, 5)
+
+        # Removing shadowed module keeps the name
+        assert table.remove_module('package.mod1')
+        assert not table.remove_module('package.mod1')
+        assert table['C1'] is None
+        assert table['f1'] is not None
+        assert table.module_paths() == ['package.mod2']
+
+        # Freed rows are reused.
+        rows = len(table._names)
+        table.upsert_module('package.mod1', '/project/package/mod1.py', Module(
+            {'f2': _function('f2', 0, 2)},
+            {},
+        ))
+        assert len(table._names) == rows
+        assert sorted(name for name, _ in table.items()) == ['f1', 'f2']
+        return
+
+    def test_names_with_prefix(self) -> None:
+        table = SymbolTable()
+        table.upsert_module('package.mod1', '', Module(
+            {'fetch': Function.of_name('fetch')},
+            {},
+        ))
+        assert table.names_with_prefix('f') == ['fetch']
+        table.upsert_module('package.mod2', '', Module(
+            {},
+            {'Fuga': _class('Fuga')},
+        ))
+        assert table.names_with_prefix('f') == ['fetch', 'Fuga']
+        table.remove_module('package.mod1')
+        assert table.names_with_prefix('f') == ['Fuga']
+        return
+
+    def test_pickle(self) -> None:
+        table = SymbolTable()
+        table.upsert_module('package.mod1', '', Module(
+            {'f1': Function.of_name('f1')},
+            {},
+        ))
+        assert table.names_with_prefix('f') == ['f1']
+        loaded = pickle.loads(pickle.dumps(table))
+        assert loaded._name_index is None
+        single_import = loaded['f1']
+        assert single_import is not None
+        assert single_import.statement == 'from package.mod1 import f1'
+        return
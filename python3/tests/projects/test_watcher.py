@@ -0,0 +1,146 @@
+import errno
+import shutil
+import unittest
+from os.path import dirname
+from pathlib import Path
+from typing import List
+
+from nayvy.projects.watcher import (
+    FileWatcher,
+    InotifyWatcher,
+    PollingWatcher,
+    new_watcher,
+)
+
+
+class LimitedInotifyWatcher(InotifyWatcher):
+    """ Watcher failing to watch directories named `unwatchable`.
+    """
+
+    def __init__(self, unwatchable: str) -> None:
+        super().__init__(poll_interval=0)
+        self.unwatchable = unwatchable
+        return
+
+    # Override
+    def _watch_dir(self, dirpath: str) -> None:
+        if dirpath.endswith(self.unwatchable):
+            raise OSError(errno.ENOSPC, 'No space left on device', dirpath)
+        super()._watch_dir(dirpath)
+        return
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.work_dir = Path(dirname(__file__)) / 'test_workdir_watcher'
+        (self.work_dir / 'package').mkdir(parents=True, exist_ok=True)
+        (self.work_dir / '.gitignore').write_text('generated/\n')
+        for name in ['a', 'b', 'c']:
+            (self.work_dir / 'package' / f'{name}.py').write_text('')
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return
+
+    def _run_scenario(self, watcher: FileWatcher) -> None:
+        package = self.work_dir / 'package'
+
+        def assert_changed(paths: List[Path]) -> None:
+            self.assertEqual(
+                sorted(watcher.poll()),
+                sorted(str(path) for path in paths),
+            )
+            return
+
+        try:
+            watcher.add_root(str(self.work_dir))
+            assert watcher.file_num == 3
+            assert_changed([])
+
+            # Modified in place
+            (package / 'a.py').write_text('def f():\n    pass\n')
+            assert_changed([package / 'a.py'])
+
+            # Created, deleted and renamed
+            (package / 'd.py').write_text('')
+            (package / 'b.py').unlink()
+            (package / 'c.py').rename(package / 'e.py')
+            (package / 'README.md').write_text('')
+            assert_changed([
+                package / 'b.py',
+                package / 'c.py',
+                package / 'd.py',
+                package / 'e.py',
+            ])
+
+            # Directories created and deleted
+            (package / 'sub').mkdir()
+            (package / 'sub' / 'f.py').write_text('')
+            (self.work_dir / 'generated').mkdir()
+            (self.work_dir / 'generated' / 'g.py').write_text('')
+            assert_changed([package / 'sub' / 'f.py'])
+            (package / 'sub' / 'h.py').write_text('')
+            assert_changed([package / 'sub' / 'h.py'])
+            shutil.rmtree(package / 'sub')
+            assert_changed([package / 'sub' / 'f.py', package / 'sub' / 'h.py'])
+
+            watcher.remove_root(str(self.work_dir))
+            assert watcher.file_num == 0
+            (package / 'a.py').write_text('')
+            assert_changed([])
+        finally:
+            watcher.close()
+        return
+
+    def test_polling_watcher(self) -> None:
+        self._run_scenario(PollingWatcher(interval=0))
+        return
+
+    def test_polling_watcher_interval(self) -> None:
+        watcher = PollingWatcher(interval=3600)
+        watcher.add_root(str(self.work_dir))
+        assert watcher.poll() == []
+        (self.work_dir / 'package' / 'd.py').write_text('')
+        # Too early to poll again
+        assert watcher.poll() == []
+        return
+
+    def test_inotify_watcher(self) -> None:
+        try:
+            watcher = InotifyWatcher()
+        except (OSError, AttributeError):
+            self.skipTest('inotify is unavailable')
+        self._run_scenario(watcher)
+        return
+
+    def _run_limited_scenario(self, unwatchable: str) -> None:
+        try:
+            watcher = LimitedInotifyWatcher(unwatchable)
+        except (OSError, AttributeError):
+            self.skipTest('inotify is unavailable')
+        # Polled after failing to watch the directory
+        self._run_scenario(watcher)
+        return
+
+    def test_inotify_watcher_limited_root(self) -> None:
+        self._run_limited_scenario('package')
+        return
+
+    def test_inotify_watcher_limited_sub_dir(self) -> None:
+        self._run_limited_scenario('sub')
+        return
+
+    def test_new_watcher(self) -> None:
+        try:
+            InotifyWatcher().close()
+            expected_type: type = InotifyWatcher
+        except (OSError, AttributeError):
+            expected_type = PollingWatcher
+        watcher = new_watcher()
+        try:
+            assert isinstance(watcher, expected_type)
+        finally:
+            watcher.close()
+        return
@@ -0,0 +1,84 @@
+import unittest
+from os.path import dirname
+from pathlib import Path
+from typing import List
+
+from nayvy.importing.ranking import CompletionMatcher
+from nayvy.service.local import NayvyService, ServiceOptions
+
+
+class TestNayvyService(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.main_path = str(
+            Path(dirname(__file__)) /
+            '..' /
+            '_resources' /
+            'sample_project' /
+            'package' /
+            'main.py'
+        )
+        self.warnings: List[str] = []
+        self.service = NayvyService(
+            ServiceOptions(pyproject_root_markers=['setup.py']),
+            warning=self.warnings.append,
+        )
+        return
+
+    def test_list_imports(self) -> None:
+        items = self.service.list_imports(self.main_path, 'sub_', 10)
+        names = [item['name'] for item in items]
+        assert 'sub_top_level_function1' in names
+        assert all('sub' in name.lower() for name in names)
+
+        # All items are listed without prefix and limit.
+        all_items = self.service.list_imports(self.main_path)
+        all_names = {item['name'] for item in all_items}
+        assert 'sub_top_level_function1' in all_names
+        # Imports of the import config are integrated.
+        assert 'ABCMeta' in all_names
+        assert self.warnings == []
+        return
+
+    def test_list_imports_prefix_matcher(self) -> None:
+        service = NayvyService(ServiceOptions(
+            pyproject_root_markers=['setup.py'],
+            completion_matcher=CompletionMatcher.PREFIX,
+        ))
+        names = [
+            item['name']
+            for item in service.list_imports(self.main_path, 'Sub', 10)
+        ]
+        assert names
+        assert all(name.lower().startswith('sub') for name in names)
+        return
+
+    def test_resolve_import(self) -> None:
+        assert 'sub_top_level_function1' in self.service.resolve_import(
+            self.main_path,
+            'sub_top_level_function1',
+        )
+        assert self.service.resolve_import(self.main_path, 'undefined_name') == ''
+        return
+
+    def test_add_imports(self) -> None:
+        lines = self.service.add_imports(
+            self.main_path,
+            ['def f():', '    return'],
+            ['sub_top_level_function1'],
+        )
+        assert lines[0] == 'from .subpackage.sub_main import sub_top_level_function1'
+        return
+
+    def test_not_in_project(self) -> None:
+        items = self.service.list_imports('/not/in/project.py', 'ABCMeta', 10)
+        assert [item['name'] for item in items][0] == 'ABCMeta'
+        assert len(self.warnings) == 1
+        return
+
+    def test_stats(self) -> None:
+        self.service.list_imports(self.main_path)
+        lines = self.service.stats()
+        assert '# projects' in lines
+        assert any(line.startswith('project index: hits 0, misses 1') for line in lines)
+        return
@@ -0,0 +1,222 @@
+import io
+import unittest
+from dataclasses import dataclass
+from os.path import abspath, dirname
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from nayvy.service.local import NayvyService, ServiceOptions
+from nayvy.service.lsp import (
+    ORGANIZE_IMPORTS,
+    LanguageServer,
+    import_head,
+    lines_to_text_edit,
+    path_to_uri,
+    read_message,
+    utf16_prefix,
+    write_message,
+)
+
+
+def apply_edit(text: str, edit: Dict[str, Any]) -> str:
+    lines = text.split('\n')
+
+    def offset(position: Dict[str, int]) -> int:
+        return (
+            sum(len(line) + 1 for line in lines[:position['line']])
+            + position['character']
+        )
+
+    start = offset(edit['range']['start'])
+    end = offset(edit['range']['end'])
+    return text[:start] + str(edit['newText']) + text[end:]
+
+
+class FixingService(NayvyService):
+    """ Service removing `import os` instead of running a linter.
+    """
+
+    def fix_lines(self, filepath: str, lines: List[str]) -> Optional[List[str]]:
+        if 'import os' not in lines:
+            return None
+        return [line for line in lines if line != 'import os']
+
+
+class Test(unittest.TestCase):
+
+    def test_lines_to_text_edit(self) -> None:
+
+        @dataclass
+        class Case:
+            old: str
+            new: str
+
+        for case in [
+            Case('a\nb\nc\n', 'import x\na\nb\nc\n'),
+            Case('a\nb\nc\n', 'a\nc\n'),
+            Case('a\nb', 'a\nb\nc'),
+            Case('a\nb', 'a'),
+            Case('a\nb', 'x'),
+            Case('a\nb\nc', 'a\nx\ny\nc'),
+            Case('', 'import x\n'),
+        ]:
+            edit = lines_to_text_edit(case.old.split('\n'), case.new.split('\n'))
+            assert edit is not None
+            self.assertEqual(apply_edit(case.old, edit), case.new, case)
+        assert lines_to_text_edit(['a'], ['a']) is None
+        return
+
+    def test_import_head(self) -> None:
+        assert import_head(['import os', '', 'x = 1']) == ['import os', '']
+        assert import_head(['#!/usr/bin/env python', 'x = 1', 'y = 2']) == [
+            '#!/usr/bin/env python',
+            'x = 1',
+        ]
+        assert import_head(['import os', 'import sys']) == ['import os', 'import sys']
+        return
+
+    def test_utf16_prefix(self) -> None:
+        assert utf16_prefix('abc', 2) == 'ab'
+        # '𝑥' takes two UTF-16 code units.
+        assert utf16_prefix('𝑥 = ab', 5) == '𝑥 = '
+        return
+
+    def test_message(self) -> None:
+        stream = io.BytesIO()
+        write_message(stream, {'id': 1})
+        stream.seek(0)
+        assert read_message(stream) == {'id': 1}
+        assert read_message(stream) is None
+        return
+
+
+class TestLanguageServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.main_path = abspath(str(
+            Path(dirname(__file__)) /
+            '..' /
+            '_resources' /
+            'sample_project' /
+            'package' /
+            'main.py'
+        ))
+        self.uri = path_to_uri(self.main_path)
+        self.server = LanguageServer(
+            FixingService(ServiceOptions(pyproject_root_markers=['setup.py'])),
+            completion_limit=10,
+        )
+        self.last_id = 0
+        return
+
+    def request(self, method: str, params: Dict[str, Any]) -> Any:
+        self.last_id += 1
+        response = self.server.handle({
+            'jsonrpc': '2.0',
+            'id': self.last_id,
+            'method': method,
+            'params': params,
+        })
+        assert response is not None
+        assert 'error' not in response, response
+        return response['result']
+
+    def notify(self, method: str, params: Dict[str, Any]) -> None:
+        assert self.server.handle({
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': params,
+        }) is None
+        return
+
+    def open(self, text: str, resolve_edits: bool = False) -> None:
+        capabilities: Dict[str, Any] = {}
+        if resolve_edits:
+            capabilities = {'textDocument': {'completion': {'completionItem': {
+                'resolveSupport': {'properties': ['additionalTextEdits']},
+            }}}}
+        result = self.request('initialize', {'capabilities': capabilities})
+        assert result['capabilities']['completionProvider']['resolveProvider']
+        self.notify('initialized', {})
+        self.notify('textDocument/didOpen', {'textDocument': {
+            'uri': self.uri,
+            'languageId': 'python',
+            'version': 1,
+            'text': text,
+        }})
+        return
+
+    def complete(self, line: int, character: int) -> List[Dict[str, Any]]:
+        return self.request('textDocument/completion', {  # type: ignore
+            'textDocument': {'uri': self.uri},
+            'position': {'line': line, 'character': character},
+        })['items']
+
+    def test_completion(self) -> None:
+        text = 'import os\n\n\nx = sub_top'
+        self.open(text)
+        items = self.complete(3, len('x = sub_top'))
+        item = next(i for i in items if i['label'] == 'sub_top_level_function1')
+        assert item['detail'] == (
+            'from .subpackage.sub_main import sub_top_level_function1'
+        )
+        edits = item['additionalTextEdits']
+        assert len(edits) == 1
+        assert apply_edit(text, edits[0]) == (
+            'import os\n'
+            '\n'
+            'from .subpackage.sub_main import sub_top_level_function1\n'
+            '\n'
+            '\n'
+            'x = sub_top'
+        )
+
+        # Attributes are not completed.
+        self.notify('textDocument/didChange', {
+            'textDocument': {'uri': self.uri, 'version': 2},
+            'contentChanges': [{'text': 'x = os.sub_top'}],
+        })
+        assert self.complete(0, len('x = os.sub_top')) == []
+        return
+
+    def test_completion_resolve(self) -> None:
+        self.open('x = SubTop', resolve_edits=True)
+        items = self.complete(0, len('x = SubTop'))
+        item = next(i for i in items if i['label'] == 'SubTopLevelClass1')
+        assert 'additionalTextEdits' not in item
+        resolved = self.request('completionItem/resolve', item)
+        assert resolved['additionalTextEdits'][0]['newText'].startswith(
+            'from .subpackage.sub_main import SubTopLevelClass1\n'
+        )
+        return
+
+    def test_code_action(self) -> None:
+        text = 'import os\nimport sys\n\nsys.exit()\n'
+        self.open(text)
+        params = {
+            'textDocument': {'uri': self.uri},
+            'range': {
+                'start': {'line': 0, 'character': 0},
+                'end': {'line': 0, 'character': 0},
+            },
+            'context': {'diagnostics': [], 'only': [ORGANIZE_IMPORTS]},
+        }
+        actions = self.request('textDocument/codeAction', params)
+        assert len(actions) == 1
+        edit = actions[0]['edit']['changes'][self.uri][0]
+        assert apply_edit(text, edit) == 'import sys\n\nsys.exit()\n'
+
+        params['context'] = {'diagnostics': [], 'only': ['quickfix']}
+        assert self.request('textDocument/codeAction', params) == []
+        return
+
+    def test_lifecycle(self) -> None:
+        self.open('')
+        response = self.server.handle(
+            {'jsonrpc': '2.0', 'id': 100, 'method': 'unknown'},
+        )
+        assert response is not None and response['error']['code'] == -32601
+        assert self.request('shutdown', {}) is None
+        self.notify('exit', {})
+        assert self.server.exited
+        return
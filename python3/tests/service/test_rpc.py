@@ -0,0 +1,225 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, Dict, List, Optional
+
+from nayvy.aop.latency import LatencyRecorder
+from nayvy.service.backend import NayvyBackend
+from nayvy.service.client import RemoteBackend, RpcClient, RpcError
+from nayvy.service.rpc import (
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    RpcServer,
+    bind_unix,
+    serve_unix,
+)
+
+
+class EchoBackend(NayvyBackend):
+    """ Backend returning its arguments.
+    """
+
+    def __init__(self) -> None:
+        self.written: List[str] = []
+        return
+
+    def list_imports(
+        self,
+        filepath: str,
+        prefix: str = '',
+        limit: int = -1,
+        width: int = -1,
+    ) -> List[Dict[str, Any]]:
+        return [{'filepath': filepath, 'prefix': prefix, 'limit': limit}]
+
+    def list_import_lines(self, filepath: str) -> List[str]:
+        return [filepath]
+
+    def resolve_import(self, filepath: str, name: str) -> str:
+        if name == 'broken':
+            raise RuntimeError('broken')
+        if name == 'type_error':
+            raise TypeError('type_error')
+        return name
+
+    def fix_lines(self, filepath: str, lines: List[str]) -> Optional[List[str]]:
+        return None
+
+    def add_imports(
+        self,
+        filepath: str,
+        lines: List[str],
+        names: List[str],
+    ) -> List[str]:
+        return [f'import {name}' for name in names] + lines
+
+    def file_written(self, filepath: str) -> None:
+        self.written.append(filepath)
+        return
+
+    def warm_up(self, filepath: str) -> None:
+        return
+
+    def is_warming_up(self, filepath: str) -> bool:
+        return True
+
+    def stats(self) -> List[str]:
+        return ['stats']
+
+
+class TestRpcServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.backend = EchoBackend()
+        self.latencies = LatencyRecorder()
+        self.server = RpcServer(self.backend, self.latencies)
+        return
+
+    def test_handle(self) -> None:
+        response = self.server.handle({
+            'jsonrpc': '2.0',
+            'id': 1,
+            'method': 'add_imports',
+            'params': {'filepath': 'a.py', 'lines': ['x'], 'names': ['os']},
+        })
+        assert response == {
+            'jsonrpc': '2.0',
+            'id': 1,
+            'result': ['import os', 'x'],
+        }
+        assert self.latencies.summary()['add_imports'].count == 1
+
+        # Notification
+        assert self.server.handle({
+            'jsonrpc': '2.0',
+            'method': 'file_written',
+            'params': {'filepath': 'a.py'},
+        }) is None
+        assert self.backend.written == ['a.py']
+        return
+
+    def test_handle_error(self) -> None:
+
+        def error_code(request: Any) -> int:
+            response = self.server.handle(request)
+            assert response is not None
+            return response['error']['code']  # type: ignore
+
+        assert error_code([]) == INVALID_REQUEST
+        assert error_code({'id': 1, 'method': '__init__'}) == METHOD_NOT_FOUND
+        assert error_code({'id': 1, 'method': 'stats', 'params': []}) == INVALID_PARAMS
+        assert error_code({
+            'id': 1,
+            'method': 'resolve_import',
+            'params': {'unknown': 1},
+        }) == INVALID_PARAMS
+        assert error_code({
+            'id': 1,
+            'method': 'stats',
+            'params': {'x': 1},
+        }) == INVALID_PARAMS
+        # Not confused with invalid params
+        assert error_code({
+            'id': 1,
+            'method': 'resolve_import',
+            'params': {'filepath': 'a.py', 'name': 'type_error'},
+        }) == INTERNAL_ERROR
+        return
+
+    def test_serve_stream(self) -> None:
+        rfile = io.BytesIO(
+            b'{"jsonrpc": "2.0", "id": 1, "method": "stats"}\n'
+            b'\n'
+            b'not json\n'
+        )
+        wfile = io.BytesIO()
+        self.server.serve_stream(rfile, wfile)
+        responses = [
+            json.loads(line)
+            for line in wfile.getvalue().splitlines()
+        ]
+        assert responses[0]['result'] == ['stats']
+        assert responses[1]['error']['code'] == PARSE_ERROR
+        return
+
+
+class TestRemoteBackend(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # Paths of unix sockets must be short.
+        self.work_dir = tempfile.mkdtemp(prefix='nayvy_rpc_')
+        self.socket_path = f'{self.work_dir}/nayvy.sock'
+        self.backend = EchoBackend()
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        self.thread_num = threading.active_count()
+        self.server = bind_unix(RpcServer(self.backend), self.socket_path)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            # Not to wait long for shutdown
+            args=(0.01,),
+        )
+        self.thread.start()
+        # Run after clients are closed
+        self.addCleanup(self._shutdown)
+        return
+
+    def _shutdown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        # Threads handling closed clients exit soon.
+        for _ in range(100):
+            if threading.active_count() <= self.thread_num:
+                break
+            time.sleep(0.01)
+        assert threading.active_count() <= self.thread_num
+        return
+
+    def _client(self, socket_path: str = '') -> RpcClient:
+        client = RpcClient(socket_path or self.socket_path)
+        self.addCleanup(client.close)
+        return client
+
+    def test_remote_backend(self) -> None:
+        remote = RemoteBackend(self._client())
+        assert remote.list_imports('/a.py', 'os', 3) == [
+            {'filepath': '/a.py', 'prefix': 'os', 'limit': 3},
+        ]
+        assert remote.list_import_lines('/a.py') == ['/a.py']
+        assert remote.resolve_import('/a.py', 'name') == 'name'
+        assert remote.fix_lines('/a.py', ['x']) is None
+        assert remote.is_warming_up('/a.py')
+        remote.file_written('/a.py')
+        assert self.backend.written == ['/a.py']
+        with self.assertRaises(RpcError):
+            remote.resolve_import('/a.py', 'broken')
+        # The connection is still usable.
+        assert remote.stats() == ['stats']
+
+        # Another client shares the same backend.
+        another = RemoteBackend(self._client())
+        another.file_written('/b.py')
+        assert self.backend.written == ['/a.py', '/b.py']
+        return
+
+    def test_serve_twice(self) -> None:
+        # Never takes over the socket of the live server.
+        with self.assertRaises(OSError):
+            serve_unix(RpcServer(EchoBackend()), self.socket_path)
+        assert RemoteBackend(self._client()).stats() == ['stats']
+        assert os.stat(self.socket_path).st_mode & 0o777 == 0o600
+        return
+
+    def test_unavailable(self) -> None:
+        remote = RemoteBackend(self._client(f'{self.work_dir}/missing.sock'))
+        with self.assertRaises(OSError):
+            remote.stats()
+        return
@@ -0,0 +1,30 @@
+import sys
+import unittest
+from dataclasses import dataclass
+from typing import List
+
+from nayvy.utils.memory import deep_sizeof, format_bytes
+
+
+class Test(unittest.TestCase):
+
+    def test_deep_sizeof(self) -> None:
+
+        @dataclass
+        class Node:
+            name: str
+            children: List['Node']
+
+        leaf = Node('leaf' * 100, [])
+        assert deep_sizeof(leaf) > sys.getsizeof(leaf) + sys.getsizeof('leaf' * 100)
+
+        # Shared objects are counted once.
+        root = Node('root', [leaf, leaf])
+        assert deep_sizeof([root, leaf]) < deep_sizeof(root) + deep_sizeof(leaf)
+        return
+
+    def test_format_bytes(self) -> None:
+        assert format_bytes(100) == '100.0 B'
+        assert format_bytes(2048) == '2.0 KiB'
+        assert format_bytes(3 * 1024 ** 3) == '3.0 GiB'
+        return